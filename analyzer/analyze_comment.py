@@ -7,35 +7,81 @@ import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 import seaborn as sns
 from wordcloud import WordCloud
-import jieba
 import os
-import re
-from snownlp import SnowNLP
 import matplotlib.dates as mdates
 import collections
+import contextlib
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
 # 确保这些是从你的config导入
-from utils.config import FONT_PATH, HIT_STOPWORDS_PATH, IMAGE_DIR 
+from utils.config import FONT_PATH, HIT_STOPWORDS_PATH, IMAGE_DIR, IMAGE_SAVE_FORMATS
+from repository.rollup_repository import open_rollup_repository
+from utils.export_parquet import parquet_path_for
+from utils.text_segment import load_stopwords
+from analyzer.comment_frame import (
+    USER_COLUMNS,
+    iter_comment_frames,
+    iter_comment_csv,
+    iter_comment_parquet,
+    load_comment_frame,
+    read_comment_csv,
+    read_comment_parquet,
+)
+from analyzer.pipeline import ALL_ANALYSIS_TASKS, MINI_ANALYSIS_TASKS, run_analysis_pipeline
+from analyzer.sentiment import classify_sentiments, score_comment_sentiments
+from analyzer.streaming import WORD_COUNT_CHUNK, StreamingCommentStats, count_words
+
+
+def _value_counts(series):
+    """value_counts，去掉 category 列中未出现的取值（计数为 0 的类别）。"""
+    counts = series.value_counts()
+    return counts[counts > 0]
+
+
+def _is_interactive_backend() -> bool:
+    """当前 matplotlib 后端能否显示窗口；Agg 等非交互后端下 plt.show() 不显示任何内容。"""
+    from matplotlib.backends import BackendFilter, backend_registry
+
+    backend = matplotlib.get_backend()
+    if backend.startswith("module://"):
+        return True
+    return backend.lower() in backend_registry.list_builtin(BackendFilter.INTERACTIVE)
 
 
 class CommentAnalyzer:
     def __init__(
         self,
         csv_path,
-        db_name="bilibili_comments.db"
+        db_name="bilibili_comments.db",
+        oids=None,
+        mids=None,
     ):
+        # csv_path 为 None 时（见 from_db）直接从数据库 db_name 加载评论，不经过 CSV
         self.csv_path = csv_path
         self.db_name = db_name
+        # 指定视频ID (oid) 时，分布类图表直接读取数据库中的聚合表，不再扫描全部评论
+        self.oids = oids
+        # 从数据库加载时按用户ID (mid) 过滤
+        self.mids = mids
 
         self.font_path = FONT_PATH
         self.stopwords_path = HIT_STOPWORDS_PATH
         self.output_dir = IMAGE_DIR
+        self.save_formats = IMAGE_SAVE_FORMATS  # 图表保存格式，如 ["png", "svg"]
         self.df = None  # 存储原始评论数据
         self.df_unique_users = None  # 存储按用户ID去重后的数据
         self._setup_matplotlib_font()  # 设置matplotlib字体
         self._create_output_directory()  # 创建输出目录
 
+    @classmethod
+    def from_db(cls, db_name, oids=None, mids=None):
+        """
+        创建直接从数据库加载评论的分析器，无需先导出 CSV。
+        oids / mids 为要分析的视频ID / 用户ID，都不指定时分析库中全部评论。
+        """
+        return cls(csv_path=None, db_name=db_name, oids=oids, mids=mids)
+
     def _setup_matplotlib_font(self):
         """设置matplotlib支持中文显示和使用指定字体。"""
         try:
@@ -57,17 +103,48 @@ class CommentAnalyzer:
             os.makedirs(self.output_dir)
             print(f"创建输出目录: {self.output_dir}")
 
-    def load_data(self):
-        """加载CSV文件并进行初步数据清洗。"""
+    def _fresh_parquet_path(self):
+        """
+        导出时同时写出的同名 Parquet 文件存在且不比 CSV 旧时返回其路径，否则返回 None。
+        读取 Parquet 需要 pyarrow，未安装时同样返回 None。
+        """
+        parquet_path = parquet_path_for(self.csv_path)
+        if not os.path.exists(parquet_path):
+            return None
+        if os.path.exists(self.csv_path) and os.path.getmtime(
+            parquet_path
+        ) < os.path.getmtime(self.csv_path):
+            return None
         try:
-            self.df = pd.read_csv(self.csv_path)           
-            print(f"成功加载数据文件: {self.csv_path}")
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return None
+        return parquet_path
 
-            self.df["评论ID"] = self.df["评论ID"].astype(str)
-            self.df["评论时间"] = pd.to_datetime(self.df["评论时间"])
-
-            # 针对用户维度的分析，根据用户ID去重，保留每个用户的第一次出现记录
-            self.df_unique_users = self.df.drop_duplicates(subset=["用户ID"]).copy()
+    def load_data(self):
+        """
+        加载评论数据并进行初步数据清洗。由 from_db 创建时直接从数据库读取所需列；
+        否则加载导出的数据，优先读取带类型的 Parquet，再回退到 CSV。
+        """
+        try:
+            if self.csv_path is None:
+                self.df = load_comment_frame(self.db_name, oids=self.oids, mids=self.mids)
+                print(f"成功从数据库加载评论: {self.db_name}")
+            else:
+                parquet_path = self._fresh_parquet_path()
+                if parquet_path:
+                    # 评论时间已是原生时间戳，性别等列为 category，无需再解析
+                    self.df = read_comment_parquet(parquet_path)
+                    print(f"成功加载数据文件: {parquet_path}")
+                else:
+                    # 只读取分析用到的列，读取时即确定类型、解析评论时间
+                    self.df = read_comment_csv(self.csv_path)
+                    print(f"成功加载数据文件: {self.csv_path}")
+
+            # 针对用户维度的分析，根据用户ID去重，保留每个用户的第一次出现记录；
+            # 只取用户相关的几列，不复制评论内容
+            first_seen = ~self.df["用户ID"].duplicated()
+            self.df_unique_users = self.df.loc[first_seen, USER_COLUMNS]
             print(f"原始评论数量: {len(self.df)}")
             print(f"去重用户数量: {len(self.df_unique_users)}")
 
@@ -85,67 +162,51 @@ class CommentAnalyzer:
             return False
         return True
 
-    def _display_plot(self, plot_data, plot_type, show_title, show_title_size, x, y, dpi, **plot_kwargs):
+    def _rollup_counts(self, dimension, fill_value=None):
         """
-        在新窗口显示图表。
+        从聚合表读取当前视频在某一维度上的分布，返回以取值为索引的 Series。
+        缺失值默认去除；给定 fill_value 时计入该取值（与导出 CSV 时对缺失值的转换保持一致）。
+        未指定 oids、评论分片存储或聚合表不可用时返回 None，由调用方回退到基于 CSV 的统计。
         """
-        display_fig, display_ax = plt.subplots(figsize=(x / dpi, y / dpi), dpi=dpi)
-
-        self._render_plot_on_ax(display_ax, plot_data, plot_type, **plot_kwargs)
-
-        if plot_type == "imshow" or plot_type == "pie":
-            display_ax.axis("off")
-        else:
-            if "xlabel" in plot_kwargs:
-                display_ax.set_xlabel(plot_kwargs["xlabel"])
-            if "ylabel" in plot_kwargs:
-                display_ax.set_ylabel(plot_kwargs["ylabel"])
-
-        if show_title:
-            display_ax.set_title(show_title, fontsize=show_title_size)
-
-        display_fig.tight_layout()
-        plt.show()
-        plt.close(display_fig)
-
-    def _save_plot(self, plot_data, plot_type, save_filename, x, y, dpi, save_format, **plot_kwargs):
+        if not self.oids or not os.path.exists(self.db_name):
+            return None
+        rollup_repo = open_rollup_repository(self.db_name)
+        if rollup_repo is None or not rollup_repo.has_rollups(self.oids):
+            return None
+        distribution = rollup_repo.get_distribution(self.oids, dimension)
+        missing = distribution.pop(None, 0)
+        if fill_value is not None and missing:
+            distribution[fill_value] = distribution.get(fill_value, 0) + missing
+        return pd.Series(distribution, dtype="int64")
+
+    def _save_figure(self, fig, save_filename, dpi, save_format=None):
         """
-        将图表保存到文件。
+        将已绘制好的图表按一种或多种格式保存（同一个 Figure，不重新绘制），透明背景。
+        save_format 为格式名或格式列表，为 None 时使用 self.save_formats。
         """
-        save_figsize = (x / dpi, y / dpi)
-
-        save_fig, save_ax = plt.subplots(figsize=save_figsize, dpi=dpi)
-
-        self._render_plot_on_ax(save_ax, plot_data, plot_type, **plot_kwargs)
-
-        if plot_type == "imshow" or plot_type == "pie":
-            save_ax.axis("off")
-        else:
-            if "xlabel" in plot_kwargs:
-                save_ax.set_xlabel(plot_kwargs["xlabel"])
-            if "ylabel" in plot_kwargs:
-                save_ax.set_ylabel(plot_kwargs["ylabel"])
-
-        save_fig.subplots_adjust(bottom=0, top=1, left=0, right=1)
-
-        if not save_filename.lower().endswith(f".{save_format}"):
-            save_filename_with_ext = f"{os.path.splitext(save_filename)[0]}.{save_format}"
+        if save_format is None:
+            save_formats = self.save_formats
+        elif isinstance(save_format, str):
+            save_formats = [save_format]
         else:
-            save_filename_with_ext = save_filename
-
-        getSavePath = os.path.join(self.output_dir, save_filename_with_ext)
+            save_formats = save_format
+        fig.subplots_adjust(bottom=0, top=1, left=0, right=1)
+        base_filename = os.path.splitext(save_filename)[0]
+        for fmt in save_formats:
+            getSavePath = os.path.join(self.output_dir, f"{base_filename}.{fmt}")
+            fig.savefig(
+                getSavePath,
+                bbox_inches="tight",
+                format=fmt,
+                transparent=True,
+                dpi=dpi,
+            )
+            print(f"图片已保存到: {getSavePath} (格式: {fmt}, 透明背景: True)")
 
-        plt.savefig(
-            getSavePath,
-            bbox_inches="tight",
-            format=save_format,
-            transparent=True,
-            dpi=dpi,
-        )
-        print(
-            f"图片已保存到: {getSavePath} (格式: {save_format}, 透明背景: True)"
-        )
-        plt.close(save_fig)
+    def _show_figure(self, fig):
+        """在新窗口显示已绘制好的图表（调用方需先确认 _is_interactive_backend()）。"""
+        fig.tight_layout()
+        plt.show()
 
     def _render_plot_on_ax(self, ax, plot_data, plot_type, **plot_kwargs):
         """
@@ -190,24 +251,51 @@ class CommentAnalyzer:
                     show_title: str = "", 
                     show_title_size: int = 16, 
                     dpi: int = 100, 
-                    save_format: str = "png",
+                    save_format=None,
                     **plot_kwargs):
         """
         统一的绘图和保存函数（不包括雷达图）。
+        图表只绘制一次：先保存为 save_format 指定的一种或多种格式（默认 self.save_formats），
+        需要时再在同一个 Figure 上加标题显示。
         """
-        self._save_plot(plot_data, plot_type, save_filename, x, y, dpi, save_format, **plot_kwargs)
-        if show_plot:
-            self._display_plot(plot_data, plot_type, show_title, show_title_size, x, y, dpi, **plot_kwargs)
+        fig, ax = plt.subplots(figsize=(x / dpi, y / dpi), dpi=dpi)
+        try:
+            self._render_plot_on_ax(ax, plot_data, plot_type, **plot_kwargs)
+
+            if plot_type == "imshow" or plot_type == "pie":
+                ax.axis("off")
+            else:
+                if "xlabel" in plot_kwargs:
+                    ax.set_xlabel(plot_kwargs["xlabel"])
+                if "ylabel" in plot_kwargs:
+                    ax.set_ylabel(plot_kwargs["ylabel"])
+
+            self._save_figure(fig, save_filename, dpi, save_format)
+            # 保存的图片不带标题；非交互后端下 plt.show() 不显示任何内容，直接跳过
+            if show_plot and _is_interactive_backend():
+                if show_title:
+                    ax.set_title(show_title, fontsize=show_title_size)
+                self._show_figure(fig)
+        finally:
+            plt.close(fig)
 
     # (其他分析方法保持不变)
     def analyze_ip_distribution(self):
         """分析用户IP属地分布并生成柱状图（基于去重用户）。"""
-        if self.df_unique_users is None:
+        ip_counts = self._rollup_counts("ip_location")
+        if ip_counts is not None:
+            ip_counts = ip_counts.drop("未知", errors="ignore")
+            ip_counts = ip_counts.sort_values(ascending=False, kind="stable").head(10)
+        elif self.df_unique_users is None:
             print("数据未加载，无法进行IP属地分析。")
             return
-        filtered_users = self.df_unique_users.copy()
-        filtered_users = filtered_users[filtered_users["IP属地"] != "未知"]
-        ip_counts = filtered_users["IP属地"].value_counts().head(10)
+        else:
+            ip_locations = self.df_unique_users["IP属地"]
+            ip_counts = _value_counts(ip_locations[ip_locations != "未知"]).head(10)
+        self._plot_ip_distribution(ip_counts)
+
+    def _plot_ip_distribution(self, ip_counts):
+        """绘制IP属地 Top 10 柱状图。"""
         if ip_counts.empty:
             print("过滤IP属地为'未知'后，没有足够的有效数据进行IP属地分析。")
             return
@@ -230,10 +318,21 @@ class CommentAnalyzer:
 
     def analyze_vip_status(self):
         """分析用户大会员状态并生成扇形图（基于去重用户）。"""
-        if self.df_unique_users is None:
+        vip_counts = self._rollup_counts("vip", fill_value=0)
+        if vip_counts is not None:
+            # 与导出 CSV 时的转换一致：vip == 1 为"是"，其余（含缺失）为"否"
+            vip_counts = vip_counts.groupby(
+                ["是" if vip == 1 else "否" for vip in vip_counts.index]
+            ).sum().sort_values(ascending=False)
+        elif self.df_unique_users is None:
             print("数据未加载，无法进行大会员状态分析。")
             return
-        vip_counts = self.df_unique_users["是否是大会员"].value_counts()
+        else:
+            vip_counts = _value_counts(self.df_unique_users["是否是大会员"])
+        self._plot_vip_status(vip_counts)
+
+    def _plot_vip_status(self, vip_counts):
+        """绘制大会员状态扇形图。"""
         if vip_counts.empty:
             print("没有足够的数据进行大会员状态分析。")
             return
@@ -253,10 +352,18 @@ class CommentAnalyzer:
 
     def analyze_gender_distribution(self):
         """分析用户性别分布并生成扇形图（基于去重用户）。"""
-        if self.df_unique_users is None:
+        gender_counts = self._rollup_counts("sex")
+        if gender_counts is not None:
+            gender_counts = gender_counts.sort_values(ascending=False)
+        elif self.df_unique_users is None:
             print("数据未加载，无法进行性别分析。")
             return
-        gender_counts = self.df_unique_users["性别"].value_counts()
+        else:
+            gender_counts = _value_counts(self.df_unique_users["性别"])
+        self._plot_gender_distribution(gender_counts)
+
+    def _plot_gender_distribution(self, gender_counts):
+        """绘制性别分布扇形图。"""
         if gender_counts.empty:
             print("没有足够的数据进行性别分析。")
             return
@@ -276,10 +383,18 @@ class CommentAnalyzer:
 
     def analyze_level_distribution(self):
         """分析用户等级分布并生成扇形图（基于去重用户）。"""
-        if self.df_unique_users is None:
+        level_counts = self._rollup_counts("level")
+        if level_counts is not None:
+            level_counts = level_counts.sort_index()
+        elif self.df_unique_users is None:
             print("数据未加载，无法进行用户等级分析。")
             return
-        level_counts = self.df_unique_users["用户等级"].value_counts().sort_index()
+        else:
+            level_counts = self.df_unique_users["用户等级"].value_counts().sort_index()
+        self._plot_level_distribution(level_counts)
+
+    def _plot_level_distribution(self, level_counts):
+        """绘制用户等级分布扇形图。"""
         if level_counts.empty:
             print("没有足够的数据进行用户等级分析。")
             return
@@ -299,15 +414,24 @@ class CommentAnalyzer:
 
     def analyze_comment_time_trend(self):
         """分析评论数量随时间变化趋势并生成折线图（基于所有评论）。"""
-        if self.df is None:
+        comment_counts_by_day = self._rollup_counts("day")
+        if comment_counts_by_day is not None:
+            comment_counts_by_day.index = pd.to_datetime(comment_counts_by_day.index).date
+            comment_counts_by_day = comment_counts_by_day.sort_index()
+        elif self.df is None:
             print("数据未加载，无法进行评论时间趋势分析。")
             return
-        if not pd.api.types.is_datetime64_any_dtype(self.df["评论时间"]):
-            self.df["评论时间"] = pd.to_datetime(self.df["评论时间"])
-        df_sorted_time = self.df.sort_values(by="评论时间")
-        comment_counts_by_day = df_sorted_time.groupby(
-            df_sorted_time["评论时间"].dt.date
-        ).size()
+        else:
+            if not pd.api.types.is_datetime64_any_dtype(self.df["评论时间"]):
+                self.df["评论时间"] = pd.to_datetime(self.df["评论时间"])
+            comment_counts_by_day = (
+                self.df["评论时间"].dt.normalize().value_counts().sort_index()
+            )
+            comment_counts_by_day.index = comment_counts_by_day.index.date
+        self._plot_comment_time_trend(comment_counts_by_day)
+
+    def _plot_comment_time_trend(self, comment_counts_by_day):
+        """绘制每日评论数量折线图，索引为日期。"""
         if comment_counts_by_day.empty:
             print("没有足够的数据进行评论时间趋势分析。")
             return
@@ -328,13 +452,20 @@ class CommentAnalyzer:
 
     def analyze_comment_hour_distribution(self):
         """分析评论数量按小时分布并生成柱状图（基于所有评论）。"""
-        if self.df is None:
-            print("数据未加载，无法进行评论小时分布分析。")
-            return
-        if not pd.api.types.is_datetime64_any_dtype(self.df["评论时间"]):
-            self.df["评论时间"] = pd.to_datetime(self.df["评论时间"])
-        self.df["评论小时"] = self.df["评论时间"].dt.hour
-        comment_counts_by_hour = self.df["评论小时"].value_counts().sort_index()
+        comment_counts_by_hour = self._rollup_counts("hour")
+        if comment_counts_by_hour is None:
+            if self.df is None:
+                print("数据未加载，无法进行评论小时分布分析。")
+                return
+            if not pd.api.types.is_datetime64_any_dtype(self.df["评论时间"]):
+                self.df["评论时间"] = pd.to_datetime(self.df["评论时间"])
+            comment_counts_by_hour = (
+                self.df["评论时间"].dt.hour.value_counts().sort_index()
+            )
+        self._plot_comment_hour_distribution(comment_counts_by_hour)
+
+    def _plot_comment_hour_distribution(self, comment_counts_by_hour):
+        """绘制评论数量按小时分布柱状图，缺少的小时补 0。"""
         full_hour_index = pd.Index(range(24))
         comment_counts_by_hour = comment_counts_by_hour.reindex(
             full_hour_index, fill_value=0
@@ -361,30 +492,40 @@ class CommentAnalyzer:
             xticks=range(24),
         )
 
-    def analyze_sentiment(self):
+    def compute_sentiment_scores(self, executor=None):
+        """计算全部评论的情感分数（float64 数组），executor 为批量并行计算使用的进程池。"""
+        return score_comment_sentiments(
+            self.df["评论ID"], self.df["评论内容"], db_name=self._cache_db(), executor=executor
+        )
+
+    def analyze_sentiment(self, sentiment_scores=None):
+        """情感分析并绘制分布图；sentiment_scores 为已算好的分数（见 compute_sentiment_scores）。"""
         if self.df is None or self.df.empty:
             print("评论数据为空，无法进行情感分析。")
             return
-        if "sentiment_score" not in self.df.columns:
-            self.df["sentiment_score"] = self.df["评论内容"].apply(
-                lambda x: SnowNLP(str(x)).sentiments if pd.notnull(x) else None
+        if sentiment_scores is not None:
+            self.df["sentiment_score"] = pd.Series(
+                sentiment_scores, index=self.df.index, dtype="float64"
+            )
+            self.df.drop(columns="sentiment_label", errors="ignore", inplace=True)
+        elif "sentiment_score" not in self.df.columns:
+            self.df["sentiment_score"] = pd.Series(
+                self.compute_sentiment_scores(), index=self.df.index, dtype="float64"
             )
-
-        def classify_sentiment(score):
-            if score is None:
-                return "未知"
-            elif score > 0.7:
-                return "积极"
-            elif score < 0.3:
-                return "消极"
-            else:
-                return "中立"
 
         if "sentiment_label" not in self.df.columns:
-            self.df["sentiment_label"] = self.df["sentiment_score"].apply(
-                classify_sentiment
-            )
+            self.df["sentiment_label"] = classify_sentiments(self.df["sentiment_score"])
         sentiment_counts = self.df["sentiment_label"].value_counts()
+        self._plot_sentiment(sentiment_counts)
+        average_sentiment_score = self.df["sentiment_score"].dropna().mean()
+        # print(f"评论的平均情感分数 (0-1, 1为最积极): {average_sentiment_score:.4f}")
+
+    def _cache_db(self):
+        """情感分数与分词缓存所在的数据库：db_name 存在时使用其中的缓存表，否则不缓存。"""
+        return self.db_name if os.path.exists(self.db_name) else None
+
+    def _plot_sentiment(self, sentiment_counts):
+        """绘制情感分布扇形图，索引为 积极 / 消极 / 中立 / 未知。"""
         if not sentiment_counts.empty:
             self.plot_figure(
                 plot_data=(
@@ -405,30 +546,56 @@ class CommentAnalyzer:
             )
         else:
             print("没有足够的有效情感分析结果来生成分布图。")
-        average_sentiment_score = self.df["sentiment_score"].dropna().mean()
-        # print(f"评论的平均情感分数 (0-1, 1为最积极): {average_sentiment_score:.4f}")
 
-    def generate_wordcloud(self):
-        if self.df is None:
-            print("数据未加载，无法生成词云。")
-            return
-        all_comments = " ".join(self.df["评论内容"].dropna())
-        all_comments = re.sub(r"\[.*?\]", "", all_comments)
+    def _load_stopwords(self):
         stopwords = set()
         try:
-            with open(self.stopwords_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    stopwords.add(line.strip())
+            stopwords = load_stopwords(self.stopwords_path)
             print(f"成功加载停用词文件: {self.stopwords_path}")
         except FileNotFoundError:
             print(
                 f"警告：未找到停用词文件: {self.stopwords_path}，将不使用停用词过滤。"
             )
-        seg_list = jieba.cut(all_comments, cut_all=False)
-        filtered_words = [
-            word for word in seg_list if word not in stopwords and len(word) > 1
-        ]
-        word_count = collections.Counter(filtered_words)
+        return stopwords
+
+    def compute_word_counts(self, executor=None):
+        """
+        分块并行分词并累加全部评论的词频（已过滤停用词），已缓存分词结果的评论不再重新分词。
+        executor 为分词使用的进程池，为 None 时临时创建。
+        """
+        stopwords = self._load_stopwords()
+        word_count = collections.Counter()
+        comments = self.df["评论内容"]
+        rpids = self.df["评论ID"]
+        cache_db = self._cache_db()
+        with contextlib.ExitStack() as stack:
+            if executor is None:
+                executor = stack.enter_context(ProcessPoolExecutor())
+            for start in range(0, len(comments), WORD_COUNT_CHUNK):
+                count_words(
+                    comments.iloc[start:start + WORD_COUNT_CHUNK],
+                    stopwords,
+                    word_count,
+                    rpids=rpids.iloc[start:start + WORD_COUNT_CHUNK],
+                    db_name=cache_db,
+                    executor=executor,
+                )
+        return word_count
+
+    def generate_wordcloud(self, word_count=None):
+        """生成词云；word_count 为已算好的词频（见 compute_word_counts）。"""
+        if self.df is None:
+            print("数据未加载，无法生成词云。")
+            return
+        if word_count is None:
+            word_count = self.compute_word_counts()
+        self._plot_wordcloud(word_count)
+
+    def _plot_wordcloud(self, word_count):
+        """按词频生成并绘制词云。"""
+        if not word_count:
+            print("没有足够的词语生成词云。")
+            return
         wordcloud = WordCloud(
             width=1600,
             height=900,
@@ -493,50 +660,21 @@ class CommentAnalyzer:
         if is_display and show_title:
             ax.set_title(show_title, fontsize=show_title_size, fontproperties=fm.FontProperties(fname=self.font_path))
 
-    def _display_radar_plot(self, plot_data, show_title: str, show_title_size: int, x: int, y: int, dpi: int):
+    def _plot_radar(self, plot_data, save_filename: str, show_plot: bool, show_title: str, show_title_size: int, x: int, y: int, dpi: int, save_format=None):
         """
-        在新窗口显示雷达图。
+        绘制雷达图：只绘制一次，先保存（无标题，透明背景），需要时再加上标题显示。
         """
-        display_figsize = (x / dpi, y / dpi)
-        display_fig = plt.figure(figsize=display_figsize, dpi=dpi)
-        display_ax = display_fig.add_subplot(111, polar=True) # 极坐标投影
-
-        self._render_radar_plot_on_ax(display_ax, plot_data, show_title, show_title_size, is_display=True)
-
-        display_fig.tight_layout()
-        plt.show()
-        plt.close(display_fig)
-
-    def _save_radar_plot(self, plot_data, save_filename: str, x: int, y: int, dpi: int, save_format: str):
-        """
-        将雷达图保存到文件，无标题，透明背景。
-        """
-        save_figsize = (x / dpi, y / dpi)
-        save_fig = plt.figure(figsize=save_figsize, dpi=dpi)
-        save_ax = save_fig.add_subplot(111, polar=True) # 极坐标投影
-
-        self._render_radar_plot_on_ax(save_ax, plot_data, is_display=False) # 不显示标题
-
-        save_fig.subplots_adjust(bottom=0, top=1, left=0, right=1) # 紧密布局
-
-        if not save_filename.lower().endswith(f".{save_format}"):
-            save_filename_with_ext = f"{os.path.splitext(save_filename)[0]}.{save_format}"
-        else:
-            save_filename_with_ext = save_filename
-
-        getSavePath = os.path.join(self.output_dir, save_filename_with_ext)
-
-        plt.savefig(
-            getSavePath,
-            bbox_inches="tight",
-            format=save_format,
-            transparent=True, # 严格要求透明背景
-            dpi=dpi,
-        )
-        print(
-            f"图片已保存到: {getSavePath} (格式: {save_format}, 透明背景: True)"
-        )
-        plt.close(save_fig)
+        fig = plt.figure(figsize=(x / dpi, y / dpi), dpi=dpi)
+        try:
+            ax = fig.add_subplot(111, polar=True) # 极坐标投影
+            self._render_radar_plot_on_ax(ax, plot_data, is_display=False) # 保存的图片不带标题
+            self._save_figure(fig, save_filename, dpi, save_format)
+            if show_plot and _is_interactive_backend():
+                if show_title:
+                    ax.set_title(show_title, fontsize=show_title_size, fontproperties=fm.FontProperties(fname=self.font_path))
+                self._show_figure(fig)
+        finally:
+            plt.close(fig)
 
     def analyze_radar_chart(self, show_plot: bool = True):
         """
@@ -562,11 +700,8 @@ class CommentAnalyzer:
             print("评论数据为空，无法计算Top5评论。")
             return
 
-        # 确保点赞数是数值类型，并处理NaN值
-        df_sorted_by_like = self.df.sort_values(by="点赞数", ascending=False).copy()
-
-        # 确保至少有5条评论，否则取所有评论
-        top5_comments = df_sorted_by_like.head(5)
+        # 不足5条评论时取所有评论；nlargest 只做部分排序，不复制整个表
+        top5_comments = self.df.nlargest(5, "点赞数")
 
         if top5_comments.empty:
             print("没有足够的评论数据来计算Top5评论的平均特征。")
@@ -632,44 +767,70 @@ class CommentAnalyzer:
             'values_avg': normalized_avg_values
         }
 
-        # 调用独立的保存函数
-        self._save_radar_plot(
+        self._plot_radar(
             plot_data=plot_data,
             save_filename="comment_radar_chart.png",
+            show_plot=show_plot,
+            show_title="评论特征雷达图：赞数Top5评论平均 vs 所有评论平均",
+            show_title_size=16,
             x=1000,
             y=1000,
             dpi=100,
-            save_format="png"
         )
 
-        # 调用独立的显示函数
-        if show_plot:
-            self._display_radar_plot(
-                plot_data=plot_data,
-                show_title="评论特征雷达图：赞数Top5评论平均 vs 所有评论平均",
-                show_title_size=16,
-                x=1000,
-                y=1000,
-                dpi=100
-            )
-
-    def run_all_analysis(self):
+    def run_all_analysis(self, max_workers=None):
+        """加载数据后并行执行全部分析（见 run_analysis_pipeline），情感分数与词频只计算一次。"""
         if self.load_data():
-            self.analyze_ip_distribution()
-            self.analyze_vip_status()
-            self.analyze_gender_distribution()
-            self.analyze_level_distribution()
-            self.analyze_comment_time_trend()
-            self.analyze_comment_hour_distribution()
-            self.analyze_sentiment()
-            self.generate_wordcloud()
-            self.analyze_radar_chart()
+            run_analysis_pipeline(self, ALL_ANALYSIS_TASKS, max_workers=max_workers)
             print("所有分析已完成。")
 
-    def run_mini_analysis(self):
+    def _iter_chunks(self, chunk_size):
+        """按加载顺序（时间升序）逐块读取评论：数据库、Parquet 或 CSV，与 load_data 的来源选择一致。"""
+        if self.csv_path is None:
+            return iter_comment_frames(
+                self.db_name, oids=self.oids, mids=self.mids, chunk_size=chunk_size
+            )
+        parquet_path = self._fresh_parquet_path()
+        if parquet_path:
+            return iter_comment_parquet(parquet_path, chunk_size=chunk_size)
+        return iter_comment_csv(self.csv_path, chunk_size=chunk_size)
+
+    def run_streaming_analysis(self, chunk_size: int = 50000, mini: bool = False):
+        """
+        流式分析：不加载全部数据，逐块读取评论并用 StreamingCommentStats 累加统计，
+        生成与 run_all_analysis（mini=True 时与 run_mini_analysis）相同的图表（不含雷达图），
+        内存占用与评论总数无关，适用于超出内存的数据量。
+        """
+        # 各块的情感分数计算复用同一个进程池，避免每块重新启动进程、加载模型
+        with ProcessPoolExecutor() as executor:
+            stats = StreamingCommentStats(
+                stopwords=self._load_stopwords(),
+                cache_db=self._cache_db(),
+                executor=executor,
+            )
+            try:
+                for chunk in self._iter_chunks(chunk_size):
+                    stats.update(chunk)
+            except FileNotFoundError:
+                print(f"错误：未找到指定的CSV文件: {self.csv_path}。请检查文件路径是否正确。")
+                return
+        if stats.row_count == 0:
+            print("评论数据为空，无法进行流式分析。")
+            return
+        print(f"原始评论数量: {stats.row_count}")
+        print(f"去重用户数量: {len(stats.seen_users)}")
+        if not mini:
+            self._plot_ip_distribution(stats.ip_counts())
+            self._plot_vip_status(stats.vip_counts())
+            self._plot_gender_distribution(stats.gender_counts())
+            self._plot_level_distribution(stats.level_counts())
+        self._plot_comment_time_trend(stats.daily_counts())
+        self._plot_comment_hour_distribution(stats.hourly_counts())
+        self._plot_sentiment(stats.sentiment_distribution())
+        self._plot_wordcloud(stats.word_counts)
+        print("流式分析已完成。")
+
+    def run_mini_analysis(self, max_workers=None):
         if self.load_data():
-            self.analyze_comment_time_trend()
-            self.analyze_comment_hour_distribution()
-            self.analyze_sentiment()
-            self.generate_wordcloud()
+            run_analysis_pipeline(self, MINI_ANALYSIS_TASKS, max_workers=max_workers)
             print("mini分析已完成。")
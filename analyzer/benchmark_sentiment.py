@@ -0,0 +1,74 @@
+"""
+对比情感分析两个后端的速度与一致性：
+
+    python -m analyzer.benchmark_sentiment output_csv/output.csv --sample 5000
+
+以 SnowNLP 的结果为基准，报告朴素贝叶斯模型的三分类（积极 / 中立 / 消极）一致率、
+以 0.5 为界的二分类一致率、分数相关系数，以及单进程 SnowNLP、进程池 SnowNLP 与模型的耗时和加速比。
+模型需先用 python -m analyzer.sentiment_model 训练。
+"""
+import argparse
+import time
+import numpy as np
+from analyzer.comment_frame import read_comment_csv
+from analyzer.sentiment import _score_batch, classify_sentiments, score_sentiments
+from analyzer.sentiment_model import load_sentiment_model
+from utils.config import OUTPUT_CSV_PATH, SENTIMENT_MODEL_PATH
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def benchmark(csv_path: str, sample: int = 5000, seed: int = 0) -> dict:
+    texts = read_comment_csv(csv_path)["评论内容"].dropna()
+    if sample and len(texts) > sample:
+        texts = texts.sample(sample, random_state=seed)
+    texts = texts.tolist()
+    model = load_sentiment_model(SENTIMENT_MODEL_PATH)
+    _score_batch(texts[:1])  # 预先加载 SnowNLP 模型，不计入耗时
+
+    reference, serial_seconds = _timed(_score_batch, texts)
+    _, pool_seconds = _timed(score_sentiments, texts)
+    scores, model_seconds = _timed(model.score, texts)
+    reference = np.array(reference, dtype=np.float64)
+    valid = ~np.isnan(scores)
+    return {
+        "comments": len(texts),
+        "label_agreement": float(
+            (classify_sentiments(scores) == classify_sentiments(reference)).mean()
+        ),
+        "binary_agreement": float(((scores > 0.5) == (reference > 0.5))[valid].mean()),
+        "correlation": float(np.corrcoef(scores[valid], reference[valid])[0, 1]),
+        "snownlp_seconds": serial_seconds,
+        "snownlp_pool_seconds": pool_seconds,
+        "naive_bayes_seconds": model_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="情感分析后端速度与一致性对比")
+    parser.add_argument("csv_path", nargs="?", default=OUTPUT_CSV_PATH, help="导出的评论 CSV")
+    parser.add_argument("--sample", type=int, default=5000, help="随机抽取的评论条数，0 为全部")
+    args = parser.parse_args()
+
+    result = benchmark(args.csv_path, args.sample)
+    print(f"评论条数: {result['comments']}")
+    print(f"三分类一致率: {result['label_agreement']:.2%}")
+    print(f"二分类一致率: {result['binary_agreement']:.2%}")
+    print(f"分数相关系数: {result['correlation']:.4f}")
+    print(f"SnowNLP 单进程: {result['snownlp_seconds']:.2f} 秒")
+    print(
+        f"SnowNLP 进程池: {result['snownlp_pool_seconds']:.2f} 秒 "
+        f"(加速 {result['snownlp_seconds'] / result['snownlp_pool_seconds']:.1f}x)"
+    )
+    print(
+        f"朴素贝叶斯: {result['naive_bayes_seconds']:.3f} 秒 "
+        f"(加速 {result['snownlp_seconds'] / result['naive_bayes_seconds']:.0f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+from repository.sharded_comment_repository import open_comment_repository
+from utils.export_parquet import local_epoch_seconds
+
+# 分析用到的列：(库中列, DataFrame 列名)，列名与导出 CSV 一致；用户名、签名、头像等长字符串不读取
+ANALYSIS_COLUMNS = (
+    ("rpid", "评论ID"),
+    ("mid", "用户ID"),
+    ("level", "用户等级"),
+    ("sex", "性别"),
+    ("information", "评论内容"),
+    ("time", "评论时间"),
+    ("single_reply_num", "回复数"),
+    ("single_like_num", "点赞数"),
+    ("ip_location", "IP属地"),
+    ("vip", "是否是大会员"),
+)
+
+_CATEGORY_COLUMNS = ("性别", "IP属地", "是否是大会员")
+
+# 用户维度分析（IP、性别、大会员、等级）用到的列，去重用户表只保留这些列
+USER_COLUMNS = ["用户ID", "用户等级", "性别", "IP属地", "是否是大会员"]
+
+# 整数列的紧凑类型；含缺失值时改用对应的可空类型
+_INT_DTYPES = {
+    "评论ID": "int64",
+    "用户ID": "int64",
+    "用户等级": "int8",
+    "回复数": "int32",
+    "点赞数": "int32",
+}
+
+
+def _compact_int(values: List, dtype: str):
+    """把整数列转为 dtype；有缺失值时使用可空整数类型（如 Int8）。"""
+    if None in values:
+        return pd.array(values, dtype=dtype.capitalize())
+    return np.array(values, dtype=dtype)
+
+
+def _encode_categories(values, categories: Dict[str, int]) -> np.ndarray:
+    """按 categories（取值 -> 编码，跨块共享）把字符串编码为 int16，缺失值编码为 -1。"""
+    codes, uniques = pd.factorize(np.array(values, dtype=object))
+    if len(uniques) == 0:
+        return np.full(len(codes), -1, dtype=np.int16)
+    mapping = np.array(
+        [categories.setdefault(value, len(categories)) for value in uniques], dtype=np.int16
+    )
+    return np.where(codes < 0, -1, mapping[codes]).astype(np.int16)
+
+
+def load_comment_frame(
+    db_name: str,
+    oids: Optional[List[int]] = None,
+    mids: Optional[List[int]] = None,
+    chunk_size: int = 20000,
+) -> pd.DataFrame:
+    """
+    直接从数据库分块读取分析所需的列，构造与导出 CSV 同列名的 DataFrame：
+    评论时间为 datetime64（本地时间），性别 / IP属地 / 是否是大会员为 category，
+    等级为 int8，计数为 int32。指定 oids 时只取视频评论（与按 oid 导出一致），
+    oids / mids 都为 None 时读取全部评论。
+    每块读出后立即转为紧凑数组，分类列只保留编码，峰值内存远低于先导出 CSV 再读取。
+    """
+    repo = open_comment_repository(db_name)
+    columns_sql = ", ".join(column for column, _ in ANALYSIS_COLUMNS)
+    names = [name for _, name in ANALYSIS_COLUMNS]
+    parts = {name: [] for name in names}
+    categories = {name: {} for name in _CATEGORY_COLUMNS}
+    offset_cache = {}
+
+    for rows in repo.stream_rows(
+        columns_sql,
+        chunk_size=chunk_size,
+        oids=oids,
+        mids=mids,
+        only_videos=oids is not None,
+    ):
+        for name, values in zip(names, zip(*rows)):
+            if name in _INT_DTYPES:
+                parts[name].append(_compact_int(values, _INT_DTYPES[name]))
+            elif name == "评论时间":
+                seconds = pd.array(local_epoch_seconds(values, offset_cache), dtype="Int64")
+                parts[name].append(pd.to_datetime(seconds, unit="s"))
+            elif name == "是否是大会员":
+                parts[name].append(
+                    _encode_categories(
+                        ["是" if value == 1 else "否" for value in values], categories[name]
+                    )
+                )
+            elif name in categories:
+                parts[name].append(_encode_categories(values, categories[name]))
+            else:
+                parts[name].extend(values)
+
+    data = {}
+    for name in names:
+        if name in categories:
+            codes = np.concatenate(parts[name]) if parts[name] else np.array([], dtype=np.int16)
+            data[name] = pd.Categorical.from_codes(codes, categories=list(categories[name]))
+        elif name == "评论内容":
+            data[name] = pd.Series(parts[name], dtype=object)
+        elif parts[name]:
+            data[name] = pd.Series(
+                pd.concat([pd.Series(part) for part in parts[name]], ignore_index=True)
+            )
+        else:
+            data[name] = pd.Series(
+                [], dtype="datetime64[ns]" if name == "评论时间" else _INT_DTYPES[name]
+            )
+        parts[name] = None  # 尽早释放分块
+    return pd.DataFrame(data)
+
+
+def iter_comment_frames(
+    db_name: str,
+    oids: Optional[List[int]] = None,
+    mids: Optional[List[int]] = None,
+    chunk_size: int = 50000,
+) -> Iterator[pd.DataFrame]:
+    """
+    与 load_comment_frame 相同的查询与列类型，但逐块产出 DataFrame（按时间升序），
+    供流式分析使用；各块的分类列独立编码。
+    """
+    repo = open_comment_repository(db_name)
+    columns_sql = ", ".join(column for column, _ in ANALYSIS_COLUMNS)
+    offset_cache = {}
+    for rows in repo.stream_rows(
+        columns_sql,
+        chunk_size=chunk_size,
+        oids=oids,
+        mids=mids,
+        only_videos=oids is not None,
+    ):
+        data = {}
+        for (_, name), values in zip(ANALYSIS_COLUMNS, zip(*rows)):
+            if name in _INT_DTYPES:
+                data[name] = _compact_int(values, _INT_DTYPES[name])
+            elif name == "评论时间":
+                seconds = pd.array(local_epoch_seconds(values, offset_cache), dtype="Int64")
+                data[name] = pd.to_datetime(seconds, unit="s")
+            elif name == "是否是大会员":
+                data[name] = pd.Categorical(["是" if value == 1 else "否" for value in values])
+            elif name in _CATEGORY_COLUMNS:
+                data[name] = pd.Categorical(values)
+            else:
+                data[name] = pd.Series(values, dtype=object)
+        yield pd.DataFrame(data)
+
+
+# 读取导出文件时各列的类型；分类列读为 category，长文本不读取
+_CSV_DTYPES = {
+    "评论ID": "int64",
+    "用户ID": "int64",
+    "用户等级": "Int8",
+    "性别": "category",
+    "回复数": "Int32",
+    "点赞数": "Int32",
+    "IP属地": "category",
+    "是否是大会员": "category",
+}
+
+
+def _arrow_types():
+    import pyarrow as pa
+
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return {
+        "评论ID": pa.int64(),
+        "用户ID": pa.int64(),
+        "用户等级": pa.int8(),
+        "性别": dictionary,
+        "评论内容": pa.string(),
+        "评论时间": pa.timestamp("s"),
+        "回复数": pa.int32(),
+        "点赞数": pa.int32(),
+        "IP属地": dictionary,
+        "是否是大会员": dictionary,
+    }
+
+
+def _arrow_to_frame(table) -> pd.DataFrame:
+    """
+    Arrow 表（或记录批）转为 DataFrame：字典列转为 category，评论内容保持为 Arrow 字符串（string[pyarrow]），
+    不为每条评论创建 Python 字符串对象；转换过程中逐列释放 Arrow 内存。
+    """
+    import pyarrow as pa
+
+    types_mapper = {pa.string(): pd.StringDtype("pyarrow")}.get
+    if isinstance(table, pa.RecordBatch):
+        return table.to_pandas(types_mapper=types_mapper)
+    return table.to_pandas(
+        self_destruct=True, split_blocks=True, types_mapper=types_mapper
+    )
+
+
+def read_comment_csv(csv_path: str) -> pd.DataFrame:
+    """
+    读取导出的评论 CSV，只读取分析所需的列，读取时即确定类型并解析评论时间。
+    安装了 pyarrow 时用其多线程 CSV 解析器（允许评论内容中含换行）；否则使用 pandas 默认引擎。
+    """
+    names = [name for _, name in ANALYSIS_COLUMNS]
+    try:
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        return pd.read_csv(
+            csv_path,
+            usecols=names,
+            dtype=_CSV_DTYPES,
+            parse_dates=["评论时间"],
+            date_format="%Y-%m-%d %H:%M:%S",
+            encoding="utf-8-sig",
+        )
+    table = pa_csv.read_csv(
+        csv_path,
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=names, column_types=_arrow_types()
+        ),
+    )
+    return _arrow_to_frame(table)
+
+
+def iter_comment_csv(csv_path: str, chunk_size: int = 50000) -> Iterator[pd.DataFrame]:
+    """
+    分块读取导出的评论 CSV，列与类型同 read_comment_csv，每块约 chunk_size 行，内存占用与总行数无关。
+    安装了 pyarrow 时使用其流式 CSV 读取器，否则使用 pandas 的 chunksize。
+    """
+    names = [name for _, name in ANALYSIS_COLUMNS]
+    try:
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        yield from pd.read_csv(
+            csv_path,
+            usecols=names,
+            dtype=_CSV_DTYPES,
+            parse_dates=["评论时间"],
+            date_format="%Y-%m-%d %H:%M:%S",
+            encoding="utf-8-sig",
+            chunksize=chunk_size,
+        )
+        return
+    reader = pa_csv.open_csv(
+        csv_path,
+        # 按平均每行约 200 字节估算块大小
+        read_options=pa_csv.ReadOptions(block_size=max(chunk_size * 200, 1 << 20)),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=names, column_types=_arrow_types()
+        ),
+    )
+    for batch in reader:
+        yield _arrow_to_frame(batch)
+
+
+def iter_comment_parquet(parquet_path: str, chunk_size: int = 50000) -> Iterator[pd.DataFrame]:
+    """分块读取导出的 Parquet 中分析所需的列（需 pyarrow）。"""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(parquet_path)
+    for batch in parquet_file.iter_batches(
+        batch_size=chunk_size, columns=[name for _, name in ANALYSIS_COLUMNS]
+    ):
+        yield _arrow_to_frame(batch)
+
+
+def read_comment_parquet(parquet_path: str) -> pd.DataFrame:
+    """读取导出的 Parquet 中分析所需的列（需 pyarrow）。"""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(parquet_path, columns=[name for _, name in ANALYSIS_COLUMNS])
+    return _arrow_to_frame(table)
@@ -0,0 +1,44 @@
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+import pandas as pd
+from repository.content_cache_repository import ContentCacheRepository
+from utils.digest import row_digest
+
+
+def compute_with_cache(
+    rpids: Iterable,
+    texts: Iterable,
+    compute: Callable[[List], List],
+    repo: Optional[ContentCacheRepository] = None,
+    missing_value: Any = None,
+) -> Tuple[List, int, int]:
+    """
+    按评论内容缓存的计算：评论ID与内容摘要都与 repo 中缓存匹配的直接复用，
+    其余（新增或内容被编辑过的）评论交给 compute（输入为评论内容列表，返回等长的结果列表）计算，
+    并把新结果写回缓存。内容缺失的评论不计算，结果为 missing_value。repo 为 None 时不使用缓存。
+    返回 (与输入顺序一致的结果列表, 复用条数, 新计算条数)。
+    """
+    rpids = [int(rpid) for rpid in rpids]
+    texts = list(texts)
+    hashes = [row_digest(text) if pd.notnull(text) else None for text in texts]
+    values = [missing_value] * len(texts)
+
+    cached = repo.get(rpids) if repo else {}
+    missing = []
+    reused = 0
+    for i, (rpid, content_hash) in enumerate(zip(rpids, hashes)):
+        if content_hash is None:
+            continue
+        hit = cached.get(rpid)
+        if hit is not None and hit[0] == content_hash:
+            values[i] = hit[1]
+            reused += 1
+        else:
+            missing.append(i)
+
+    if missing:
+        new_values = compute([texts[i] for i in missing])
+        for i, value in zip(missing, new_values):
+            values[i] = value
+        if repo:
+            repo.save((rpids[i], hashes[i], values[i]) for i in missing)
+    return values, reused, len(missing)
@@ -0,0 +1,30 @@
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
+
+def map_in_batches(
+    func: Callable[[List], List],
+    items: Sequence,
+    batch_size: int,
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+) -> List:
+    """
+    把 items 按 batch_size 分批交给 func（需为模块级函数，以便传给子进程），按原顺序拼接各批结果。
+    传入 executor 时复用它（适合多次调用），否则临时创建 max_workers 个进程（默认为 CPU 核数）；
+    只有一批或只有一个进程可用时直接在当前进程计算，免去进程启动和数据传输的开销。
+    """
+    items = list(items)
+    batches = [items[start:start + batch_size] for start in range(0, len(items), batch_size)]
+    if len(batches) <= 1:
+        return func(items)
+    if executor is None:
+        workers = min(max_workers or os.cpu_count() or 1, len(batches))
+        if workers == 1:
+            return func(items)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(func, batches))
+    else:
+        results = list(executor.map(func, batches))
+    return [result for batch in results for result in batch]
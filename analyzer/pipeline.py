@@ -0,0 +1,160 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+class AnalysisTask:
+    """
+    分析流水线中的一个任务。func(analyzer, executor, **inputs) 的返回值作为任务结果，
+    inputs 为所依赖任务的名称，其结果以同名关键字参数传入。
+    local 为 True 的任务在主进程的线程中执行，把批量计算分发到 executor 进程池（情感分数、分词等中间结果）；
+    其余任务在进程池的工作进程中执行（绘图），此时 executor 为 None。
+    func 需为模块级函数（或其 partial），以便传给工作进程。
+    """
+
+    __slots__ = ("name", "func", "inputs", "local")
+
+    def __init__(self, name: str, func: Callable, inputs: Sequence[str] = (), local: bool = False):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.local = local
+
+
+def _call_method(analyzer, executor, method: str):
+    """调用 CommentAnalyzer 上无参数的分析方法。"""
+    return getattr(analyzer, method)()
+
+
+def _sentiment_scores(analyzer, executor):
+    return analyzer.compute_sentiment_scores(executor)
+
+
+def _word_counts(analyzer, executor):
+    return analyzer.compute_word_counts(executor)
+
+
+def _sentiment_chart(analyzer, executor, sentiment_scores):
+    analyzer.analyze_sentiment(sentiment_scores)
+
+
+def _wordcloud_chart(analyzer, executor, word_counts):
+    analyzer.generate_wordcloud(word_counts)
+
+
+def _chart(method: str) -> AnalysisTask:
+    """直接调用 CommentAnalyzer 同名方法、无依赖的绘图任务，任务名为方法名去掉 analyze_ 前缀。"""
+    return AnalysisTask(method.replace("analyze_", ""), partial(_call_method, method=method))
+
+
+# 中间结果：情感分数与词频只计算一次，计算本身在进程池中分批并行
+SENTIMENT_SCORES_TASK = AnalysisTask("sentiment_scores", _sentiment_scores, local=True)
+WORD_COUNTS_TASK = AnalysisTask("word_counts", _word_counts, local=True)
+
+# 与 run_mini_analysis 相同的分析
+MINI_ANALYSIS_TASKS = [
+    _chart("analyze_comment_time_trend"),
+    _chart("analyze_comment_hour_distribution"),
+    SENTIMENT_SCORES_TASK,
+    AnalysisTask("sentiment", _sentiment_chart, inputs=("sentiment_scores",)),
+    WORD_COUNTS_TASK,
+    AnalysisTask("wordcloud", _wordcloud_chart, inputs=("word_counts",)),
+]
+
+# 与 run_all_analysis 相同的分析
+ALL_ANALYSIS_TASKS = [
+    _chart("analyze_ip_distribution"),
+    _chart("analyze_vip_status"),
+    _chart("analyze_gender_distribution"),
+    _chart("analyze_level_distribution"),
+    *MINI_ANALYSIS_TASKS,
+    _chart("analyze_radar_chart"),
+]
+
+
+_worker_analyzer = None
+
+
+def _init_worker(analyzer):
+    """工作进程初始化：保存已加载数据的分析器（每个进程只接收一次），并设置绘图字体。"""
+    global _worker_analyzer
+    _worker_analyzer = analyzer
+    analyzer._setup_matplotlib_font()
+
+
+def _timed(func: Callable, analyzer, executor, inputs: dict):
+    start = time.perf_counter()
+    result = func(analyzer, executor, **inputs)
+    return result, time.perf_counter() - start
+
+
+def _run_in_worker(func: Callable, inputs: dict):
+    return _timed(func, _worker_analyzer, None, inputs)
+
+
+def _check_tasks(tasks: List[AnalysisTask]):
+    names = [task.name for task in tasks]
+    if len(set(names)) != len(names):
+        raise ValueError(f"分析任务名称重复: {names}")
+    for task in tasks:
+        for name in task.inputs:
+            if name not in names:
+                raise ValueError(f"分析任务 {task.name} 依赖的任务 {name} 不存在")
+
+
+def run_analysis_pipeline(
+    analyzer, tasks: List[AnalysisTask], max_workers: Optional[int] = None
+) -> Dict[str, float]:
+    """
+    按依赖关系执行分析任务：依赖都已完成的任务立即提交，互不依赖的任务在 max_workers 个进程
+    （默认为 CPU 核数）中并行执行。analyzer 需已调用 load_data，评论数据与去重用户表在每个工作进程中
+    只传入一次，各任务共用。某个任务失败时跳过依赖它的任务，其余任务照常执行。
+    返回并打印各任务耗时 {任务名: 秒}（失败或跳过的任务不在其中）。
+    """
+    _check_tasks(tasks)
+    start = time.perf_counter()
+    pending = {task.name: task for task in tasks}
+    results = {}
+    failed = set()
+    timings = {}
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(analyzer,)
+    ) as executor, ThreadPoolExecutor() as local_executor:
+        running = {}
+        while pending or running:
+            # 先提交工作进程任务：fork 方式下进程池在首次提交时创建全部进程，此时还没有启动本地线程
+            for name, task in sorted(pending.items(), key=lambda item: item[1].local):
+                if any(dependency in failed for dependency in task.inputs):
+                    print(f"跳过分析任务 {name}：依赖的任务失败。")
+                    failed.add(name)
+                    del pending[name]
+                elif all(dependency in results for dependency in task.inputs):
+                    inputs = {dependency: results[dependency] for dependency in task.inputs}
+                    if task.local:
+                        future = local_executor.submit(_timed, task.func, analyzer, executor, inputs)
+                    else:
+                        future = executor.submit(_run_in_worker, task.func, inputs)
+                    running[future] = task
+                    del pending[name]
+            if not running:
+                if pending and not any(
+                    dependency in failed for task in pending.values() for dependency in task.inputs
+                ):
+                    raise ValueError(f"分析任务存在循环依赖: {list(pending)}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                try:
+                    results[task.name], timings[task.name] = future.result()
+                except Exception as e:
+                    print(f"分析任务 {task.name} 失败: {e}")
+                    failed.add(task.name)
+
+    total = time.perf_counter() - start
+    print("各分析任务耗时：")
+    for name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+        print(f"  {name}: {seconds:.2f} 秒")
+    print(f"总耗时 {total:.2f} 秒（各任务耗时之和 {sum(timings.values()):.2f} 秒）")
+    return timings
@@ -0,0 +1,91 @@
+from concurrent.futures import Executor
+from typing import Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from analyzer.content_cache import compute_with_cache
+from analyzer.parallel import map_in_batches
+from analyzer.sentiment_model import load_sentiment_model
+from repository.content_cache_repository import ContentCacheRepository
+from utils.config import SENTIMENT_BACKEND, SENTIMENT_MODEL_PATH
+
+SENTIMENT_BACKENDS = ("snownlp", "naive_bayes")
+
+# 每个进程任务计算的评论条数：足够大以摊薄进程间传输开销，又能让各进程负载均衡
+SENTIMENT_BATCH_SIZE = 2000
+
+
+def score_sentiment(text) -> Optional[float]:
+    """SnowNLP 情感分数（0-1，越大越积极），缺失的评论内容返回 None。"""
+    from snownlp import SnowNLP
+
+    return SnowNLP(str(text)).sentiments if pd.notnull(text) else None
+
+
+def _score_batch(texts: List) -> List[Optional[float]]:
+    """在进程池中计算一批评论的情感分数（SnowNLP 模型在每个进程中只加载一次）。"""
+    return [score_sentiment(text) for text in texts]
+
+
+def score_sentiments(
+    texts: Iterable,
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+    batch_size: int = SENTIMENT_BATCH_SIZE,
+) -> List[Optional[float]]:
+    """
+    计算一批评论内容的情感分数，结果与输入顺序一致。
+    评论按 batch_size 分批在进程池中并行计算，executor / max_workers 含义见 map_in_batches。
+    """
+    return map_in_batches(_score_batch, texts, batch_size, executor, max_workers)
+
+
+def score_comment_sentiments(
+    rpids: Iterable,
+    texts: Iterable,
+    db_name: Optional[str] = None,
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+    backend: str = SENTIMENT_BACKEND,
+) -> np.ndarray:
+    """
+    计算一批评论的情感分数，返回 float64 数组（缺失为 NaN）。
+    backend="naive_bayes" 时用向量化的朴素贝叶斯模型整列打分，不使用缓存；
+    backend="snownlp" 时带缓存：给定 db_name 时先查 sentiment_cache，评论ID与内容摘要都匹配的直接复用，
+    只对新增或内容被编辑过的评论调用 score_sentiments，并把新分数写回缓存。
+    db_name 为 None 时不使用缓存。
+    """
+    if backend == "naive_bayes":
+        return load_sentiment_model(SENTIMENT_MODEL_PATH).score(texts)
+    if backend != "snownlp":
+        raise ValueError(f"不支持的情感分析后端: {backend}，可选 {list(SENTIMENT_BACKENDS)}")
+
+    repo = ContentCacheRepository(db_name, "sentiment_cache") if db_name else None
+    scores, reused, computed = compute_with_cache(
+        rpids,
+        texts,
+        lambda missing: score_sentiments(missing, executor=executor, max_workers=max_workers),
+        repo,
+    )
+    if repo:
+        print(f"情感分析：复用缓存 {reused} 条，新计算 {computed} 条。")
+    return np.array(scores, dtype=np.float64)
+
+
+def classify_sentiment(score) -> str:
+    """把情感分数划分为 积极 / 消极 / 中立，缺失为 未知。"""
+    if score is None or pd.isna(score):
+        return "未知"
+    elif score > 0.7:
+        return "积极"
+    elif score < 0.3:
+        return "消极"
+    else:
+        return "中立"
+
+
+def classify_sentiments(scores) -> np.ndarray:
+    """classify_sentiment 的向量化版本：对一列分数一次性划分，返回字符串数组。"""
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.select(
+        [np.isnan(scores), scores > 0.7, scores < 0.3], ["未知", "积极", "消极"], "中立"
+    )
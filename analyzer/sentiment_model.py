@@ -0,0 +1,162 @@
+import argparse
+import codecs
+import os
+from typing import Dict, Iterable
+import numpy as np
+import pandas as pd
+from analyzer.comment_frame import read_comment_csv
+from utils.config import SENTIMENT_MODEL_PATH
+
+# 特征哈希桶数 2^HASH_BITS；单字 + 二字组合在评论语料上冲突很少，模型约 1 MB
+HASH_BITS = 18
+NGRAM_RANGE = (1, 2)
+# Fibonacci 哈希乘数，把 n-gram 的 64 位组合值均匀映射到高位
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_CODE_MULTIPLIER = np.uint64(0x100000001B3)
+
+
+def _hashed_ngrams(texts: Iterable, hash_bits: int = HASH_BITS, ngram_range=NGRAM_RANGE):
+    """
+    把一列文本向量化为字符 n-gram 的哈希特征，返回 (文档下标, 特征下标) 两个等长数组，
+    相当于稀疏词袋矩阵的 COO 形式。全部文本拼接为一个 UTF-32 码点数组后用数组运算计算，
+    不为每条评论创建 Python 对象；跨越两条文本边界的 n-gram 被剔除。
+    """
+    texts = ["" if not isinstance(text, str) else text for text in texts]
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    owners = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+
+    doc_parts, feature_parts = [], []
+    shift = np.uint64(64 - hash_bits)
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        count = len(codes) - n + 1
+        if count <= 0:
+            continue
+        combined = codes[:count] + np.uint64(n)
+        same_doc = np.ones(count, dtype=bool)
+        for k in range(1, n):
+            combined = combined * _CODE_MULTIPLIER + codes[k:k + count]
+            same_doc &= owners[:count] == owners[k:k + count]
+        doc_parts.append(owners[:count][same_doc])
+        feature_parts.append(((combined[same_doc] * _HASH_MULTIPLIER) >> shift).astype(np.int64))
+    if not doc_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(doc_parts), np.concatenate(feature_parts)
+
+
+class NaiveBayesSentiment:
+    """
+    基于字符 n-gram 哈希特征的多项式朴素贝叶斯情感模型，对整列评论一次性打分。
+    分数为积极类的后验概率 (0-1)，与 SnowNLP 的取值含义一致；SnowNLP 本身也是朴素贝叶斯，
+    差别在于这里不做分词，特征直接取单字和相邻二字。
+    """
+
+    def __init__(self, weights: np.ndarray, bias: float, hash_bits: int = HASH_BITS):
+        self.weights = weights
+        self.bias = bias
+        self.hash_bits = hash_bits
+
+    @classmethod
+    def fit(cls, texts: Iterable, positive, hash_bits: int = HASH_BITS, alpha: float = 1.0):
+        """
+        训练模型。positive 为每条文本属于积极类的概率：0/1 硬标签，或 SnowNLP 分数等软标签
+        （按概率同时计入两类），可以用 SnowNLP 对已有评论的打分蒸馏出与其一致的模型。
+        """
+        texts = list(texts)
+        positive = np.asarray(positive, dtype=np.float64)
+        docs, features = _hashed_ngrams(texts, hash_bits)
+        size = 1 << hash_bits
+        pos_counts = np.bincount(features, weights=positive[docs], minlength=size)
+        neg_counts = np.bincount(features, weights=1.0 - positive[docs], minlength=size)
+        pos_log = np.log(pos_counts + alpha) - np.log(pos_counts.sum() + alpha * size)
+        neg_log = np.log(neg_counts + alpha) - np.log(neg_counts.sum() + alpha * size)
+        pos_docs = positive.sum()
+        bias = float(np.log(pos_docs) - np.log(len(positive) - pos_docs))
+        return cls((pos_log - neg_log).astype(np.float32), bias, hash_bits)
+
+    def score(self, texts: Iterable) -> np.ndarray:
+        """对一批文本打分，返回 float64 数组；缺失或空的文本为 NaN。"""
+        texts = list(texts)
+        docs, features = _hashed_ngrams(texts, self.hash_bits)
+        log_odds = self.bias + np.bincount(
+            docs, weights=self.weights[features], minlength=len(texts)
+        )
+        scores = 1.0 / (1.0 + np.exp(-np.clip(log_odds, -500, 500)))
+        scores[np.bincount(docs, minlength=len(texts)) == 0] = np.nan
+        return scores
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(
+            path, weights=self.weights, bias=self.bias, hash_bits=self.hash_bits
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls(data["weights"], float(data["bias"]), int(data["hash_bits"]))
+
+
+def train_from_snownlp_corpus(hash_bits: int = HASH_BITS) -> NaiveBayesSentiment:
+    """用 SnowNLP 自带的情感训练语料（neg.txt / pos.txt）训练模型。"""
+    import snownlp.sentiment
+
+    corpus_dir = os.path.dirname(snownlp.sentiment.__file__)
+    texts, labels = [], []
+    for name, label in (("neg.txt", 0.0), ("pos.txt", 1.0)):
+        with codecs.open(os.path.join(corpus_dir, name), "r", "utf-8") as f:
+            for line in f:
+                texts.append(line.strip())
+                labels.append(label)
+    return NaiveBayesSentiment.fit(texts, labels, hash_bits)
+
+
+def train_from_snownlp_labels(texts: Iterable, hash_bits: int = HASH_BITS) -> NaiveBayesSentiment:
+    """以 SnowNLP 对给定评论的打分为软标签训练模型（离线蒸馏），缺失的评论不参与训练。"""
+    from analyzer.sentiment import score_sentiments
+
+    texts = [text for text in texts if pd.notnull(text)]
+    return NaiveBayesSentiment.fit(texts, score_sentiments(texts), hash_bits)
+
+
+_models: Dict[str, NaiveBayesSentiment] = {}
+
+
+def load_sentiment_model(model_path: str) -> NaiveBayesSentiment:
+    """
+    加载 model_path 处的模型，按路径缓存，每个路径在进程内只加载一次。
+    模型需先离线训练（python -m analyzer.sentiment_model），文件不存在时抛出 FileNotFoundError。
+    """
+    path = os.path.abspath(model_path)
+    if path not in _models:
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"未找到情感模型 {model_path}，请先运行 python -m analyzer.sentiment_model 训练"
+            )
+        _models[path] = NaiveBayesSentiment.load(path)
+    return _models[path]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线训练朴素贝叶斯情感模型")
+    parser.add_argument("--output", default=SENTIMENT_MODEL_PATH, help="模型保存路径")
+    parser.add_argument(
+        "--csv", help="导出的评论 CSV；给定时以 SnowNLP 对其中评论的打分为软标签训练，否则使用 SnowNLP 自带语料"
+    )
+    parser.add_argument("--hash-bits", type=int, default=HASH_BITS, help="特征哈希位数")
+    args = parser.parse_args()
+
+    if args.csv:
+        print(f"使用 SnowNLP 对 {args.csv} 中评论的打分训练...")
+        model = train_from_snownlp_labels(read_comment_csv(args.csv)["评论内容"], args.hash_bits)
+    else:
+        print("使用 SnowNLP 自带语料训练...")
+        model = train_from_snownlp_corpus(args.hash_bits)
+    model.save(args.output)
+    print(f"情感模型已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import collections
+from concurrent.futures import Executor
+from typing import Iterable, Optional, Set
+import numpy as np
+import pandas as pd
+from analyzer.comment_frame import USER_COLUMNS
+from analyzer.sentiment import classify_sentiments, score_comment_sentiments
+from analyzer.tokens import segment_comments
+
+# 每次分词并累加词频的评论条数，限制分词结果的内存占用
+WORD_COUNT_CHUNK = 20000
+
+# 词频表超过该词数时只保留高频的一半，使内存占用有上限（词云只用到高频词）
+MAX_VOCABULARY = 200000
+
+# 按去重用户统计的维度
+_USER_DIMENSIONS = ("IP属地", "性别", "用户等级", "是否是大会员")
+
+
+def count_words(
+    texts: Iterable,
+    stopwords: Set[str],
+    counter: Optional[collections.Counter] = None,
+    rpids: Optional[Iterable] = None,
+    db_name: Optional[str] = None,
+    executor: Optional[Executor] = None,
+) -> collections.Counter:
+    """
+    对一批评论分词并累加词频到 counter：去掉 B 站表情，过滤停用词和单字词。
+    分词在进程池中并行；给出 rpids 与 db_name 时使用分词缓存，见 segment_comments。
+    """
+    if counter is None:
+        counter = collections.Counter()
+    for tokens in segment_comments(texts, rpids=rpids, db_name=db_name, executor=executor):
+        counter.update(word for word in tokens.split() if word not in stopwords)
+    return counter
+
+
+class StreamingCommentStats:
+    """
+    流式分析累加器：逐块调用 update，累计与 CommentAnalyzer 各项分析相同的统计结果。
+    - IP属地 / 性别 / 等级 / 大会员：按用户首次出现的评论统计（与按用户ID去重一致），
+      已见用户ID保存在有序 int64 数组中，每个用户占 8 字节；
+    - 每日 / 每小时评论数、情感分类计数与平均分：只保存计数；
+    - 词频：超过 max_vocabulary 个词时裁剪低频词。
+    情感分数与分词结果使用 cache_db 中的缓存（为 None 时不缓存），并在 executor 进程池中并行计算。
+    内存占用与评论总数无关，但已见用户集合为 O(去重用户数)：每个用户 8 字节，
+    每块合并新用户时新旧数组短暂并存，峰值约为两倍（1000 万用户约 80 MB，峰值约 160 MB）。
+    各维度要按用户首条评论精确计数，需要逐个判断用户是否已出现过，
+    HyperLogLog 之类的基数估计只能给出用户总数的近似值，无法替代该集合。块需按时间升序给出。
+    """
+
+    def __init__(
+        self,
+        stopwords: Optional[Set[str]] = None,
+        sentiment: bool = True,
+        words: bool = True,
+        max_vocabulary: int = MAX_VOCABULARY,
+        cache_db: Optional[str] = None,
+        executor: Optional[Executor] = None,
+    ):
+        self.stopwords = stopwords or set()
+        self.sentiment = sentiment
+        self.words = words
+        self.max_vocabulary = max_vocabulary
+        self.cache_db = cache_db
+        self.executor = executor
+        self.row_count = 0
+        self.seen_users = np.empty(0, dtype=np.int64)
+        self.user_counts = {dimension: collections.Counter() for dimension in _USER_DIMENSIONS}
+        self.day_counts = collections.Counter()
+        self.hour_counts = np.zeros(24, dtype=np.int64)
+        self.sentiment_counts = collections.Counter()
+        self.sentiment_sum = 0.0
+        self.sentiment_scored = 0
+        self.word_counts = collections.Counter()
+
+    def update(self, chunk: pd.DataFrame):
+        """累加一块评论（列名同导出 CSV）。"""
+        if chunk.empty:
+            return
+        self.row_count += len(chunk)
+        self._update_users(chunk)
+
+        times = chunk["评论时间"].dropna()
+        self.day_counts.update(times.dt.normalize().value_counts().to_dict())
+        self.hour_counts += np.bincount(times.dt.hour.to_numpy(), minlength=24)
+
+        if self.sentiment:
+            scores = pd.Series(
+                score_comment_sentiments(
+                    chunk["评论ID"],
+                    chunk["评论内容"],
+                    db_name=self.cache_db,
+                    executor=self.executor,
+                ),
+                dtype="float64",
+            )
+            self.sentiment_counts.update(
+                pd.Series(classify_sentiments(scores)).value_counts().to_dict()
+            )
+            self.sentiment_sum += scores.sum()
+            self.sentiment_scored += int(scores.count())
+
+        if self.words:
+            contents = chunk["评论内容"]
+            rpids = chunk["评论ID"]
+            for start in range(0, len(contents), WORD_COUNT_CHUNK):
+                count_words(
+                    contents.iloc[start:start + WORD_COUNT_CHUNK],
+                    self.stopwords,
+                    self.word_counts,
+                    rpids=rpids.iloc[start:start + WORD_COUNT_CHUNK],
+                    db_name=self.cache_db,
+                    executor=self.executor,
+                )
+            if len(self.word_counts) > self.max_vocabulary:
+                self.word_counts = collections.Counter(
+                    dict(self.word_counts.most_common(self.max_vocabulary // 2))
+                )
+
+    def _update_users(self, chunk: pd.DataFrame):
+        first_in_chunk = chunk.loc[~chunk["用户ID"].duplicated(), USER_COLUMNS]
+        mids = first_in_chunk["用户ID"].to_numpy(dtype=np.int64)
+        if len(self.seen_users):
+            positions = np.searchsorted(self.seen_users, mids)
+            positions[positions == len(self.seen_users)] = 0
+            is_new = self.seen_users[positions] != mids
+        else:
+            is_new = np.ones(len(mids), dtype=bool)
+        new_users = first_in_chunk[is_new]
+        for dimension in _USER_DIMENSIONS:
+            counts = new_users[dimension].value_counts()
+            self.user_counts[dimension].update(counts[counts > 0].to_dict())
+        self.seen_users = np.sort(
+            np.concatenate([self.seen_users, mids[is_new]]), kind="stable"
+        )
+
+    # ---- 结果：与 CommentAnalyzer 中对应分析的输入格式一致 ----
+
+    def _user_series(self, dimension: str) -> pd.Series:
+        return pd.Series(dict(self.user_counts[dimension]), dtype="int64")
+
+    def ip_counts(self) -> pd.Series:
+        counts = self._user_series("IP属地").drop("未知", errors="ignore")
+        return counts.sort_values(ascending=False, kind="stable").head(10)
+
+    def gender_counts(self) -> pd.Series:
+        return self._user_series("性别").sort_values(ascending=False, kind="stable")
+
+    def vip_counts(self) -> pd.Series:
+        return self._user_series("是否是大会员").sort_values(ascending=False, kind="stable")
+
+    def level_counts(self) -> pd.Series:
+        return self._user_series("用户等级").sort_index()
+
+    def daily_counts(self) -> pd.Series:
+        counts = pd.Series(dict(self.day_counts), dtype="int64").sort_index()
+        counts.index = pd.DatetimeIndex(counts.index).date
+        return counts
+
+    def hourly_counts(self) -> pd.Series:
+        return pd.Series(self.hour_counts, index=pd.Index(range(24)))
+
+    def sentiment_distribution(self) -> pd.Series:
+        return pd.Series(dict(self.sentiment_counts), dtype="int64").sort_values(
+            ascending=False, kind="stable"
+        )
+
+    def average_sentiment(self) -> Optional[float]:
+        if not self.sentiment_scored:
+            return None
+        return self.sentiment_sum / self.sentiment_scored
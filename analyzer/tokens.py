@@ -0,0 +1,43 @@
+from concurrent.futures import Executor
+from typing import Iterable, List, Optional
+from analyzer.content_cache import compute_with_cache
+from analyzer.parallel import map_in_batches
+from repository.content_cache_repository import ContentCacheRepository
+from utils.text_segment import segment_cloud_words
+
+# 每个进程任务分词的评论条数
+TOKEN_BATCH_SIZE = 2000
+
+
+def _segment_batch(texts: List) -> List[str]:
+    """在进程池中为一批评论分词，每条结果以空格连接（jieba 词典在每个进程中只加载一次）。"""
+    return [" ".join(segment_cloud_words(text)) for text in texts]
+
+
+def segment_comments(
+    texts: Iterable,
+    rpids: Optional[Iterable] = None,
+    db_name: Optional[str] = None,
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+) -> List[str]:
+    """
+    为一批评论分词（逐条分词，在进程池中分批并行），返回以空格连接的分词结果，缺失的评论为空串。
+    同时给出 rpids 与 db_name 时使用 comment_tokens 缓存：评论ID与内容摘要都匹配的直接复用，
+    只为新增或内容被编辑过的评论分词，并把结果写回缓存。
+    """
+    texts = list(texts)
+    if rpids is None or db_name is None:
+        return map_in_batches(_segment_batch, texts, TOKEN_BATCH_SIZE, executor, max_workers)
+
+    tokens, reused, computed = compute_with_cache(
+        rpids,
+        texts,
+        lambda missing: map_in_batches(
+            _segment_batch, missing, TOKEN_BATCH_SIZE, executor, max_workers
+        ),
+        ContentCacheRepository(db_name, "comment_tokens"),
+        missing_value="",
+    )
+    print(f"分词：复用缓存 {reused} 条，新分词 {computed} 条。")
+    return tokens
@@ -7,9 +7,9 @@ import urllib
 import time
 import datetime  # 替换 pandas.to_datetime
 from entity.bv import Bv
-from entity.comment import Comment
+from entity.comment_batch import CommentBatch
 from entity.user import User
-from repository.comment_repository import CommentRepository
+from repository.sharded_comment_repository import open_comment_repository
 from repository.user_repository import UserRepository
 from repository.bv_repository import BvRepository
 from utils.config import *
@@ -32,7 +32,7 @@ class BilibiliCommentCrawler:
         self.count = 0  # 爬取到的评论总数
 
         # 数据库 Repository 实例
-        self.comment_repo = CommentRepository(db_name)
+        self.comment_repo = open_comment_repository(db_name)
         self.user_repo = UserRepository(db_name)
         self.bv_repo = BvRepository(db_name)
 
@@ -96,9 +96,10 @@ class BilibiliCommentCrawler:
         self.bv_repo.add_or_update_bv(bv_obj)
         return self.oid, self.title
 
-    def _parse_and_save_comment(
+    def _parse_comment(
         self, raw_comment_data: dict, is_secondary: bool = False, parent_rpid: int = 0
-    ):
+    ) -> tuple[User, tuple]:
+        """解析一条评论，返回 (用户, 评论行)；评论行按 COMMENT_FIELDS 顺序排列，用于追加到 CommentBatch。"""
         # 提取用户数据
         member_info = raw_comment_data["member"]
         user_mid = member_info["mid"]
@@ -122,8 +123,6 @@ class BilibiliCommentCrawler:
             like_num=user_like_num,
             vip=user_vip_status,
         )
-        # 将用户信息存入数据库，mid存在则更新，不存在则插入
-        self.user_repo.add_or_update_user(user_obj)
 
         # 提取评论数据
         rpid = raw_comment_data["rpid"]
@@ -156,30 +155,34 @@ class BilibiliCommentCrawler:
         if ip_location.startswith("IP属地："):
             ip_location = ip_location[5:]
         type = int(raw_comment_data["type"])
-        # 创建 Comment 实体
-        comment_obj = Comment(
-            rpid=rpid,
-            parentid=comment_parentid,
-            rootid=comment_rootid,
-            mid=user_mid,
-            name=user_name,
-            level=comment_level,
-            sex=user_sex,
-            information=comment_info,
-            time=comment_time,
-            single_reply_num=single_reply_num,
-            single_like_num=single_like_num,
-            sign=user_sign,
-            ip_location=ip_location,
-            vip=user_vip_status,
-            face=user_face,
-            oid=int(self.oid),  # oid是视频唯一ID
-            type=type
+        # 评论行，字段顺序同 COMMENT_FIELDS
+        comment_row = (
+            rpid,
+            comment_parentid,
+            comment_rootid,
+            user_mid,
+            user_name,
+            comment_level,
+            user_sex,
+            comment_info,
+            comment_time,
+            single_reply_num,
+            single_like_num,
+            user_sign,
+            ip_location,
+            user_vip_status,
+            user_face,
+            int(self.oid),  # oid是视频唯一ID
+            type,
         )
-        # 将评论数据存入数据库，rpid存在则更新，不存在则插入
-        self.comment_repo.add_comment(
-            comment_obj, overwrite=True
-        )  # 允许覆盖，因为评论内容可能在抓取时有更新，例如点赞数
+        return user_obj, comment_row
+
+    def _save_page(self, users: list[User], comments: CommentBatch):
+        """将一页解析出的用户与评论批量写入数据库。"""
+        # mid存在则更新，不存在则插入
+        self.user_repo.add_or_update_users(users)
+        # rpid存在则更新，不存在则插入；允许覆盖，因为评论内容可能在抓取时有更新，例如点赞数
+        self.comment_repo.add_comments(comments, overwrite=True)
 
     # 轮页爬取
     def start(self) -> bool:
@@ -240,13 +243,17 @@ class BilibiliCommentCrawler:
             print(f"当前页无评论数据 (可能已爬取完或API返回空).")
             return False
 
+        page_users = []
+        page_comments = CommentBatch()
         for reply in replies:
             self.count += 1
             if self.count % 1000 == 0:
                 print(f"已爬取 {self.count} 条评论，暂停 {20} 秒以避免反爬。")
                 time.sleep(20)
 
-            self._parse_and_save_comment(reply, is_secondary=False)
+            user_obj, comment_row = self._parse_comment(reply, is_secondary=False)
+            page_users.append(user_obj)
+            page_comments.append(comment_row)
 
             # 二级评论
             single_reply_num = reply.get("reply_control", {}).get(
@@ -300,11 +307,13 @@ class BilibiliCommentCrawler:
                                     f"已爬取 {self.count} 条评论，暂停 {20} 秒以避免反爬。"
                                 )
                                 time.sleep(20)
-                            self._parse_and_save_comment(
+                            user_obj, comment_row = self._parse_comment(
                                 second_reply,
                                 is_secondary=True,
                                 parent_rpid=reply["rpid"],
                             )
+                            page_users.append(user_obj)
+                            page_comments.append(comment_row)
                     except requests.exceptions.RequestException as e:
                         print(
                             f"请求二级评论API失败 (rpid={reply['rpid']}, page={page_num}): {e}"
@@ -316,6 +325,9 @@ class BilibiliCommentCrawler:
                         )
                         break  # 跳过此根评论的后续二级评论
 
+        # 整页（含二级评论）一次性写入数据库
+        self._save_page(page_users, page_comments)
+
         # 更新下一页的pageID
         self.next_pageID = cursor_info["next"]
 
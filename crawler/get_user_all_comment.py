@@ -2,8 +2,8 @@ import requests
 import json
 import time
 from typing import List, Optional, Dict, Any
-from entity.comment import Comment
-from repository.comment_repository import CommentRepository
+from entity.comment_batch import CommentBatch
+from repository.sharded_comment_repository import open_comment_repository
 from utils.config import *
 
 
@@ -12,7 +12,7 @@ class BilibiliUserCommentsCrawler:
     def __init__(self, db_name: str = BILI_DB_PATH):
 
         self.base_url = "https://api.aicu.cc/api/v3/search/getreply"
-        self.comment_repo = CommentRepository(db_name)
+        self.comment_repo = open_comment_repository(db_name)
         self.crawled_comment_count = 0
         self.page_size = 500  # 每页评论数量
 
@@ -48,7 +48,10 @@ class BilibiliUserCommentsCrawler:
             )
             return None
 
-    def _parse_and_save_comment(self, raw_comment_data: Dict[str, Any], user_id: int):
+    def _parse_comment(
+        self, raw_comment_data: Dict[str, Any], user_id: int
+    ) -> Optional[tuple]:
+        """解析一条评论，返回按 COMMENT_FIELDS 排列的评论行（不含用户快照字段），失败时返回 None。"""
         try:
             rpid = int(raw_comment_data.get("rpid"))
             message = raw_comment_data.get("message", "")
@@ -63,22 +66,14 @@ class BilibiliUserCommentsCrawler:
             oid = int(dyn_data.get("oid", 0))  # 视频或内容的ID
             type = int(dyn_data.get("type", 0))  # 评论类型
 
-            comment_obj = Comment(
-                rpid=rpid,
-                parentid=parentid,
-                rootid=rootid,
-                mid=user_id,
-                information=message,
-                time=comment_time,
-                oid=oid,
-                type=type,
+            # 字段顺序同 COMMENT_FIELDS，用户快照相关字段留空
+            return (
+                rpid, parentid, rootid, user_id, None, None, None, message,
+                comment_time, None, None, None, None, None, None, oid, type,
             )
-            self.comment_repo.add_mini_comment(comment_obj, overwrite=True)  # 允许覆盖
-
-            self.crawled_comment_count += 1
-            # print(f"  - 存储评论: rpid={rpid}, oid={oid}")
         except Exception as e:
-            print(f"处理或存储评论数据失败 (rpid: {raw_comment_data.get('rpid')}): {e}")
+            print(f"处理评论数据失败 (rpid: {raw_comment_data.get('rpid')}): {e}")
+            return None
 
     def crawl_user_all_comments(self, uid: int, delay_seconds: float = 0.5) -> int:
         if not uid:
@@ -102,8 +97,14 @@ class BilibiliUserCommentsCrawler:
                 is_end = True  # 即使 is_end 为 false，如果 replies 为空也视为结束
                 break
 
+            page_comments = CommentBatch()
             for reply in replies:
-                self._parse_and_save_comment(reply, uid)
+                comment_row = self._parse_comment(reply, uid)
+                if comment_row is not None:
+                    page_comments.append(comment_row)
+            # 整页批量写入，允许覆盖
+            self.comment_repo.add_mini_comments(page_comments, overwrite=True)
+            self.crawled_comment_count += len(page_comments)
 
             cursor_info = data.get("cursor", {})
             is_end = cursor_info.get("is_end", True)  # 默认如果is_end缺失则视为结束
@@ -1,9 +1,705 @@
+import json
+import os
 import sqlite3
 
-from utils.config import BILI_DB_PATH
+from utils.config import (
+    BILI_DB_PATH,
+    COMMENT_ROLLUP_ENABLED,
+    COUNTER_HISTORY_ENABLED,
+    NORMALIZED_COMMENT_LAYOUT,
+    SEARCH_INDEX_ENABLED,
+)
+from utils.digest import register_digest_function
 
+# 写入时间戳（秒）。各表的 updated_at 记录最近一次实际写入（新增或内容变化）的时间，
+# 合并多台机器的数据库时据此判断哪一份更新
+NOW_EPOCH_SQL = "CAST(strftime('%s', 'now') AS INTEGER)"
 
-def init_bilibili_db(db_name):
+# 规范化布局下的用户快照表：同一用户的昵称/性别/签名/头像/VIP 每出现一个新组合记一个版本
+CREATE_USER_SNAPSHOT_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS user_snapshot (
+    snapshot_id INTEGER PRIMARY KEY,    -- 快照ID，评论行通过它引用用户快照
+    mid INTEGER NOT NULL,               -- 用户ID
+    version INTEGER NOT NULL,           -- 该用户的快照版本号，从1开始递增
+    name TEXT,                          -- 用户昵称
+    sex TEXT,                           -- 用户性别
+    sign TEXT,                          -- 个性签名
+    face TEXT,                          -- 头像URL
+    vip INTEGER,                        -- VIP状态 (0: 非VIP, 1: VIP)
+    digest INTEGER NOT NULL,            -- 快照字段摘要，用于去重
+    UNIQUE (mid, version),
+    UNIQUE (mid, digest)
+);
+"""
+
+# 规范化布局下的评论表：只保存评论本身的字段，用户信息通过 snapshot_id 引用
+CREATE_COMMENT_CORE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS comment_core (
+    rpid INTEGER PRIMARY KEY,           -- 评论ID，唯一标识，主键
+    parentid INTEGER,                   -- 父评论ID
+    rootid INTEGER,                     -- root评论ID
+    mid INTEGER,                        -- 发布评论的用户ID
+    level INTEGER,                      -- 用户等级
+    information TEXT,                   -- 评论内容
+    time INTEGER,                       -- 评论发布时间戳
+    single_reply_num INTEGER,           -- 单条评论的回复数
+    single_like_num INTEGER,            -- 单条评论的点赞数
+    ip_location TEXT,                   -- IP归属地
+    oid INTEGER,                        -- 视频或内容的ID
+    type INTEGER,                       -- 评论区类型 (1: 视频)
+    snapshot_id INTEGER REFERENCES user_snapshot (snapshot_id),  -- 用户快照ID
+    digest INTEGER,                     -- 可变字段摘要，用于跳过未变化的行
+    updated_at INTEGER                  -- 最近一次写入的时间戳
+);
+"""
+
+# 兼容视图：列顺序与非规范化的 comment 表完全一致，
+# 保证按列名或按位置读取 comment 的代码都无需修改
+CREATE_COMMENT_VIEW_SQL = """
+CREATE VIEW IF NOT EXISTS comment AS
+SELECT
+    c.rpid, c.parentid, c.rootid, c.mid, s.name, c.level, s.sex, c.information,
+    c.time, c.single_reply_num, c.single_like_num, s.sign, c.ip_location,
+    s.vip, s.face, c.oid, c.type, c.digest, c.updated_at
+FROM comment_core c
+LEFT JOIN user_snapshot s ON s.snapshot_id = c.snapshot_id;
+"""
+
+CREATE_COMMENT_VIEW_DELETE_TRIGGER_SQL = """
+CREATE TRIGGER IF NOT EXISTS comment_view_delete
+INSTEAD OF DELETE ON comment
+BEGIN
+    DELETE FROM comment_core WHERE rpid = old.rpid;
+END;
+"""
+
+
+def is_normalized_layout(conn: sqlite3.Connection) -> bool:
+    """comment 为视图时即为规范化布局（数据实际存放在 comment_core / user_snapshot）。"""
+    row = conn.execute(
+        "SELECT type FROM sqlite_master WHERE name = 'comment'"
+    ).fetchone()
+    return row is not None and row[0] == "view"
+
+
+def comment_storage_table(conn: sqlite3.Connection) -> str:
+    """返回评论数据实际存放的表名，写入与删除应直接作用在该表上。"""
+    return "comment_core" if is_normalized_layout(conn) else "comment"
+
+
+def has_search_index(conn: sqlite3.Connection) -> bool:
+    """是否建立了评论全文索引（见 SEARCH_INDEX_ENABLED）。"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'comment_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def _ensure_column(cursor, table: str, column: str, column_def: str):
+    """为旧版本数据库补充新增的列（CREATE TABLE IF NOT EXISTS 不会修改已有表）。"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_def}")
+        print(f"表 '{table}' 已新增列 '{column}'。")
+
+
+def _create_comment_indexes(cursor, table: str):
+    """评论查询用到的索引，建在评论数据实际存放的表上。"""
+    # rpid 为 rowid，会隐式附加在每个索引末尾，因此 (oid, time) 即覆盖 (oid, time, rpid) 的排序
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_oid_time ON {table} (oid, time)"
+    )
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_mid_time ON {table} (mid, time)"
+    )
+    # 评论楼层（thread）查询：按 rootid 取整楼，按 parentid 还原回复层级
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_rootid ON {table} (rootid)"
+    )
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_parentid ON {table} (parentid)"
+    )
+
+
+_SEARCH_INDEX_TRIGGERS = ("fts_insert", "fts_update", "fts_delete")
+
+
+def _create_search_index(cursor, table: str, enabled: bool = True):
+    """
+    评论内容全文索引。中文需先用 jieba 分词，SQLite 触发器内无法调用 jieba，
+    因此触发器只把新增或内容变化的 rpid 记入 comment_fts_pending，
+    由 CommentRepository.sync_search_index 分词后写入 comment_fts（rowid 即 rpid）。
+    触发器内不能依赖 INSERT OR IGNORE：外层 UPSERT 的冲突处理会覆盖它，这里用 NOT EXISTS 判重。
+    enabled 为 False 时移除触发器和索引（不再维护的索引会过期），重新开启时全部评论重新排队。
+    """
+    if not enabled:
+        for name in _SEARCH_INDEX_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {table}_{name}")
+        cursor.execute("DROP TABLE IF EXISTS comment_fts")
+        cursor.execute("DROP TABLE IF EXISTS comment_fts_pending")
+        return False
+    is_new_index = not has_search_index(cursor.connection)
+    cursor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(tokens)"
+    )
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS comment_fts_pending (rpid INTEGER PRIMARY KEY)"
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO comment_fts_pending (rpid)
+            SELECT new.rpid
+            WHERE NOT EXISTS (SELECT 1 FROM comment_fts_pending WHERE rpid = new.rpid);
+        END;
+        """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF information ON {table}
+        WHEN old.information IS NOT new.information
+        BEGIN
+            INSERT INTO comment_fts_pending (rpid)
+            SELECT new.rpid
+            WHERE NOT EXISTS (SELECT 1 FROM comment_fts_pending WHERE rpid = new.rpid);
+        END;
+        """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM comment_fts WHERE rowid = old.rpid;
+            DELETE FROM comment_fts_pending WHERE rpid = old.rpid;
+        END;
+        """
+    )
+    if is_new_index:
+        # 首次创建索引时，已有评论全部排队等待分词
+        cursor.execute(
+            f"INSERT OR IGNORE INTO comment_fts_pending (rpid) SELECT rpid FROM {table}"
+        )
+    return True
+
+
+# ---- 看板聚合（rollup）----
+# comment_rollup 按 (oid, bucket, dimension, value) 保存计数，由触发器随评论写入增量维护：
+#   bucket = 'comment'：按评论计数，dimension 为 day / hour
+#   bucket = 'user'   ：按去重用户计数，dimension 为 ip_location / level / sex / vip，
+#                       每个用户在每个视频下取其最早一条评论的属性（与分析时按用户去重保留首条一致），
+#                       该评论记录在 comment_rollup_user 中
+# 只统计视频评论 (type = 1)，与按 oid 导出的口径一致；缺失值记为空字符串。
+# 减到 0 的行不在触发器里逐条清理（代价过高），读取时过滤 count > 0 即可
+CREATE_COMMENT_ROLLUP_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS comment_rollup (
+    oid INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    value NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (oid, bucket, dimension, value)
+) WITHOUT ROWID;
+"""
+
+CREATE_COMMENT_ROLLUP_USER_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS comment_rollup_user (
+    oid INTEGER NOT NULL,
+    mid INTEGER NOT NULL,
+    rpid INTEGER NOT NULL,      -- 该用户在该视频下计入用户口径统计的评论
+    PRIMARY KEY (oid, mid)
+) WITHOUT ROWID;
+"""
+
+COMMENT_ROLLUP_DIMENSIONS = {
+    "comment": ("day", "hour"),
+    "user": ("ip_location", "level", "sex", "vip"),
+}
+
+_LOCAL_DAY = "strftime('%Y-%m-%d', {a}.time, 'unixepoch', 'localtime')"
+_LOCAL_HOUR = "CAST(strftime('%H', {a}.time, 'unixepoch', 'localtime') AS INTEGER)"
+
+
+def _rollup_user_fields(table: str, alias: str) -> dict:
+    """用户口径各维度的原始取值表达式；规范化布局下性别与 VIP 来自用户快照。"""
+    if table == "comment_core":
+        snapshot = "(SELECT {col} FROM user_snapshot WHERE snapshot_id = {a}.snapshot_id)"
+        sex = snapshot.format(col="sex", a=alias)
+        vip = snapshot.format(col="vip", a=alias)
+    else:
+        sex, vip = f"{alias}.sex", f"{alias}.vip"
+    return {
+        "ip_location": f"{alias}.ip_location",
+        "level": f"{alias}.level",
+        "sex": sex,
+        "vip": vip,
+    }
+
+
+def _rollup_user_columns(table: str, alias: str) -> str:
+    """用户口径统计所需的列（oid 及各维度，以维度名为列名）。"""
+    fields = _rollup_user_fields(table, alias)
+    return ", ".join(
+        [f"{alias}.oid AS oid"]
+        + [f"{fields[dim]} AS {dim}" for dim in COMMENT_ROLLUP_DIMENSIONS["user"]]
+    )
+
+
+def rollup_dimension_values(bucket: str, table: str, alias: str) -> list:
+    """返回 bucket 下各维度及其取值表达式，取值来自 alias 所指的评论行。"""
+    if bucket == "comment":
+        return [("day", _LOCAL_DAY.format(a=alias)), ("hour", _LOCAL_HOUR.format(a=alias))]
+    fields = _rollup_user_fields(table, alias)
+    return [(dim, f"COALESCE({fields[dim]}, '')") for dim in COMMENT_ROLLUP_DIMENSIONS[bucket]]
+
+
+def _rollup_row_upsert_sql(bucket: str, table: str, alias: str, delta: int, condition: str) -> str:
+    """
+    把触发器中 alias (new / old) 这一行按 bucket 的各个维度累加 delta 到 comment_rollup。
+    维度展开为 VALUES 子查询，比与维度表交叉连接再 CASE 取值开销小得多（每条评论写入都会执行）。
+    """
+    values = ", ".join(
+        f"('{dim}', {expr})" for dim, expr in rollup_dimension_values(bucket, table, alias)
+    )
+    return f"""
+        INSERT INTO comment_rollup (oid, bucket, dimension, value, count)
+        SELECT {alias}.oid, '{bucket}', column1, column2, {delta}
+        FROM (VALUES {values})
+        WHERE {condition}
+        ON CONFLICT (oid, bucket, dimension, value) DO UPDATE SET count = count + excluded.count;
+    """
+
+
+def _rollup_upsert_sql(bucket: str, source_sql: str, delta: int) -> str:
+    """把 source_sql 产生的行按 bucket 的各个维度累加 delta 到 comment_rollup（用于子查询选出的行）。"""
+    dimensions = COMMENT_ROLLUP_DIMENSIONS[bucket]
+    if bucket == "comment":
+        value = "CASE d.dimension WHEN 'day' THEN {} ELSE {} END".format(
+            _LOCAL_DAY.format(a="c"), _LOCAL_HOUR.format(a="c")
+        )
+    else:
+        value = "CASE d.dimension {} END".format(
+            " ".join(
+                f"WHEN '{dim}' THEN COALESCE(c.{dim}, '')" for dim in dimensions
+            )
+        )
+    dimension_rows = " UNION ALL ".join(f"SELECT '{dim}' AS dimension" for dim in dimensions)
+    return f"""
+        INSERT INTO comment_rollup (oid, bucket, dimension, value, count)
+        SELECT c.oid, '{bucket}', d.dimension, {value}, {delta}
+        FROM ({source_sql}) c, ({dimension_rows}) d
+        WHERE true
+        ON CONFLICT (oid, bucket, dimension, value) DO UPDATE SET count = count + excluded.count;
+    """
+
+
+def _rollup_add_sql(table: str, alias: str) -> str:
+    """
+    评论计入统计：评论口径直接 +1。用户口径取该用户在该视频下最早的一条评论：
+    若已计入的评论晚于当前评论则先将其移出，再在尚未计入时计入当前评论。
+    触发器内不能依赖 INSERT OR IGNORE（会被外层 UPSERT 的冲突处理覆盖），一律用 NOT EXISTS 判重。
+    """
+    counted = (
+        f"SELECT 1 FROM comment_rollup_user WHERE oid = {alias}.oid AND mid = {alias}.mid"
+    )
+    later_counted = (
+        f"SELECT {_rollup_user_columns(table, 'e')}, e.rpid AS rpid "
+        f"FROM comment_rollup_user u JOIN {table} e ON e.rpid = u.rpid "
+        f"WHERE u.oid = {alias}.oid AND u.mid = {alias}.mid "
+        f"AND (e.time, e.rpid) > ({alias}.time, {alias}.rpid) AND {alias}.type = 1"
+    )
+    return (
+        _rollup_row_upsert_sql(
+            "comment", table, alias, 1, f"{alias}.type = 1 AND {alias}.time IS NOT NULL"
+        )
+        + _rollup_upsert_sql("user", later_counted, -1)
+        + f"""
+        DELETE FROM comment_rollup_user
+        WHERE oid = {alias}.oid AND mid = {alias}.mid
+          AND rpid IN (SELECT rpid FROM ({later_counted}));
+        """
+        + _rollup_row_upsert_sql(
+            "user",
+            table,
+            alias,
+            1,
+            f"{alias}.type = 1 AND {alias}.mid IS NOT NULL AND NOT EXISTS ({counted})",
+        )
+        + f"""
+        INSERT INTO comment_rollup_user (oid, mid, rpid)
+        SELECT {alias}.oid, {alias}.mid, {alias}.rpid
+        WHERE {alias}.type = 1 AND {alias}.mid IS NOT NULL AND NOT EXISTS ({counted});
+        """
+    )
+
+
+def _rollup_remove_sql(table: str, alias: str) -> str:
+    """
+    评论移出统计：评论口径 -1；若它正是该用户被计入的那条评论，
+    则用户口径 -1，并从该用户在该视频下最早的其他评论中重新选出一条计入。
+    """
+    is_counted = (
+        f"EXISTS (SELECT 1 FROM comment_rollup_user WHERE oid = {alias}.oid "
+        f"AND mid = {alias}.mid AND rpid = {alias}.rpid)"
+    )
+    not_counted = (
+        f"NOT EXISTS (SELECT 1 FROM comment_rollup_user "
+        f"WHERE oid = {alias}.oid AND mid = {alias}.mid)"
+    )
+    candidate = (
+        f"SELECT * FROM {table} WHERE oid = {alias}.oid AND mid = {alias}.mid "
+        f"AND type = 1 ORDER BY time, rpid LIMIT 1"
+    )
+    return (
+        _rollup_row_upsert_sql(
+            "comment", table, alias, -1, f"{alias}.type = 1 AND {alias}.time IS NOT NULL"
+        )
+        + _rollup_row_upsert_sql("user", table, alias, -1, f"{alias}.type = 1 AND {is_counted}")
+        + f"""
+        DELETE FROM comment_rollup_user
+        WHERE oid = {alias}.oid AND mid = {alias}.mid AND rpid = {alias}.rpid;
+        """
+        + _rollup_upsert_sql(
+            "user",
+            f"SELECT {_rollup_user_columns(table, 'e')} FROM ({candidate}) e "
+            f"WHERE {alias}.type = 1 AND {not_counted}",
+            1,
+        )
+        + f"""
+        INSERT INTO comment_rollup_user (oid, mid, rpid)
+        SELECT e.oid, e.mid, e.rpid FROM ({candidate}) e
+        WHERE {alias}.type = 1 AND {not_counted};
+        """
+    )
+
+
+def rebuild_comment_rollups(conn: sqlite3.Connection):
+    """以集合操作从评论数据全量重建聚合表，用于首次创建或数据修复。"""
+    table = comment_storage_table(conn)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM comment_rollup")
+    cursor.execute("DELETE FROM comment_rollup_user")
+    cursor.execute(
+        f"""
+        INSERT INTO comment_rollup_user (oid, mid, rpid)
+        SELECT oid, mid, rpid FROM (
+            SELECT oid, mid, rpid,
+                   ROW_NUMBER() OVER (PARTITION BY oid, mid ORDER BY time, rpid) AS rn
+            FROM {table}
+            WHERE type = 1 AND mid IS NOT NULL
+        )
+        WHERE rn = 1
+        """
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO comment_rollup (oid, bucket, dimension, value, count)
+        SELECT oid, 'comment', 'day', day, COUNT(*) FROM (
+            SELECT c.oid, {_LOCAL_DAY.format(a="c")} AS day
+            FROM {table} c WHERE c.type = 1 AND c.time IS NOT NULL
+        ) GROUP BY oid, day
+        UNION ALL
+        SELECT oid, 'comment', 'hour', hour, COUNT(*) FROM (
+            SELECT c.oid, {_LOCAL_HOUR.format(a="c")} AS hour
+            FROM {table} c WHERE c.type = 1 AND c.time IS NOT NULL
+        ) GROUP BY oid, hour
+        """
+    )
+    user_rows = (
+        f"SELECT {_rollup_user_columns(table, 'c')} FROM comment_rollup_user u "
+        f"JOIN {table} c ON c.rpid = u.rpid"
+    )
+    user_counts = " UNION ALL ".join(
+        f"""
+        SELECT oid, 'user', '{dim}', COALESCE({dim}, ''), COUNT(*)
+        FROM ({user_rows}) GROUP BY oid, COALESCE({dim}, '')
+        """
+        for dim in COMMENT_ROLLUP_DIMENSIONS["user"]
+    )
+    cursor.execute(
+        "INSERT INTO comment_rollup (oid, bucket, dimension, value, count) "
+        + user_counts
+    )
+
+
+_ROLLUP_TRIGGERS = ("rollup_insert", "rollup_delete", "rollup_update")
+
+
+def _create_rollup_tables(cursor, table: str, enabled: bool = True):
+    """
+    enabled 为 True 时创建聚合表及维护触发器。聚合表为新建，或触发器缺失（如批量导入中断后未恢复）时，
+    期间写入的评论没有计入聚合表，需全量重建。
+    为 False 时移除触发器和聚合表（不再维护的聚合表会过期，分析时回退到基于评论数据的统计）。
+    """
+    if not enabled:
+        suspend_rollup_triggers(cursor, table)
+        cursor.execute("DROP TABLE IF EXISTS comment_rollup")
+        cursor.execute("DROP TABLE IF EXISTS comment_rollup_user")
+        return False
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'comment_rollup'"
+    )
+    is_new_rollup = cursor.fetchone() is None
+    trigger_names = [f"{table}_{name}" for name in _ROLLUP_TRIGGERS]
+    cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({})".format(
+            ", ".join("?" * len(trigger_names))
+        ),
+        trigger_names,
+    )
+    triggers_missing = cursor.fetchone()[0] < len(trigger_names)
+    cursor.execute(CREATE_COMMENT_ROLLUP_TABLE_SQL)
+    cursor.execute(CREATE_COMMENT_ROLLUP_USER_TABLE_SQL)
+
+    if table == "comment_core":
+        user_columns = ("ip_location", "level", "snapshot_id")
+    else:
+        user_columns = ("ip_location", "level", "sex", "vip")
+    changed = " OR ".join(
+        f"old.{col} IS NOT new.{col}"
+        for col in ("oid", "type", "time", "mid") + user_columns
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_rollup_insert AFTER INSERT ON {table}
+        WHEN new.type = 1
+        BEGIN
+            {_rollup_add_sql(table, "new")}
+        END;
+        """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_rollup_delete AFTER DELETE ON {table}
+        WHEN old.type = 1
+        BEGIN
+            {_rollup_remove_sql(table, "old")}
+        END;
+        """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_rollup_update AFTER UPDATE ON {table}
+        WHEN {changed}
+        BEGIN
+            {_rollup_remove_sql(table, "old")}
+            {_rollup_add_sql(table, "new")}
+        END;
+        """
+    )
+    if is_new_rollup or triggers_missing:
+        rebuild_comment_rollups(cursor.connection)
+    return True
+
+
+def suspend_rollup_triggers(cursor, table: str):
+    """
+    大批量导入前移除聚合触发器，逐行维护的开销远高于导入后一次性重建。
+    导入完成后需调用 resume_rollup_triggers。
+    """
+    for name in _ROLLUP_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table}_{name}")
+
+
+def resume_rollup_triggers(conn: sqlite3.Connection) -> bool:
+    """全量重建聚合表并恢复触发器。未启用聚合表（表不存在）时不做任何操作，返回 False。"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'comment_rollup'"
+    )
+    if cursor.fetchone() is None:
+        return False
+    rebuild_comment_rollups(conn)
+    _create_rollup_tables(cursor, comment_storage_table(conn))
+    return True
+
+
+# ---- 点赞 / 回复数历史（可选）----
+# 仅在计数发生变化时追加一行，保存相对上一次的增量；首次写入时的增量即为初始值。
+# 同一秒内多次变化合并到同一行。某一时刻的取值 = 截至该时刻的增量累加和。
+CREATE_COMMENT_COUNTER_HISTORY_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS comment_counter_history (
+    rpid INTEGER NOT NULL,          -- 评论ID
+    crawl_ts INTEGER NOT NULL,      -- 写入（爬取）时间戳
+    like_delta INTEGER NOT NULL,    -- 点赞数增量
+    reply_delta INTEGER NOT NULL,   -- 回复数增量
+    PRIMARY KEY (rpid, crawl_ts)
+) WITHOUT ROWID;
+"""
+
+_COUNTER_HISTORY_TRIGGERS = (
+    "counter_history_insert",
+    "counter_history_update",
+    "counter_history_delete",
+)
+
+
+def _counter_history_insert_sql(like_delta: str, reply_delta: str) -> str:
+    # 触发器内的 UPSERT 不受外层写入冲突处理的影响（与 INSERT OR IGNORE 不同）
+    return f"""
+        INSERT INTO comment_counter_history (rpid, crawl_ts, like_delta, reply_delta)
+        VALUES (new.rpid, {NOW_EPOCH_SQL}, {like_delta}, {reply_delta})
+        ON CONFLICT (rpid, crawl_ts) DO UPDATE SET
+            like_delta = like_delta + excluded.like_delta,
+            reply_delta = reply_delta + excluded.reply_delta;
+    """
+
+
+def _create_counter_history(cursor, table: str, enabled: bool):
+    """
+    enabled 为 True 时创建历史表及触发器；为 False 时只移除触发器，已记录的历史保留。
+    触发器仅在计数列实际变化时执行，关闭时评论写入路径没有任何额外开销。
+    """
+    if not enabled:
+        for name in _COUNTER_HISTORY_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {table}_{name}")
+        return False
+    cursor.execute(CREATE_COMMENT_COUNTER_HISTORY_TABLE_SQL)
+    record_initial = _counter_history_insert_sql(
+        "COALESCE(new.single_like_num, 0)", "COALESCE(new.single_reply_num, 0)"
+    )
+    record_change = _counter_history_insert_sql(
+        "COALESCE(new.single_like_num, old.single_like_num, 0) - COALESCE(old.single_like_num, 0)",
+        "COALESCE(new.single_reply_num, old.single_reply_num, 0) - COALESCE(old.single_reply_num, 0)",
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_counter_history_insert AFTER INSERT ON {table}
+        WHEN new.single_like_num IS NOT NULL OR new.single_reply_num IS NOT NULL
+        BEGIN
+            {record_initial}
+        END;
+        """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_counter_history_update
+        AFTER UPDATE OF single_like_num, single_reply_num ON {table}
+        WHEN (new.single_like_num IS NOT NULL AND new.single_like_num IS NOT old.single_like_num)
+          OR (new.single_reply_num IS NOT NULL AND new.single_reply_num IS NOT old.single_reply_num)
+        BEGIN
+            {record_change}
+        END;
+        """
+    )
+    # 删除评论时一并清除其历史，否则重新写入时首次增量（即初始值）会叠加在旧历史上
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_counter_history_delete AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM comment_counter_history WHERE rpid = old.rpid;
+        END;
+        """
+    )
+    return True
+
+
+# ---- 情感分数缓存 ----
+# 按评论ID保存 SnowNLP 情感分数及计算时评论内容的摘要，内容未变化的评论再次分析时直接复用。
+CREATE_SENTIMENT_CACHE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS sentiment_cache (
+    rpid INTEGER PRIMARY KEY,       -- 评论ID
+    content_hash INTEGER NOT NULL,  -- 评论内容摘要（row_digest）
+    score REAL                      -- 情感分数 (0-1)
+);
+"""
+
+
+# ---- 分词缓存 ----
+# 按评论ID保存词云分词结果（以空格连接）及分词时评论内容的摘要，增量爬取后只需为新增或被编辑的评论分词。
+CREATE_COMMENT_TOKENS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS comment_tokens (
+    rpid INTEGER PRIMARY KEY,       -- 评论ID
+    content_hash INTEGER NOT NULL,  -- 评论内容摘要（row_digest）
+    tokens TEXT NOT NULL            -- 分词结果，以空格连接
+);
+"""
+
+
+def _create_normalized_comment_schema(cursor):
+    cursor.execute(CREATE_USER_SNAPSHOT_TABLE_SQL)
+    cursor.execute(CREATE_COMMENT_CORE_TABLE_SQL)
+    _ensure_column(cursor, "comment_core", "updated_at", "INTEGER")
+    # 旧版本创建的兼容视图缺少 updated_at 列，重建视图（视图上的触发器随之重建）
+    cursor.execute("PRAGMA table_info(comment)")
+    view_columns = [row[1] for row in cursor.fetchall()]
+    if view_columns and "updated_at" not in view_columns:
+        cursor.execute("DROP VIEW comment")
+    cursor.execute(CREATE_COMMENT_VIEW_SQL)
+    cursor.execute(CREATE_COMMENT_VIEW_DELETE_TRIGGER_SQL)
+
+
+def migrate_comment_to_normalized(conn: sqlite3.Connection):
+    """
+    将已有的非规范化 comment 表就地迁移为规范化布局：
+    用户字段去重写入 user_snapshot，评论写入 comment_core，原表替换为兼容视图。
+    整个迁移在一个事务内以集合操作完成。
+    """
+    register_digest_function(conn)
+    cursor = conn.cursor()
+    cursor.execute("ALTER TABLE comment RENAME TO comment_legacy")
+    _create_normalized_comment_schema(cursor)
+    cursor.execute(
+        """
+        INSERT INTO user_snapshot (mid, version, name, sex, sign, face, vip, digest)
+        SELECT
+            mid,
+            ROW_NUMBER() OVER (PARTITION BY mid ORDER BY first_rpid),
+            name, sex, sign, face, vip,
+            bili_digest(name, sex, sign, face, vip)
+        FROM (
+            SELECT mid, name, sex, sign, face, vip, MIN(rpid) AS first_rpid
+            FROM comment_legacy
+            WHERE mid IS NOT NULL
+              AND COALESCE(name, sex, sign, face, vip) IS NOT NULL
+            GROUP BY mid, name, sex, sign, face, vip
+        )
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO comment_core (
+            rpid, parentid, rootid, mid, level, information, time,
+            single_reply_num, single_like_num, ip_location, oid, type, snapshot_id,
+            updated_at
+        )
+        SELECT
+            c.rpid, c.parentid, c.rootid, c.mid, c.level, c.information, c.time,
+            c.single_reply_num, c.single_like_num, c.ip_location, c.oid, c.type,
+            s.snapshot_id, c.updated_at
+        FROM comment_legacy c
+        LEFT JOIN user_snapshot s
+            ON s.mid = c.mid
+           AND s.digest = bili_digest(c.name, c.sex, c.sign, c.face, c.vip)
+        """
+    )
+    cursor.execute(
+        """
+        UPDATE comment_core SET digest = bili_digest(
+            parentid, rootid, mid, level, information, time, single_reply_num,
+            single_like_num, ip_location, oid, type, snapshot_id
+        )
+        """
+    )
+    cursor.execute("DROP TABLE comment_legacy")
+    print("表 'comment' 已迁移为规范化布局 (comment_core + user_snapshot)。")
+
+
+def init_bilibili_db(
+    db_name,
+    normalized: bool = NORMALIZED_COMMENT_LAYOUT,
+    counter_history: bool = COUNTER_HISTORY_ENABLED,
+    rollups: bool = COMMENT_ROLLUP_ENABLED,
+    search_index: bool = SEARCH_INDEX_ENABLED,
+):
+    """
+    初始化数据库。
+    normalized 为 True 时评论使用规范化布局：用户快照单独去重存放，
+    comment 变为兼容视图；已有的非规范化 comment 表会被就地迁移。
+    counter_history 为 True 时记录每条评论点赞数 / 回复数的变化历史。
+    rollups 为 True 时由触发器实时维护看板聚合表 comment_rollup。
+    search_index 为 True 时建立评论内容全文索引 comment_fts。
+    """
     conn = None
     try:
         conn = sqlite3.connect(db_name)
@@ -20,13 +716,17 @@ def init_bilibili_db(db_name):
             sex TEXT,                 -- 性别
             sign TEXT,                -- 个性签名
             like_num INTEGER,         -- 获赞数
-            vip INTEGER               -- VIP状态 (0: 非VIP, 1: VIP)
+            vip INTEGER,              -- VIP状态 (0: 非VIP, 1: VIP)
+            digest INTEGER,           -- 可变字段摘要，用于跳过未变化的行
+            updated_at INTEGER        -- 最近一次写入的时间戳
         );
         """
         cursor.execute(create_user_table_sql)
+        _ensure_column(cursor, "user", "digest", "INTEGER")
+        _ensure_column(cursor, "user", "updated_at", "INTEGER")
         print("表 'user' 创建成功或已存在。")
 
-        # 创建 comment 表
+        # 创建 comment 表（规范化布局下为兼容视图）
         create_comment_table_sql = """
         CREATE TABLE IF NOT EXISTS comment (
             rpid INTEGER PRIMARY KEY,           -- 评论ID，唯一标识，主键
@@ -45,11 +745,30 @@ def init_bilibili_db(db_name):
             vip INTEGER,                        -- 评论者VIP状态 (0: 非VIP, 1: VIP)
             face TEXT,                          -- 评论者头像URL (可能与user表重复，但为了评论快照完整性保留)
             oid INTEGER,                        -- 视频或内容的ID (AV号或BV号对应的整数ID)
-            type INTEGER            
+            type INTEGER,                       -- 评论区类型 (1: 视频)
+            digest INTEGER,                     -- 可变字段摘要，用于跳过未变化的行
+            updated_at INTEGER                  -- 最近一次写入的时间戳
         );
         """
-        cursor.execute(create_comment_table_sql)
-        print("表 'comment' 创建成功或已存在。")
+        if is_normalized_layout(conn):
+            _create_normalized_comment_schema(cursor)
+            print("视图 'comment' 已存在 (规范化布局)。")
+        elif normalized:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'comment'"
+            )
+            if cursor.fetchone():
+                _ensure_column(cursor, "comment", "digest", "INTEGER")
+                _ensure_column(cursor, "comment", "updated_at", "INTEGER")
+                migrate_comment_to_normalized(conn)
+            else:
+                _create_normalized_comment_schema(cursor)
+                print("视图 'comment' 创建成功 (规范化布局)。")
+        else:
+            cursor.execute(create_comment_table_sql)
+            _ensure_column(cursor, "comment", "digest", "INTEGER")
+            _ensure_column(cursor, "comment", "updated_at", "INTEGER")
+            print("表 'comment' 创建成功或已存在。")
 
         # 创建 bv 表
         create_bv_table_sql = """
@@ -62,6 +781,24 @@ def init_bilibili_db(db_name):
         cursor.execute(create_bv_table_sql)
         print("表 'bv' 创建成功或已存在。")
 
+        _create_comment_indexes(cursor, comment_storage_table(conn))
+        print("评论索引创建成功或已存在。")
+
+        if _create_search_index(cursor, comment_storage_table(conn), search_index):
+            print("评论全文索引 'comment_fts' 创建成功或已存在。")
+
+        if _create_rollup_tables(cursor, comment_storage_table(conn), rollups):
+            print("聚合表 'comment_rollup' 创建成功或已存在。")
+
+        if _create_counter_history(cursor, comment_storage_table(conn), counter_history):
+            print("计数历史表 'comment_counter_history' 创建成功或已存在。")
+
+        cursor.execute(CREATE_SENTIMENT_CACHE_TABLE_SQL)
+        print("情感分数缓存表 'sentiment_cache' 创建成功或已存在。")
+
+        cursor.execute(CREATE_COMMENT_TOKENS_TABLE_SQL)
+        print("分词缓存表 'comment_tokens' 创建成功或已存在。")
+
         conn.commit()
         print(f"数据库 '{db_name}' 初始化完成。")
 
@@ -70,5 +807,78 @@ def init_bilibili_db(db_name):
     finally:
         if conn:
             conn.close()
+
+
+# ---- 评论分片（可选）----
+# 评论可按视频ID取模或按评论时间区间拆分到同一目录下的多个数据库文件，
+# 每个分片都是完整初始化的评论库；user / bv 仍保存在主库中。
+# 分片方式写入目录下的 shards.json，之后的读写都以它为准，避免路由规则变化导致数据错位。
+SHARD_MANIFEST_NAME = "shards.json"
+# 联邦查询时所有分片 ATTACH 到同一连接上，受 SQLite 默认 ATTACH 上限约束
+MAX_COMMENT_SHARDS = 10
+
+
+def shard_paths(shard_dir: str, shard_count: int) -> list:
+    return [os.path.join(shard_dir, f"comment_{i:02d}.db") for i in range(shard_count)]
+
+
+def load_shard_layout(shard_dir: str):
+    """读取分片目录下的 shards.json，不存在时返回 None。"""
+    manifest_path = os.path.join(shard_dir, SHARD_MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def init_comment_shards(
+    shard_dir: str,
+    shard_count: int,
+    shard_by: str = "oid",
+    boundaries=None,
+    normalized: bool = NORMALIZED_COMMENT_LAYOUT,
+    counter_history: bool = COUNTER_HISTORY_ENABLED,
+    rollups: bool = COMMENT_ROLLUP_ENABLED,
+    search_index: bool = SEARCH_INDEX_ENABLED,
+) -> dict:
+    """
+    初始化评论分片目录并返回分片方式。
+    shard_by 为 "oid" 时按 oid % shard_count 路由；
+    为 "time" 时 boundaries 为升序的 shard_count - 1 个时间戳，
+    评论时间小于 boundaries[0] 的进入第 0 个分片，依此类推。
+    目录中已有 shards.json 时以其为准，参数与之不一致则抛出 ValueError。
+    """
+    layout = {"count": shard_count, "by": shard_by, "boundaries": list(boundaries or [])}
+    if not 1 <= shard_count <= MAX_COMMENT_SHARDS:
+        raise ValueError(f"分片数量需在 1 到 {MAX_COMMENT_SHARDS} 之间: {shard_count}")
+    if shard_by == "oid":
+        layout["boundaries"] = []
+    elif shard_by == "time":
+        if len(layout["boundaries"]) != shard_count - 1 or layout["boundaries"] != sorted(
+            layout["boundaries"]
+        ):
+            raise ValueError("按时间分片时需提供 shard_count - 1 个升序的时间边界")
+    else:
+        raise ValueError(f"未知的分片方式: {shard_by}")
+
+    existing = load_shard_layout(shard_dir)
+    if existing is not None and existing != layout:
+        raise ValueError(f"分片目录 '{shard_dir}' 已按 {existing} 初始化，与当前配置不一致")
+    os.makedirs(shard_dir, exist_ok=True)
+    for path in shard_paths(shard_dir, shard_count):
+        init_bilibili_db(
+            path,
+            normalized=normalized,
+            counter_history=counter_history,
+            rollups=rollups,
+            search_index=search_index,
+        )
+    if existing is None:
+        with open(os.path.join(shard_dir, SHARD_MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(layout, f, ensure_ascii=False, indent=2)
+    print(f"评论分片目录 '{shard_dir}' 初始化完成，共 {shard_count} 个分片。")
+    return layout
+
+
 if __name__ == "__main__":
     init_bilibili_db(BILI_DB_PATH)
@@ -0,0 +1,320 @@
+"""
+把多台机器各自爬取的数据库合并到一个主库。
+
+用法:
+    python -m database.merge_db 主库.db 工作库1.db 工作库2.db --policy latest
+
+每个工作库通过 ATTACH 挂到主库连接上，comment / user / bv 按主键区间分块，
+每块用一条 INSERT ... SELECT ... ON CONFLICT 语句整体写入。
+每块与进度记录 (merge_progress) 在同一事务中提交，中断后重新执行同一命令即可从断点继续。
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from typing import Dict, List, Tuple
+from entity.comment import COMMENT_FIELDS
+from database.db_manage import (
+    comment_storage_table,
+    init_bilibili_db,
+    resume_rollup_triggers,
+    suspend_rollup_triggers,
+)
+from repository.comment_repository import COMMENT_DIGEST_FIELDS, CommentRepository
+from repository.user_repository import USER_DIGEST_FIELDS
+from utils.digest import register_digest_function
+
+# latest: 保留 updated_at 较新的一份；max_like: 评论保留点赞数较高的一份（用户仍按 latest）
+MERGE_POLICIES = ("latest", "max_like")
+DEFAULT_CHUNK_SIZE = 200000
+
+CREATE_MERGE_PROGRESS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS merge_progress (
+    worker TEXT NOT NULL,               -- 工作库的绝对路径
+    table_name TEXT NOT NULL,           -- comment / user / bv
+    last_key INTEGER NOT NULL,          -- 已合并到的最大主键
+    done INTEGER NOT NULL DEFAULT 0,    -- 该表是否已合并完成
+    inserted INTEGER NOT NULL DEFAULT 0,
+    updated INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (worker, table_name)
+);
+"""
+
+# 各表的主键与需要复制的列（不含主键）
+MERGE_TABLES = {
+    "comment": ("rpid", COMMENT_DIGEST_FIELDS + ("digest", "updated_at")),
+    "user": ("mid", USER_DIGEST_FIELDS + ("digest", "updated_at")),
+    "bv": ("oid", ("bid", "title")),
+}
+
+
+def _conflict_condition(table: str, policy: str) -> str:
+    if table == "bv":
+        return "COALESCE(excluded.bid, bv.bid) IS NOT bv.bid OR COALESCE(excluded.title, bv.title) IS NOT bv.title"
+    if table == "comment" and policy == "max_like":
+        newer = "COALESCE(excluded.single_like_num, -1) > COALESCE(comment.single_like_num, -1)"
+    else:
+        newer = f"COALESCE(excluded.updated_at, 0) > COALESCE({table}.updated_at, 0)"
+    return f"excluded.digest IS NOT {table}.digest AND {newer}"
+
+
+def _merge_sql(table: str, policy: str, worker_columns: List[str], recompute_digest: bool) -> str:
+    """
+    生成把工作库中一段主键区间合并进主库的语句。参数: (区间下界(不含), 区间上界(含))。
+    冲突时与爬虫写入一致：只用非空字段覆盖；更新后的摘要按合并结果重新计算。
+    """
+    key, columns = MERGE_TABLES[table]
+    fields = [c for c in columns if c not in ("digest", "updated_at")]
+
+    def source(column):
+        return f"w.{column}" if column in worker_columns else "NULL"
+
+    select_list = [source(key)]
+    for column in columns:
+        if column == "digest" and recompute_digest:
+            select_list.append("bili_digest({})".format(", ".join(source(f) for f in fields)))
+        else:
+            select_list.append(source(column))
+
+    assignments = [f"{f} = COALESCE(excluded.{f}, {table}.{f})" for f in fields]
+    if "digest" in columns:
+        assignments.append(
+            "digest = bili_digest({})".format(
+                ", ".join(f"COALESCE(excluded.{f}, {table}.{f})" for f in fields)
+            )
+        )
+        assignments.append("updated_at = excluded.updated_at")
+    return f"""
+        INSERT INTO main.{table} ({key}, {", ".join(columns)})
+        SELECT {", ".join(select_list)} FROM worker.{table} w
+        WHERE w.{key} > ? AND w.{key} <= ?
+        ORDER BY w.{key}
+        ON CONFLICT ({key}) DO UPDATE SET
+            {", ".join(assignments)}
+        WHERE {_conflict_condition(table, policy)}
+    """
+
+
+def _normalized_candidates_sql(policy: str, worker_columns: List[str]) -> str:
+    """
+    规范化布局的主库：选出工作库中需要写入的评论（主库中不存在，或按策略胜出），
+    每行为 COMMENT_FIELDS 加工作库的 updated_at。
+    """
+    if policy == "max_like":
+        newer = "COALESCE(w.single_like_num, -1) > COALESCE(m.single_like_num, -1)"
+    elif "updated_at" in worker_columns:
+        newer = "COALESCE(w.updated_at, 0) > COALESCE(m.updated_at, 0)"
+    else:
+        newer = "m.updated_at IS NULL"
+    updated_at = "w.updated_at" if "updated_at" in worker_columns else "NULL"
+    return f"""
+        SELECT {", ".join(f"w.{f}" for f in COMMENT_FIELDS)}, {updated_at} FROM worker.comment w
+        LEFT JOIN main.comment m ON m.rpid = w.rpid
+        WHERE w.rpid > ? AND w.rpid <= ?
+          AND (m.rpid IS NULL OR {newer})
+        ORDER BY w.rpid
+    """
+
+
+def _table_columns(cursor, schema: str, table: str) -> List[str]:
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _next_upper_key(cursor, table: str, key: str, last_key: int, chunk_size: int):
+    """返回从 last_key 之后取 chunk_size 行时的最大主键，没有剩余行时返回 None。"""
+    cursor.execute(
+        f"SELECT {key} FROM worker.{table} WHERE {key} > ? ORDER BY {key} LIMIT 1 OFFSET ?",
+        (last_key, chunk_size - 1),
+    )
+    row = cursor.fetchone()
+    if row is not None:
+        return row[0]
+    cursor.execute(f"SELECT MAX({key}) FROM worker.{table} WHERE {key} > ?", (last_key,))
+    return cursor.fetchone()[0]
+
+
+def _merge_table(
+    conn: sqlite3.Connection,
+    worker: str,
+    table: str,
+    policy: str,
+    chunk_size: int,
+    repo: CommentRepository,
+) -> Tuple[int, int]:
+    cursor = conn.cursor()
+    key, _ = MERGE_TABLES[table]
+    cursor.execute(
+        "SELECT last_key, done, inserted, updated FROM merge_progress WHERE worker = ? AND table_name = ?",
+        (worker, table),
+    )
+    progress = cursor.fetchone()
+    if progress is None:
+        last_key, done, inserted, updated = -(2**63), 0, 0, 0
+    else:
+        last_key, done, inserted, updated = progress
+    if done:
+        return inserted, updated
+
+    worker_columns = _table_columns(cursor, "worker", table)
+    normalized_master = table == "comment" and comment_storage_table(conn) == "comment_core"
+    if normalized_master:
+        merge_sql = _normalized_candidates_sql(policy, worker_columns)
+    else:
+        # 两侧布局一致时工作库的摘要可直接沿用，否则按主库的字段重新计算
+        recompute_digest = table == "comment" and (
+            comment_storage_table(conn) != _storage_table_of_worker(cursor)
+        )
+        merge_sql = _merge_sql(table, policy, worker_columns, recompute_digest)
+
+    while True:
+        upper_key = _next_upper_key(cursor, table, key, last_key, chunk_size)
+        if upper_key is None:
+            break
+        cursor.execute(
+            f"SELECT COUNT(*) FROM main.{table} WHERE {key} IN "
+            f"(SELECT {key} FROM worker.{table} WHERE {key} > ? AND {key} <= ?)",
+            (last_key, upper_key),
+        )
+        existing = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT COUNT(*) FROM worker.{table} WHERE {key} > ? AND {key} <= ?",
+            (last_key, upper_key),
+        )
+        chunk_rows = cursor.fetchone()[0]
+
+        if normalized_master:
+            # 规范化布局需拆分用户快照，无法用一条语句完成，回退到仓库的批量写入
+            cursor.execute(merge_sql, (last_key, upper_key))
+            rows = cursor.fetchall()
+            affected = repo.merge_rows(
+                cursor, [row[:-1] for row in rows], [row[-1] for row in rows]
+            )
+        else:
+            cursor.execute(merge_sql, (last_key, upper_key))
+            affected = cursor.rowcount
+        chunk_inserted = chunk_rows - existing
+        inserted += chunk_inserted
+        updated += max(affected - chunk_inserted, 0)
+        last_key = upper_key
+        _save_progress(cursor, worker, table, last_key, 0, inserted, updated)
+        conn.commit()
+
+    _save_progress(cursor, worker, table, last_key, 1, inserted, updated)
+    conn.commit()
+    return inserted, updated
+
+
+def _storage_table_of_worker(cursor) -> str:
+    cursor.execute(
+        "SELECT 1 FROM worker.sqlite_master WHERE type = 'table' AND name = 'comment_core'"
+    )
+    return "comment_core" if cursor.fetchone() else "comment"
+
+
+def _save_progress(cursor, worker, table, last_key, done, inserted, updated):
+    cursor.execute(
+        """
+        INSERT INTO merge_progress (worker, table_name, last_key, done, inserted, updated)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (worker, table_name) DO UPDATE SET
+            last_key = excluded.last_key, done = excluded.done,
+            inserted = excluded.inserted, updated = excluded.updated
+        """,
+        (worker, table, last_key, done, inserted, updated),
+    )
+
+
+def merge_databases(
+    master_db: str,
+    worker_dbs: List[str],
+    policy: str = "latest",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    restart: bool = False,
+) -> Dict[str, Dict[str, Tuple[int, int]]]:
+    """
+    将 worker_dbs 依次合并到 master_db（主库不存在时会先初始化）。
+    restart 为 True 时忽略已有进度，重新合并这些工作库。
+    返回 {工作库: {表名: (新增条数, 更新条数)}}，断点续传时为该工作库的累计值。
+    """
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"未知的合并策略: {policy}，可选 {MERGE_POLICIES}")
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size 需大于 0: {chunk_size}")
+    init_bilibili_db(master_db)
+
+    repo = CommentRepository(master_db)
+    conn = sqlite3.connect(master_db)
+    register_digest_function(conn)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA cache_size = -262144")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.execute(CREATE_MERGE_PROGRESS_TABLE_SQL)
+    # 合并期间不逐行维护聚合表，结束时（包括失败或中断）恢复触发器并一次性重建
+    suspend_rollup_triggers(cursor, comment_storage_table(conn))
+    conn.commit()
+
+    report = {}
+    try:
+        for worker_db in worker_dbs:
+            worker = os.path.abspath(worker_db)
+            if not os.path.exists(worker):
+                print(f"工作库不存在，跳过: {worker}")
+                continue
+            if restart:
+                cursor.execute("DELETE FROM merge_progress WHERE worker = ?", (worker,))
+                conn.commit()
+            cursor.execute("ATTACH DATABASE ? AS worker", (worker,))
+            try:
+                cursor.execute(
+                    "SELECT name FROM worker.sqlite_master WHERE name IN ('comment', 'user', 'bv')"
+                )
+                worker_tables = {row[0] for row in cursor.fetchall()}
+                report[worker] = {}
+                for table in MERGE_TABLES:
+                    if table not in worker_tables:
+                        continue
+                    started = time.time()
+                    inserted, updated = _merge_table(
+                        conn, worker, table, policy, chunk_size, repo
+                    )
+                    report[worker][table] = (inserted, updated)
+                    print(
+                        f"{worker} -> {table}: 新增 {inserted} 条，更新 {updated} 条，"
+                        f"耗时 {time.time() - started:.1f} 秒"
+                    )
+            except BaseException:
+                # 每块只与其进度记录一起提交；中途失败或被中断时丢弃未完成的块，下次从上一块之后继续
+                conn.rollback()
+                raise
+            finally:
+                cursor.execute("DETACH DATABASE worker")
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"合并数据库失败（已完成的部分已保存，重新执行即可继续）: {e}")
+    finally:
+        # 无论合并成功、失败还是被中断，都要恢复触发器并重建聚合表，否则聚合表会一直停留在过期状态
+        try:
+            if resume_rollup_triggers(conn):
+                print("聚合表已重建。")
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"重建聚合表失败（下次初始化数据库时会自动重建）: {e}")
+        finally:
+            conn.close()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="合并多个工作库到主库")
+    parser.add_argument("master", help="主库路径，不存在时自动创建")
+    parser.add_argument("workers", nargs="+", help="工作库路径")
+    parser.add_argument("--policy", choices=MERGE_POLICIES, default="latest",
+                        help="冲突处理：latest 保留最近写入的一份，max_like 保留点赞数较高的一份")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="每个事务合并的行数")
+    parser.add_argument("--restart", action="store_true", help="忽略已有进度，重新合并")
+    args = parser.parse_args()
+    merge_databases(args.master, args.workers, args.policy, args.chunk_size, args.restart)
@@ -1,4 +1,10 @@
+# 视频字段，顺序与 bv 表的列顺序及 to_tuple() 一致
+BV_FIELDS = ("oid", "bid", "title")
+
+
 class Bv:
+    __slots__ = BV_FIELDS
+
     def __init__(
         self,
         oid: int,
@@ -16,4 +22,9 @@ class Bv:
     def from_db_row(cls, row: tuple):
         if row is None:
             return None
-        return cls(oid=row[0], bid=row[1], title=row[2])
+        return cls(*row[:3])
+
+    @classmethod
+    def row_factory(cls, cursor, row: tuple):
+        """sqlite3 行工厂，查询的列须恰好为 BV_FIELDS 且顺序一致。"""
+        return cls(*row)
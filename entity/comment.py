@@ -1,4 +1,14 @@
+# 评论字段，顺序与 comment 表的列顺序及 to_tuple() 一致
+COMMENT_FIELDS = (
+    "rpid", "parentid", "rootid", "mid", "name", "level", "sex", "information",
+    "time", "single_reply_num", "single_like_num", "sign",
+    "ip_location", "vip", "face", "oid", "type",
+)
+
+
 class Comment:
+    # 固定属性、不带实例 __dict__，流式读取上百万条评论时内存与构造开销都小得多
+    __slots__ = COMMENT_FIELDS
 
     def __init__(
         self,
@@ -63,22 +73,12 @@ class Comment:
     def from_db_row(cls, row: tuple):
         if row is None:
             return None
-        return cls(
-            rpid=row[0],
-            parentid=row[1],
-            rootid=row[2],
-            mid=row[3],
-            name=row[4],
-            level=row[5],
-            sex=row[6],
-            information=row[7],
-            time=row[8],
-            single_reply_num=row[9],
-            single_like_num=row[10],
-            sign=row[11],
-            ip_location=row[12],
-            vip=row[13],
-            face=row[14],
-            oid=row[15],
-            type=row[16],
-        )
+        return cls(*row[:17])
+
+    @classmethod
+    def row_factory(cls, cursor, row: tuple):
+        """
+        sqlite3 行工厂：cursor.row_factory = Comment.row_factory 后查询直接返回 Comment。
+        查询的列须恰好为 COMMENT_FIELDS 且顺序一致。
+        """
+        return cls(*row)
@@ -0,0 +1,73 @@
+from typing import Dict, Iterable, Iterator, List, Optional
+from entity.comment import COMMENT_FIELDS, Comment
+
+
+class CommentBatch:
+    """
+    列式评论批：每个字段一列，各列为等长的列表，顺序同 COMMENT_FIELDS。
+    爬虫按页追加行，仓库按行元组批量写入，流式读取按块返回，
+    分析时可直接按列构造 DataFrame，无需逐条创建 Comment 对象。
+    """
+
+    __slots__ = ("columns",)
+
+    def __init__(self, columns: Optional[Dict[str, list]] = None):
+        if columns is None:
+            columns = {field: [] for field in COMMENT_FIELDS}
+        elif set(columns) != set(COMMENT_FIELDS):
+            raise ValueError(f"CommentBatch 的列必须为 {COMMENT_FIELDS}")
+        else:
+            # append / rows 按字典顺序与行元组对应，传入的列需按 COMMENT_FIELDS 重新排列
+            columns = {field: columns[field] for field in COMMENT_FIELDS}
+        self.columns = columns
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "CommentBatch":
+        """由按 COMMENT_FIELDS 顺序排列的行元组（如数据库查询结果）构造。"""
+        rows = list(rows)
+        if not rows:
+            return cls()
+        return cls(
+            {field: list(column) for field, column in zip(COMMENT_FIELDS, zip(*rows))}
+        )
+
+    @classmethod
+    def from_comments(cls, comments: Iterable[Comment]) -> "CommentBatch":
+        return cls.from_rows(comment.to_tuple() for comment in comments)
+
+    def append(self, row: tuple):
+        """追加一行，row 按 COMMENT_FIELDS 顺序排列。"""
+        for column, value in zip(self.columns.values(), row):
+            column.append(value)
+
+    def append_comment(self, comment: Comment):
+        self.append(comment.to_tuple())
+
+    def extend(self, other: "CommentBatch"):
+        for field, column in self.columns.items():
+            column.extend(other.columns[field])
+
+    def column(self, field: str) -> list:
+        return self.columns[field]
+
+    def rows(self) -> Iterator[tuple]:
+        """按行元组迭代（COMMENT_FIELDS 顺序）。"""
+        return zip(*self.columns.values())
+
+    def __len__(self) -> int:
+        return len(self.columns["rpid"])
+
+    def __iter__(self) -> Iterator[Comment]:
+        """按 Comment 对象迭代，兼容逐条处理的旧代码。"""
+        for row in self.rows():
+            yield Comment(*row)
+
+    def to_dataframe(self, columns: Optional[List[str]] = None):
+        """
+        转为 pandas DataFrame，列名同 COMMENT_FIELDS。
+        按列整体转换为数组，不会逐行构造中间对象；columns 可只取部分列。
+        """
+        import pandas as pd
+
+        fields = columns or COMMENT_FIELDS
+        return pd.DataFrame({field: self.columns[field] for field in fields}, columns=fields)
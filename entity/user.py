@@ -1,4 +1,11 @@
+# 用户字段，顺序与 user 表的列顺序及 to_tuple() 一致
+USER_FIELDS = (
+    "mid", "face", "fans", "friend", "name", "sex", "sign", "like_num", "vip",
+)
+
+
 class User:
+    __slots__ = USER_FIELDS
 
     def __init__(
         self,
@@ -39,14 +46,9 @@ class User:
     def from_db_row(cls, row: tuple):
         if row is None:
             return None
-        return cls(
-            mid=row[0],
-            face=row[1],
-            fans=row[2],
-            friend=row[3],
-            name=row[4],
-            sex=row[5],
-            sign=row[6],
-            like_num=row[7],
-            vip=row[8],
-        )
+        return cls(*row[:9])
+
+    @classmethod
+    def row_factory(cls, cursor, row: tuple):
+        """sqlite3 行工厂，查询的列须恰好为 USER_FIELDS 且顺序一致。"""
+        return cls(*row)
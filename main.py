@@ -2,14 +2,15 @@ from analyzer.analyze_comment import CommentAnalyzer
 from crawler.get_single_video_comment import BilibiliCommentCrawler
 from crawler.get_user_all_comment import BilibiliUserCommentsCrawler
 from crawler.get_user_information import BilibiliUserCrawler
-from database.db_manage import init_bilibili_db
+from database.db_manage import init_bilibili_db, init_comment_shards
 from entity.user import User
 from repository.user_repository import UserRepository
 from utils.config import *
 import os
-from repository.comment_repository import CommentRepository
+from repository.sharded_comment_repository import open_comment_repository
 from entity.comment import Comment
 from utils.get_csv import export_comments_by_mid_to_csv, export_comments_by_oid_to_csv
+from utils.export_partitioned import export_comments_partitioned
 from repository.bv_repository import BvRepository
 from utils import get_user_all_bv
 if __name__ == "__main__":
@@ -22,13 +23,31 @@ if __name__ == "__main__":
     #     except Exception as e:
     #         print(f"删除文件时出错: {e}")
 
-    init_bilibili_db(BILI_DB_PATH)
-    comment_repo = CommentRepository(BILI_DB_PATH)
+    init_bilibili_db(
+        BILI_DB_PATH,
+        normalized=NORMALIZED_COMMENT_LAYOUT,
+        counter_history=COUNTER_HISTORY_ENABLED,
+        rollups=COMMENT_ROLLUP_ENABLED,
+        search_index=SEARCH_INDEX_ENABLED,
+    )
+    if COMMENT_SHARD_DIR:
+        init_comment_shards(
+            COMMENT_SHARD_DIR,
+            COMMENT_SHARD_COUNT,
+            shard_by=COMMENT_SHARD_BY,
+            boundaries=COMMENT_SHARD_BOUNDARIES,
+            normalized=NORMALIZED_COMMENT_LAYOUT,
+            counter_history=COUNTER_HISTORY_ENABLED,
+            rollups=COMMENT_ROLLUP_ENABLED,
+            search_index=SEARCH_INDEX_ENABLED,
+        )
+    comment_repo = open_comment_repository(BILI_DB_PATH)
     user_repo = UserRepository(BILI_DB_PATH)
     bv_repo = BvRepository(BILI_DB_PATH)
 
     bvs = []
     video_oids = []
+    mids = []
 
     print("请选择获取评论模式：")
     print("0: 获取视频评论（多个BV号用逗号间隔）")
@@ -89,6 +108,13 @@ if __name__ == "__main__":
             oids=video_oids,
             db_name=BILI_DB_PATH,
         )
+        if PARTITIONED_EXPORT_DIR:
+            export_comments_partitioned(
+                PARTITIONED_EXPORT_DIR,
+                db_name=BILI_DB_PATH,
+                oids=video_oids,
+                only_videos=True,
+            )
     elif get_mode == 2:
         print("请输入用户ID：")
         uid = input()
@@ -118,7 +144,12 @@ if __name__ == "__main__":
     analyze_mode = int(input())
 
     if analyze_mode == 1:
-        analyzer = CommentAnalyzer(csv_path=OUTPUT_CSV_PATH)
+        # 直接从数据库加载评论进行分析，无需读回导出的 CSV
+        analyzer = CommentAnalyzer.from_db(
+            BILI_DB_PATH,
+            oids=video_oids if get_mode in (0, 1) else None,
+            mids=mids if get_mode == 2 else None,
+        )
         if get_mode == 0 or get_mode == 1:
             analyzer.run_all_analysis()
         elif get_mode == 2:
@@ -1,6 +1,15 @@
 import sqlite3
-from typing import List, Optional, Tuple
-from entity.bv import Bv
+from typing import Iterable, List, Optional, Tuple
+from entity.bv import BV_FIELDS, Bv
+from repository.multi_key import bind_keys
+
+BV_UPSERT_SQL = """
+INSERT INTO bv (
+    oid, bid, title
+) VALUES (?, ?, ?)
+ON CONFLICT(oid) DO UPDATE SET
+    bid = excluded.bid, title = excluded.title
+"""
 
 
 class BvRepository:
@@ -11,21 +20,26 @@ class BvRepository:
         return sqlite3.connect(self.db_name)
 
     def add_or_update_bv(self, bv: Bv) -> bool:
+        return self.add_or_update_bvs([bv]) > 0
+
+    def add_or_update_bvs(self, bvs: Iterable[Bv]) -> int:
+        """
+        批量插入或更新视频信息，返回写入的行数。
+        """
+        rows = [bv.to_tuple() for bv in bvs]
+        if not rows:
+            return 0
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
-            insert_or_replace_sql = """
-            INSERT OR REPLACE INTO bv (
-                oid, bid, title
-            ) VALUES (?, ?, ?)
-            """
-            cursor.execute(insert_or_replace_sql, bv.to_tuple())
+            cursor.executemany(BV_UPSERT_SQL, rows)
+            affected = cursor.rowcount
             conn.commit()
-            return True
+            return affected
         except sqlite3.Error as e:
             conn.rollback()
-            print(f"添加/更新失败: {e}")
-            return False
+            print(f"批量添加/更新失败: {e}")
+            return 0
         finally:
             conn.close()
 
@@ -35,9 +49,9 @@ class BvRepository:
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
-            placeholders = ",".join(["?"] * len(oids))
-            delete_sql = f"DELETE FROM bv WHERE oid IN ({placeholders})"
-            cursor.execute(delete_sql, tuple(oids))
+            keys_sql, params = bind_keys(conn, oids)
+            delete_sql = f"DELETE FROM bv WHERE oid IN {keys_sql}"
+            cursor.execute(delete_sql, params)
             deleted_count = cursor.rowcount
             conn.commit()
             return deleted_count
@@ -53,13 +67,13 @@ class BvRepository:
             return []
         conn = self._get_connection()
         cursor = conn.cursor()
+        cursor.row_factory = Bv.row_factory
         bvs = []
         try:
-            placeholders = ",".join(["?"] * len(oids))
-            query_sql = f"SELECT * FROM bv WHERE oid IN ({placeholders})"
-            cursor.execute(query_sql, tuple(oids))
-            for row in cursor.fetchall():
-                bvs.append(Bv.from_db_row(row))
+            keys_sql, params = bind_keys(conn, oids)
+            query_sql = f"SELECT {', '.join(BV_FIELDS)} FROM bv WHERE oid IN {keys_sql}"
+            cursor.execute(query_sql, params)
+            bvs = cursor.fetchall()
         except sqlite3.Error as e:
             print(f"查询失败: {e}")
         finally:
@@ -71,13 +85,13 @@ class BvRepository:
             return []
         conn = self._get_connection()
         cursor = conn.cursor()
+        cursor.row_factory = Bv.row_factory
         bvs = []
         try:
-            placeholders = ",".join(["?"] * len(bids))
-            query_sql = f"SELECT * FROM bv WHERE bid IN ({placeholders})"
-            cursor.execute(query_sql, tuple(bids))
-            for row in cursor.fetchall():
-                bvs.append(Bv.from_db_row(row))
+            keys_sql, params = bind_keys(conn, bids)
+            query_sql = f"SELECT {', '.join(BV_FIELDS)} FROM bv WHERE bid IN {keys_sql}"
+            cursor.execute(query_sql, params)
+            bvs = cursor.fetchall()
         except sqlite3.Error as e:
             print(f"查询失败: {e}")
         finally:
@@ -91,9 +105,9 @@ class BvRepository:
         cursor = conn.cursor()
         oids = []
         try:
-            placeholders = ",".join(["?"] * len(bids))
-            query_sql = f"SELECT oid FROM bv WHERE bid IN ({placeholders})"
-            cursor.execute(query_sql, tuple(bids))
+            keys_sql, params = bind_keys(conn, bids)
+            query_sql = f"SELECT oid FROM bv WHERE bid IN {keys_sql}"
+            cursor.execute(query_sql, params)
             for row in cursor.fetchall():
                 oids.append(row[0])
         except sqlite3.Error as e:
@@ -109,11 +123,11 @@ class BvRepository:
         cursor = conn.cursor()
         bids = []
         try:
-            placeholders = ",".join(["?"] * len(oids))
-            query_sql = f"SELECT bid FROM bv WHERE oid IN ({placeholders})"
-            cursor.execute(query_sql, tuple(oids))
+            keys_sql, params = bind_keys(conn, oids)
+            query_sql = f"SELECT bid FROM bv WHERE oid IN {keys_sql}"
+            cursor.execute(query_sql, params)
             for row in cursor.fetchall():
-                bids.append(row[1])
+                bids.append(row[0])
         except sqlite3.Error as e:
             print(f"查询失败: {e}")
         finally:
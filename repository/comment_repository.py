@@ -1,6 +1,199 @@
+import base64
+import heapq
 import sqlite3
-from typing import List, Optional, Tuple, Iterator  # 导入类型提示
-from entity.comment import Comment
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Iterator, Union  # 导入类型提示
+from entity.comment import COMMENT_FIELDS, Comment
+from entity.comment_batch import CommentBatch
+from database.db_manage import NOW_EPOCH_SQL, comment_storage_table, has_search_index
+from repository.multi_key import bind_keys, iter_key_chunks
+from utils.digest import register_digest_function, row_digest
+from utils.text_segment import build_match_query, segment_for_index
+
+# 评论可变字段（除 rpid 外的全部列），digest 即按此顺序计算
+COMMENT_DIGEST_FIELDS = COMMENT_FIELDS[1:]
+
+# 查询评论时选取的列，顺序与 Comment 字段一致，可直接使用 Comment.row_factory
+COMMENT_COLUMNS = ", ".join(COMMENT_FIELDS)
+
+# 非空字段合并到已有行后的摘要：新值为 NULL 时保留库中原值
+_MERGED_COMMENT_DIGEST = "bili_digest({})".format(
+    ", ".join(f"COALESCE(excluded.{f}, comment.{f})" for f in COMMENT_DIGEST_FIELDS)
+)
+
+COMMENT_INSERT_SQL = f"""
+INSERT INTO comment (
+    rpid, parentid, rootid, mid, name, level, sex, information,
+    time, single_reply_num, single_like_num, sign,
+    ip_location, vip, face, oid, type, digest, updated_at
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {NOW_EPOCH_SQL})
+"""
+
+# 仅当合并后的摘要与库中摘要不同才真正执行 UPDATE；
+# 若新行摘要与库中一致（最常见的重复爬取），无需调用 bili_digest 即可跳过
+COMMENT_UPSERT_SQL = COMMENT_INSERT_SQL + """
+ON CONFLICT(rpid) DO UPDATE SET
+    {assignments},
+    digest = {merged},
+    updated_at = excluded.updated_at
+WHERE excluded.digest IS NOT comment.digest
+  AND comment.digest IS NOT {merged}
+""".format(
+    assignments=",\n    ".join(
+        f"{f} = COALESCE(excluded.{f}, comment.{f})" for f in COMMENT_DIGEST_FIELDS
+    ),
+    merged=_MERGED_COMMENT_DIGEST,
+)
+
+COMMENT_INSERT_IGNORE_SQL = COMMENT_INSERT_SQL + "ON CONFLICT(rpid) DO NOTHING"
+
+MINI_COMMENT_INSERT_SQL = f"""
+INSERT INTO comment (
+    rpid, parentid, rootid, mid, information, time, oid, type, digest, updated_at
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, {NOW_EPOCH_SQL})
+"""
+
+MINI_COMMENT_UPSERT_SQL = MINI_COMMENT_INSERT_SQL + """
+ON CONFLICT(rpid) DO UPDATE SET
+    parentid = COALESCE(excluded.parentid, comment.parentid),
+    rootid = COALESCE(excluded.rootid, comment.rootid),
+    mid = COALESCE(excluded.mid, comment.mid),
+    information = COALESCE(excluded.information, comment.information),
+    time = COALESCE(excluded.time, comment.time),
+    oid = COALESCE(excluded.oid, comment.oid),
+    type = COALESCE(excluded.type, comment.type),
+    digest = {merged},
+    updated_at = excluded.updated_at
+WHERE comment.digest IS NOT {merged}
+""".format(merged=_MERGED_COMMENT_DIGEST)
+
+MINI_COMMENT_INSERT_IGNORE_SQL = MINI_COMMENT_INSERT_SQL + "ON CONFLICT(rpid) DO NOTHING"
+
+
+# ---- 规范化布局 (comment_core + user_snapshot) ----
+
+# 快照不存在时才插入，版本号取该用户已有最大版本 + 1
+USER_SNAPSHOT_INSERT_SQL = """
+INSERT INTO user_snapshot (mid, version, name, sex, sign, face, vip, digest)
+SELECT ?1, COALESCE((SELECT MAX(version) FROM user_snapshot WHERE mid = ?1), 0) + 1,
+       ?2, ?3, ?4, ?5, ?6, ?7
+WHERE NOT EXISTS (SELECT 1 FROM user_snapshot WHERE mid = ?1 AND digest = ?7)
+"""
+
+CORE_COMMENT_DIGEST_FIELDS = (
+    "parentid", "rootid", "mid", "level", "information", "time",
+    "single_reply_num", "single_like_num", "ip_location", "oid", "type",
+    "snapshot_id",
+)
+
+_MERGED_CORE_COMMENT_DIGEST = "bili_digest({})".format(
+    ", ".join(
+        f"COALESCE(excluded.{f}, comment_core.{f})" for f in CORE_COMMENT_DIGEST_FIELDS
+    )
+)
+
+# 参数: rpid, parentid, rootid, mid, level, information, time,
+#       single_reply_num, single_like_num, ip_location, oid, type, 快照摘要
+_SNAPSHOT_ID_LOOKUP = "(SELECT snapshot_id FROM user_snapshot WHERE mid = ?4 AND digest = ?13)"
+
+
+def _core_comment_insert_sql(updated_at_sql: str) -> str:
+    return f"""
+INSERT INTO comment_core (
+    rpid, parentid, rootid, mid, level, information, time,
+    single_reply_num, single_like_num, ip_location, oid, type, snapshot_id, digest,
+    updated_at
+) VALUES (
+    ?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?11, ?12, {_SNAPSHOT_ID_LOOKUP},
+    bili_digest(?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?11, ?12, {_SNAPSHOT_ID_LOOKUP}),
+    {updated_at_sql}
+)
+"""
+
+
+_CORE_COMMENT_CONFLICT_SQL = """
+ON CONFLICT(rpid) DO UPDATE SET
+    {assignments},
+    digest = {merged},
+    updated_at = excluded.updated_at
+WHERE excluded.digest IS NOT comment_core.digest
+  AND comment_core.digest IS NOT {merged}
+""".format(
+    assignments=",\n    ".join(
+        f"{f} = COALESCE(excluded.{f}, comment_core.{f})"
+        for f in CORE_COMMENT_DIGEST_FIELDS
+    ),
+    merged=_MERGED_CORE_COMMENT_DIGEST,
+)
+
+CORE_COMMENT_INSERT_SQL = _core_comment_insert_sql(NOW_EPOCH_SQL)
+
+CORE_COMMENT_UPSERT_SQL = CORE_COMMENT_INSERT_SQL + _CORE_COMMENT_CONFLICT_SQL
+
+CORE_COMMENT_INSERT_IGNORE_SQL = CORE_COMMENT_INSERT_SQL + "ON CONFLICT(rpid) DO NOTHING"
+
+# 合并工作库时沿用工作库记录的写入时间（第 14 个参数，为 NULL 时取当前时间），
+# 否则先合并的工作库总会显得比后合并的更新，"latest" 策略失效
+CORE_COMMENT_MERGE_UPSERT_SQL = (
+    _core_comment_insert_sql(f"COALESCE(?14, {NOW_EPOCH_SQL})") + _CORE_COMMENT_CONFLICT_SQL
+)
+
+
+# 一个评论楼层：根评论及 rootid 指向它的全部回复
+THREAD_ROWS_SQL = f"""
+SELECT {COMMENT_COLUMNS} FROM comment
+WHERE rpid = ?1 OR rootid = ?1
+ORDER BY time ASC, rpid ASC
+"""
+
+# 楼层统计：规模、点赞总数，以及沿 parentid 递归得到的最大回复深度（根评论深度为 0）
+THREAD_STATS_SQL = """
+WITH RECURSIVE tree(rpid, depth) AS (
+    SELECT rpid, 0 FROM comment WHERE rpid = ?1
+    UNION ALL
+    SELECT c.rpid, tree.depth + 1
+    FROM comment c JOIN tree ON c.parentid = tree.rpid
+    WHERE c.rootid = ?1 AND c.rpid != ?1
+)
+SELECT
+    COUNT(*),
+    COALESCE(SUM(single_like_num), 0),
+    (SELECT MAX(depth) FROM tree)
+FROM comment
+WHERE rpid = ?1 OR rootid = ?1
+"""
+
+
+def encode_page_cursor(time: int, rpid: int) -> str:
+    """将 (time, rpid) 编码为不透明的分页游标字符串。"""
+    return base64.urlsafe_b64encode(f"{time}:{rpid}".encode("ascii")).decode("ascii")
+
+
+def decode_page_cursor(cursor: str) -> Tuple[int, int]:
+    """解析 encode_page_cursor 生成的游标，格式错误时抛出 ValueError。"""
+    try:
+        time, rpid = base64.urlsafe_b64decode(cursor.encode("ascii")).split(b":")
+        return int(time), int(rpid)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor!r}") from e
+
+
+def _as_rows(comments: Union[Iterable[Comment], CommentBatch]) -> List[tuple]:
+    """把 Comment 序列或 CommentBatch 统一为按 COMMENT_FIELDS 排列的行元组列表。"""
+    if isinstance(comments, CommentBatch):
+        return list(comments.rows())
+    return [comment.to_tuple() for comment in comments]
+
+
+def _comment_row(row: tuple) -> tuple:
+    return row + (row_digest(*row[1:]),)
+
+
+def _mini_comment_row(row: tuple) -> tuple:
+    # rpid, parentid, rootid, mid, information, time, oid, type, digest
+    return (
+        row[0], row[1], row[2], row[3], row[7], row[8], row[15], row[16],
+        row_digest(*row[1:]),
+    )
 
 
 class CommentRepository:
@@ -8,132 +201,154 @@ class CommentRepository:
         self.db_name = db_name
 
     def _get_connection(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.db_name)
+        conn = sqlite3.connect(self.db_name)
+        register_digest_function(conn)
+        return conn
 
     def add_comment(self, comment: Comment, overwrite: bool = False) -> bool:
+        inserted, updated = self.add_comments([comment], overwrite=overwrite)
+        return inserted + updated > 0
+
+    def add_mini_comment(self, comment: Comment, overwrite: bool = False) -> bool:
+        inserted, updated = self.add_mini_comments([comment], overwrite=overwrite)
+        return inserted + updated > 0
+
+    def add_comments(
+        self, comments: Union[Iterable[Comment], CommentBatch], overwrite: bool = True
+    ) -> Tuple[int, int]:
+        """
+        批量写入完整评论（Comment 序列或 CommentBatch），rpid 冲突时按 overwrite 决定是否更新。
+        更新时只合并非空字段，且仅在可变字段摘要变化时才真正写入。
+        所有行在同一个事务中通过 executemany 写入。
+        返回 (新增条数, 实际更新条数)。
+        """
+        return self._bulk_write(comments, mini=False, overwrite=overwrite)
+
+    def add_mini_comments(
+        self, comments: Union[Iterable[Comment], CommentBatch], overwrite: bool = True
+    ) -> Tuple[int, int]:
+        """
+        批量写入精简评论（仅包含评论本身的字段，不含用户快照）。
+        已有行中由完整爬虫写入的用户快照字段会被保留。
+        返回 (新增条数, 实际更新条数)。
+        """
+        return self._bulk_write(comments, mini=True, overwrite=overwrite)
+
+    def _bulk_write(
+        self, comments: Union[Iterable[Comment], CommentBatch], mini: bool, overwrite: bool
+    ) -> Tuple[int, int]:
+        return self._write_rows(_as_rows(comments), mini, overwrite)
+
+    def _write_rows(self, rows: List[tuple], mini: bool, overwrite: bool) -> Tuple[int, int]:
+        """写入按 COMMENT_FIELDS 排列的行元组，返回 (新增条数, 实际更新条数)。"""
+        if not rows:
+            return 0, 0
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
-            # 检查 rpid 是否已存在
-            cursor.execute("SELECT 1 FROM comment WHERE rpid = ?", (comment.rpid,))
-            exists = cursor.fetchone()
-
-            if exists:
-                if overwrite:
-                    # 如果存在且允许覆盖，则执行 UPDATE
-                    update_sql = """
-                    UPDATE comment SET
-                        parentid = ?, rootid = ?, mid = ?, name = ?, level = ?, sex = ?,
-                        information = ?, time = ?, single_reply_num = ?,
-                        single_like_num = ?, sign = ?, ip_location = ?,
-                        vip = ?, face = ?, oid = ?, type = ?
-                    WHERE rpid = ?
-                    """
-                    # 更新操作，rpid 在 WHERE 子句，所以元组参数顺序要调整
-                    params = (
-                        comment.parentid,
-                        comment.rootid,
-                        comment.mid,
-                        comment.name,
-                        comment.level,
-                        comment.sex,
-                        comment.information,
-                        comment.time,
-                        comment.single_reply_num,
-                        comment.single_like_num,
-                        comment.sign,
-                        comment.ip_location,
-                        comment.vip,
-                        comment.face,
-                        comment.oid,
-                        comment.rpid,
-                        comment.type,
+            table = comment_storage_table(conn)
+
+            # 先统计已存在的 rpid，用于区分新增与更新；按块内联查询，不写临时表
+            rpids = list({row[0] for row in rows})
+            existing = 0
+            for keys_sql, params in iter_key_chunks(rpids):
+                cursor.execute(
+                    f"SELECT COUNT(*) FROM {table} WHERE rpid IN {keys_sql}", params
+                )
+                existing += cursor.fetchone()[0]
+
+            if table == "comment_core":
+                affected = self._write_normalized(cursor, rows, overwrite)
+            else:
+                if mini:
+                    db_rows = [_mini_comment_row(row) for row in rows]
+                    upsert_sql = (
+                        MINI_COMMENT_UPSERT_SQL
+                        if overwrite
+                        else MINI_COMMENT_INSERT_IGNORE_SQL
                     )
-                    cursor.execute(update_sql, params)
-                    conn.commit()
-                    return True
                 else:
-                    # 如果存在且不允许覆盖，则不操作
-                    return False
-            else:
-                # 如果不存在，则执行 INSERT
-                insert_sql = """
-                INSERT INTO comment (
-                    rpid, parentid, rootid, mid, name, level, sex, information,
-                    time, single_reply_num, single_like_num, sign,
-                    ip_location, vip, face, oid, type
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """
-                cursor.execute(insert_sql, comment.to_tuple())
-                conn.commit()
-                return True
+                    db_rows = [_comment_row(row) for row in rows]
+                    upsert_sql = (
+                        COMMENT_UPSERT_SQL if overwrite else COMMENT_INSERT_IGNORE_SQL
+                    )
+                cursor.executemany(upsert_sql, db_rows)
+                affected = cursor.rowcount
+            conn.commit()
+            inserted = len(rpids) - existing
+            return inserted, max(affected - inserted, 0)
         except sqlite3.Error as e:
             conn.rollback()
-            print(f"添加/更新评论失败: {e}")
-            return False
+            print(f"批量添加/更新评论失败: {e}")
+            return 0, 0
         finally:
             conn.close()
 
-    def add_mini_comment(self, comment: Comment, overwrite: bool = False) -> bool:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        try:
-            # 检查 rpid 是否已存在
-            cursor.execute("SELECT 1 FROM comment WHERE rpid = ?", (comment.rpid,))
-            exists = cursor.fetchone()
-
-            if exists:
-                if overwrite:
-                    # 如果存在且允许覆盖，则执行 UPDATE
-                    update_sql = """
-                    UPDATE comment SET
-                        parentid = ?, rootid=?, mid = ?,information = ?, time = ?, oid = ?, type = ?
-                    WHERE rpid = ?
-                    """
-                    # 更新操作，rpid 在 WHERE 子句，所以元组参数顺序要调整
-                    params = (
-                        comment.parentid,
-                        comment.rootid,
-                        comment.mid,
-                        comment.information,
-                        comment.time,
-                        comment.oid,
-                        comment.rpid,
-                        comment.type,
-                    )
-                    cursor.execute(update_sql, params)
-                    conn.commit()
-                    return True
-                else:
-                    # 如果存在且不允许覆盖，则不操作
-                    return False
-            else:
-                # 如果不存在，则执行 INSERT
-                insert_sql = """
-                INSERT INTO comment (
-                    rpid, parentid, rootid, mid, information, time, oid, type
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """
+    def merge_rows(
+        self,
+        cursor: sqlite3.Cursor,
+        rows: List[tuple],
+        updated_ats: List[Optional[int]],
+    ) -> int:
+        """
+        在调用方的事务中把合并来的评论行（按 COMMENT_FIELDS 排列）写入规范化布局的评论库，
+        冲突时按非空字段覆盖；各行的 updated_at 沿用 updated_ats 中对应的值（为 None 时取当前时间），
+        合并工作库时据此保留各行原本的写入时间。不提交事务，返回评论表受影响的行数。
+        """
+        if not rows:
+            return 0
+        return self._write_normalized(cursor, rows, overwrite=True, updated_ats=updated_ats)
 
-                params_for_insert = (
-                    comment.rpid,
-                    comment.parentid,
-                    comment.rootid,
-                    comment.mid,
-                    comment.information,
-                    comment.time,
-                    comment.oid,
-                    comment.type,
+    def _write_normalized(
+        self,
+        cursor: sqlite3.Cursor,
+        rows: List[tuple],
+        overwrite: bool,
+        updated_ats: Optional[List[Optional[int]]] = None,
+    ) -> int:
+        """
+        规范化布局的写入：先写入去重后的用户快照，再写入引用快照的评论行。
+        rows 按 COMMENT_FIELDS 排列。精简评论不带用户字段，快照为空时保留评论原有的 snapshot_id。
+        给出 updated_ats（与 rows 一一对应）时以它作为各行的 updated_at（合并工作库用），否则取当前时间。
+        返回评论表受影响的行数。
+        """
+        snapshots = {}
+        core_rows = []
+        for (
+            rpid, parentid, rootid, mid, name, level, sex, information, time,
+            single_reply_num, single_like_num, sign, ip_location, vip, face, oid, type,
+        ) in rows:
+            snapshot = (name, sex, sign, face, vip)
+            snapshot_digest = None
+            if mid is not None and any(v is not None for v in snapshot):
+                snapshot_digest = row_digest(*snapshot)
+                snapshots[(mid, snapshot_digest)] = snapshot
+            core_rows.append(
+                (
+                    rpid, parentid, rootid, mid, level, information, time,
+                    single_reply_num, single_like_num, ip_location, oid, type,
+                    snapshot_digest,
                 )
-                cursor.execute(insert_sql, params_for_insert)
-                conn.commit()
-                return True
-        except sqlite3.Error as e:
-            conn.rollback()
-            print(f"添加/更新评论失败: {e}")
-            return False
-        finally:
-            conn.close()
+            )
+
+        cursor.executemany(
+            USER_SNAPSHOT_INSERT_SQL,
+            [
+                (mid, *snapshot, snapshot_digest)
+                for (mid, snapshot_digest), snapshot in snapshots.items()
+            ],
+        )
+        if updated_ats is not None:
+            cursor.executemany(
+                CORE_COMMENT_MERGE_UPSERT_SQL,
+                [(*row, updated_at) for row, updated_at in zip(core_rows, updated_ats)],
+            )
+        else:
+            cursor.executemany(
+                CORE_COMMENT_UPSERT_SQL if overwrite else CORE_COMMENT_INSERT_IGNORE_SQL,
+                core_rows,
+            )
+        return cursor.rowcount
 
     def delete_comments_by_mids(self, mids: List[int]) -> int:
         """
@@ -145,10 +360,11 @@ class CommentRepository:
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
-            # 使用 IN 子句处理多个 mid
-            placeholders = ",".join(["?"] * len(mids))
-            delete_sql = f"DELETE FROM comment WHERE mid IN ({placeholders})"
-            cursor.execute(delete_sql, tuple(mids))
+            # mid 较多时通过临时表关联，避免超出 SQLite 变量上限
+            keys_sql, params = bind_keys(conn, mids)
+            table = comment_storage_table(conn)
+            delete_sql = f"DELETE FROM {table} WHERE mid IN {keys_sql}"
+            cursor.execute(delete_sql, params)
             deleted_count = cursor.rowcount
             conn.commit()
             return deleted_count
@@ -169,10 +385,11 @@ class CommentRepository:
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
-            # 使用 IN 子句处理多个 oid
-            placeholders = ",".join(["?"] * len(oids))
-            delete_sql = f"DELETE FROM comment WHERE oid IN ({placeholders})"
-            cursor.execute(delete_sql, tuple(oids))
+            # oid 较多时通过临时表关联，避免超出 SQLite 变量上限
+            keys_sql, params = bind_keys(conn, oids)
+            table = comment_storage_table(conn)
+            delete_sql = f"DELETE FROM {table} WHERE oid IN {keys_sql}"
+            cursor.execute(delete_sql, params)
             deleted_count = cursor.rowcount
             conn.commit()
             return deleted_count
@@ -200,18 +417,18 @@ class CommentRepository:
         offset = (page - 1) * page_size
         conn = self._get_connection()
         cursor = conn.cursor()
+        cursor.row_factory = Comment.row_factory
         comments = []
         try:
-            placeholders = ",".join(["?"] * len(mids))
+            keys_sql, params = bind_keys(conn, mids)
             query_sql = f"""
-            SELECT * FROM comment
-            WHERE mid IN ({placeholders})
+            SELECT {COMMENT_COLUMNS} FROM comment
+            WHERE mid IN {keys_sql}
             ORDER BY time DESC -- 通常按时间倒序排列
             LIMIT ? OFFSET ?
             """
-            cursor.execute(query_sql, tuple(mids + [page_size, offset]))
-            for row in cursor.fetchall():
-                comments.append(Comment.from_db_row(row))
+            cursor.execute(query_sql, params + (page_size, offset))
+            comments = cursor.fetchall()
         except sqlite3.Error as e:
             print(f"按 mid 分页查询评论失败: {e}")
         finally:
@@ -235,77 +452,459 @@ class CommentRepository:
         offset = (page - 1) * page_size
         conn = self._get_connection()
         cursor = conn.cursor()
+        cursor.row_factory = Comment.row_factory
         comments = []
         try:
-            placeholders = ",".join(["?"] * len(oids))
+            keys_sql, params = bind_keys(conn, oids)
             query_sql = f"""
-            SELECT * FROM comment
-            WHERE oid IN ({placeholders})
+            SELECT {COMMENT_COLUMNS} FROM comment
+            WHERE oid IN {keys_sql}
             ORDER BY time DESC
             LIMIT ? OFFSET ?
             """
-            cursor.execute(query_sql, tuple(oids + [page_size, offset]))
-            for row in cursor.fetchall():
-                comments.append(Comment.from_db_row(row))
+            cursor.execute(query_sql, params + (page_size, offset))
+            comments = cursor.fetchall()
         except sqlite3.Error as e:
             print(f"按 oid 分页查询评论失败: {e}")
         finally:
             conn.close()
         return comments
 
-    def get_comments_by_mid_stream(self, mids: List[int]) -> Iterator[Comment]:
-        if not mids:
-            return  # 使用 return 结束生成器
+    def get_comments_by_mid_cursor(
+        self, mids: List[int], cursor: Optional[str] = None, page_size: int = 20
+    ) -> Tuple[List[Comment], Optional[str]]:
+        """
+        根据一个或多个用户ID (mid) 按游标（keyset）分页查询评论，按时间倒序。
+        cursor 为上一页返回的游标，首页传 None。
+        返回 (本页 Comment 列表, 下一页游标)，没有下一页时游标为 None。
+        每页都走 (mid, time) 索引定位，耗时与翻到第几页无关。
+        """
+        return self._get_comments_by_cursor("mid", mids, cursor, page_size)
+
+    def get_comments_by_oid_cursor(
+        self, oids: List[int], cursor: Optional[str] = None, page_size: int = 20
+    ) -> Tuple[List[Comment], Optional[str]]:
+        """
+        根据一个或多个视频ID (oid) 按游标（keyset）分页查询评论，按时间倒序。
+        用法与 get_comments_by_mid_cursor 相同。
+        """
+        return self._get_comments_by_cursor("oid", oids, cursor, page_size)
+
+    def _get_comments_by_cursor(
+        self,
+        column: str,
+        keys: List[int],
+        cursor: Optional[str],
+        page_size: int,
+    ) -> Tuple[List[Comment], Optional[str]]:
+        if not keys:
+            return [], None
+        if page_size < 1:
+            page_size = 20
+        if cursor is None:
+            # 首页：用一个大于任何真实数据的位置作为起点
+            last_time, last_rpid = 2**62, 2**62
+        else:
+            last_time, last_rpid = decode_page_cursor(cursor)
 
         conn = self._get_connection()
+        cursor_obj = conn.cursor()
+        cursor_obj.row_factory = Comment.row_factory
+        comments = []
         try:
-            cursor = conn.cursor()
-            placeholders = ",".join(["?"] * len(mids))
             query_sql = f"""
-            SELECT * FROM comment
-            WHERE mid IN ({placeholders})
-            ORDER BY time ASC -- 流式通常按时间升序处理
+            SELECT {COMMENT_COLUMNS} FROM comment
+            WHERE {column} = ?
+            AND (time, rpid) < (?, ?)
+            ORDER BY time DESC, rpid DESC
+            LIMIT ?
             """
-            cursor.execute(query_sql, tuple(mids))
-            while True:
-                rows = cursor.fetchmany(1000)  # 每次取1000条，避免一次性加载过多内存
-                if not rows:
+            # 多个 key 时 IN + ORDER BY 无法利用索引顺序，会对全部匹配行排序；
+            # 这里对每个 key 各取一页（均为索引范围扫描），再按 (time, rpid) 归并
+            per_key_rows = []
+            for key in dict.fromkeys(keys):
+                cursor_obj.execute(query_sql, (key, last_time, last_rpid, page_size))
+                per_key_rows.append(cursor_obj.fetchall())
+            merged = heapq.merge(
+                *per_key_rows, key=lambda c: (c.time, c.rpid), reverse=True
+            )
+            for comment in merged:
+                comments.append(comment)
+                if len(comments) == page_size:
                     break
-                for row in rows:
-                    yield Comment.from_db_row(row)
         except sqlite3.Error as e:
-            print(f"按 mid 流式查询评论失败: {e}")
+            print(f"按 {column} 游标分页查询评论失败: {e}")
         finally:
-            if conn:
-                conn.close()
+            conn.close()
+
+        next_cursor = None
+        if len(comments) == page_size:
+            last = comments[-1]
+            next_cursor = encode_page_cursor(last.time, last.rpid)
+        return comments, next_cursor
+
+    def get_comments_by_mid_stream(self, mids: List[int]) -> Iterator[Comment]:
+        for comments in self._stream_chunks(
+            "mid", mids, only_videos=False, chunk_size=1000, row_factory=Comment.row_factory
+        ):
+            yield from comments
 
     def get_comments_by_oid_stream(self, oids: List[int]) -> Iterator[Comment]:
         """
         根据一个或多个视频ID (oid) 流式查询评论。
         返回一个 Comment 对象的迭代器。
         """
-        if not oids:
+        for comments in self._stream_chunks(
+            "oid", oids, only_videos=True, chunk_size=1000, row_factory=Comment.row_factory
+        ):
+            yield from comments
+
+    def get_comments_by_mid_batches(
+        self, mids: List[int], batch_size: int = 10000
+    ) -> Iterator[CommentBatch]:
+        """与 get_comments_by_mid_stream 相同的查询，按列式 CommentBatch 分块返回。"""
+        for rows in self._stream_chunks("mid", mids, only_videos=False, chunk_size=batch_size):
+            yield CommentBatch.from_rows(rows)
+
+    def get_comments_by_oid_batches(
+        self, oids: List[int], batch_size: int = 10000
+    ) -> Iterator[CommentBatch]:
+        """与 get_comments_by_oid_stream 相同的查询，按列式 CommentBatch 分块返回。"""
+        for rows in self._stream_chunks("oid", oids, only_videos=True, chunk_size=batch_size):
+            yield CommentBatch.from_rows(rows)
+
+    def _stream_chunks(
+        self,
+        column: str,
+        keys: List[int],
+        only_videos: bool,
+        chunk_size: int,
+        row_factory=None,
+    ) -> Iterator[list]:
+        """按时间升序分块读取 column IN keys 的评论，每块最多 chunk_size 行，避免一次性加载过多内存。"""
+        if not keys:
             return  # 使用 return 结束生成器
 
         conn = self._get_connection()
         try:
             cursor = conn.cursor()
-            placeholders = ",".join(["?"] * len(oids))
+            cursor.row_factory = row_factory
+            keys_sql, params = bind_keys(conn, keys)
             query_sql = f"""
-            SELECT * FROM comment
-            WHERE oid IN ({placeholders})
-            AND type = 1
+            SELECT {COMMENT_COLUMNS} FROM comment
+            WHERE {column} IN {keys_sql}
+            {"AND type = 1" if only_videos else ""}
             ORDER BY time ASC -- 流式通常按时间升序处理
             """
-            cursor.execute(query_sql, tuple(oids))
+            cursor.execute(query_sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        except sqlite3.Error as e:
+            print(f"按 {column} 流式查询评论失败: {e}")
+        finally:
+            if conn:
+                conn.close()
+
+    def stream_rows(
+        self,
+        columns_sql: str = COMMENT_COLUMNS,
+        chunk_size: int = 50000,
+        order_sql: str = "time ASC, rpid ASC",
+        **filters,
+    ) -> Iterator[list]:
+        """
+        按任意条件组合分块读取评论的原始行元组，供导出等批量场景使用。
+        columns_sql 为 SELECT 列表（可包含 SQL 表达式）；filters 为 comment_filter_sql 的过滤条件。
+        每次产出一个最多 chunk_size 行的列表，不构造 Comment 对象。
+        """
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.arraysize = chunk_size
+            where_sql, params = comment_filter_sql(conn, **filters)
+            cursor.execute(
+                f"SELECT {columns_sql} FROM comment {where_sql} ORDER BY {order_sql}",
+                params,
+            )
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                yield rows
+        except sqlite3.Error as e:
+            print(f"批量读取评论失败: {e}")
+        finally:
+            if conn:
+                conn.close()
+
+    def count_rows(self, **filters) -> int:
+        """统计满足过滤条件（同 comment_filter_sql）的评论条数，查询失败时返回 -1。"""
+        conn = self._get_connection()
+        try:
+            where_sql, params = comment_filter_sql(conn, **filters)
+            return conn.execute(f"SELECT COUNT(*) FROM comment {where_sql}", params).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"统计评论数量失败: {e}")
+            return -1
+        finally:
+            conn.close()
+
+    def last_update_key(
+        self, updated_before: Optional[int] = None, **filters
+    ) -> Optional[Tuple[int, int]]:
+        """
+        满足过滤条件（同 comment_filter_sql）的评论中最大的 (updated_at, rpid) 变更键，
+        缺失的 updated_at 视为 0；给定 updated_before 时只考虑 updated_at 早于它的评论。
+        没有评论或查询失败时返回 None。
+        """
+        conn = self._get_connection()
+        try:
+            where_sql, params = comment_filter_sql(conn, **filters)
+            if updated_before is not None:
+                where_sql += " AND " if where_sql else "WHERE "
+                where_sql += "COALESCE(updated_at, 0) < ?"
+                params.append(updated_before)
+            row = conn.execute(
+                f"""
+                SELECT COALESCE(updated_at, 0), rpid FROM comment {where_sql}
+                ORDER BY COALESCE(updated_at, 0) DESC, rpid DESC
+                LIMIT 1
+                """,
+                params,
+            ).fetchone()
+            return tuple(row) if row else None
+        except sqlite3.Error as e:
+            print(f"查询评论变更键失败: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def sync_search_index(self, batch_size: int = 5000) -> int:
+        """
+        将待索引队列中的评论分词后写入全文索引 comment_fts。
+        只处理新增或内容变化的评论，返回本次写入索引的条数。
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        synced = 0
+        try:
+            if not has_search_index(conn):
+                print("未建立评论全文索引，请开启 SEARCH_INDEX_ENABLED 后重新初始化数据库。")
+                return 0
+            table = comment_storage_table(conn)
             while True:
-                rows = cursor.fetchmany(1000)  # 每次取1000条
+                cursor.execute(
+                    f"""
+                    SELECT p.rpid, c.information
+                    FROM comment_fts_pending p
+                    LEFT JOIN {table} c ON c.rpid = p.rpid
+                    LIMIT ?
+                    """,
+                    (batch_size,),
+                )
+                rows = cursor.fetchall()
                 if not rows:
                     break
-                for row in rows:
-                    yield Comment.from_db_row(row)
+                cursor.executemany(
+                    "INSERT OR REPLACE INTO comment_fts (rowid, tokens) VALUES (?, ?)",
+                    [
+                        (rpid, segment_for_index(information))
+                        for rpid, information in rows
+                        if information is not None
+                    ],
+                )
+                cursor.executemany(
+                    "DELETE FROM comment_fts_pending WHERE rpid = ?",
+                    [(rpid,) for rpid, _ in rows],
+                )
+                conn.commit()
+                synced += len(rows)
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"同步评论全文索引失败: {e}")
+        finally:
+            conn.close()
+        return synced
+
+    def search(
+        self,
+        query: str,
+        oids: Optional[List[int]] = None,
+        mids: Optional[List[int]] = None,
+        limit: int = 20,
+    ) -> List[Comment]:
+        """
+        按关键词全文检索评论内容，结果按 bm25 相关度排序。
+        可选地限定在若干视频ID (oid) 或用户ID (mid) 范围内。
+        检索前会先同步尚未建立索引的评论。
+        """
+        match_query = build_match_query(query)
+        if not match_query:
+            return []
+        self.sync_search_index()
+
+        conn = self._get_connection()
+        comments = []
+        try:
+            for _, row in self._search_rows(conn, match_query, oids, mids, limit):
+                comments.append(Comment.from_db_row(row))
         except sqlite3.Error as e:
-            print(f"按 oid 流式查询评论失败: {e}")
+            print(f"全文检索评论失败: {e}")
+        finally:
+            conn.close()
+        return comments
+
+    def _search_rows(
+        self,
+        conn: sqlite3.Connection,
+        match_query: str,
+        oids: Optional[List[int]],
+        mids: Optional[List[int]],
+        limit: int,
+    ) -> List[Tuple[float, tuple]]:
+        """返回 [(bm25 分数, 评论行), ...]，分数越小越相关；未建立全文索引时为空。"""
+        if not has_search_index(conn):
+            return []
+        conditions = ["comment_fts MATCH ?"]
+        params = (match_query,)
+        if oids:
+            keys_sql, key_params = bind_keys(conn, oids)
+            conditions.append(f"c.oid IN {keys_sql}")
+            params += key_params
+        if mids:
+            keys_sql, key_params = bind_keys(conn, mids)
+            conditions.append(f"c.mid IN {keys_sql}")
+            params += key_params
+        query_sql = f"""
+        SELECT bm25(comment_fts), {", ".join(f"c.{f}" for f in COMMENT_FIELDS)} FROM comment_fts
+        JOIN comment c ON c.rpid = comment_fts.rowid
+        WHERE {" AND ".join(conditions)}
+        ORDER BY bm25(comment_fts)
+        LIMIT ?
+        """
+        cursor = conn.cursor()
+        cursor.execute(query_sql, params + (limit,))
+        return [(row[0], row[1:]) for row in cursor.fetchall()]
+
+    def get_thread(self, rootid: int) -> Optional[Dict[str, Any]]:
+        """
+        获取以 rootid 为根的完整评论楼层。
+        返回 {"root": 节点, "stats": {"size", "like_total", "depth"}}，
+        节点为 {"comment": Comment, "replies": [子节点, ...]}；楼层不存在时返回 None。
+        """
+        conn = self._get_connection()
+        try:
+            return _fetch_thread(conn.cursor(), rootid)
+        except sqlite3.Error as e:
+            print(f"查询评论楼层失败: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def get_threads_for_oid(self, oid: int) -> Iterator[Dict[str, Any]]:
+        """
+        按时间顺序逐个楼层地流式返回某个视频 (oid) 下的全部评论楼层，
+        每个楼层的结构与 get_thread 相同，内存占用只与单个楼层大小相关。
+        """
+        conn = self._get_connection()
+        try:
+            root_cursor = conn.cursor()
+            thread_cursor = conn.cursor()
+            root_cursor.execute(
+                """
+                SELECT rpid FROM comment
+                WHERE oid = ?
+                AND type = 1
+                AND (rootid IS NULL OR rootid = 0 OR rootid = rpid)
+                ORDER BY time ASC
+                """,
+                (oid,),
+            )
+            while True:
+                roots = root_cursor.fetchmany(1000)
+                if not roots:
+                    break
+                for (rootid,) in roots:
+                    thread = _fetch_thread(thread_cursor, rootid)
+                    if thread is not None:
+                        yield thread
+        except sqlite3.Error as e:
+            print(f"按 oid 流式查询评论楼层失败: {e}")
         finally:
             if conn:
                 conn.close()
+
+
+def comment_filter_sql(
+    conn: sqlite3.Connection,
+    oids: Optional[List[int]] = None,
+    mids: Optional[List[int]] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    only_videos: bool = False,
+    after: Optional[Tuple[int, int]] = None,
+    up_to: Optional[Tuple[int, int]] = None,
+    updated_after: Optional[Tuple[int, int]] = None,
+) -> Tuple[str, list]:
+    """
+    生成批量读取评论时的 WHERE 子句及参数：
+    oids / mids 为 None 表示不按该字段过滤；start_time / end_time 为闭区间的 Unix 时间戳；
+    after / up_to 为 (time, rpid) 排序键，分别取其后（不含）/ 其前（含）的评论，用于增量导出；
+    updated_after 为 (updated_at, rpid) 变更键，只取变更键在其后（不含）的评论；缺失的 updated_at 视为 0。
+    """
+    conditions, params = [], []
+    for column, keys in (("oid", oids), ("mid", mids)):
+        if keys is not None:
+            keys_sql, key_params = bind_keys(conn, keys)
+            conditions.append(f"{column} IN {keys_sql}")
+            params.extend(key_params)
+    if start_time is not None:
+        conditions.append("time >= ?")
+        params.append(start_time)
+    if end_time is not None:
+        conditions.append("time <= ?")
+        params.append(end_time)
+    if only_videos:
+        conditions.append("type = 1")
+    # 排序键比较拆成 time 的范围条件加补充条件，使 (oid, time) / (mid, time) 索引仍可用于范围扫描
+    if after is not None:
+        conditions.append("time >= ? AND (time > ? OR rpid > ?)")
+        params.extend((after[0], after[0], after[1]))
+    if up_to is not None:
+        conditions.append("time <= ? AND (time < ? OR rpid <= ?)")
+        params.extend((up_to[0], up_to[0], up_to[1]))
+    if updated_after is not None:
+        conditions.append(
+            "COALESCE(updated_at, 0) >= ? AND (COALESCE(updated_at, 0) > ? OR rpid > ?)"
+        )
+        params.extend((updated_after[0], updated_after[0], updated_after[1]))
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where_sql, params
+
+
+def _fetch_thread(cursor: sqlite3.Cursor, rootid: int) -> Optional[Dict[str, Any]]:
+    cursor.execute(THREAD_ROWS_SQL, (rootid,))
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    cursor.execute(THREAD_STATS_SQL, (rootid,))
+    size, like_total, depth = cursor.fetchone()
+
+    nodes = {row[0]: {"comment": Comment.from_db_row(row), "replies": []} for row in rows}
+    # 根评论可能未被爬取（例如只爬了某用户的回复），此时以空根节点承载回复
+    root = nodes.get(rootid) or {"comment": None, "replies": []}
+    for rpid, node in nodes.items():
+        if rpid == rootid:
+            continue
+        parent = nodes.get(node["comment"].parentid)
+        # 父评论缺失或指向自身时直接挂在根节点下
+        if parent is None or parent is node:
+            parent = root
+        parent["replies"].append(node)
+    return {
+        "root": root,
+        "stats": {"size": size, "like_total": like_total, "depth": depth or 0},
+    }
@@ -0,0 +1,75 @@
+import sqlite3
+from typing import Any, Dict, Iterable, List, Tuple
+from database.db_manage import CREATE_COMMENT_TOKENS_TABLE_SQL, CREATE_SENTIMENT_CACHE_TABLE_SQL
+from repository.multi_key import bind_keys
+
+# 按评论内容缓存的计算结果：表名 -> (值所在的列, 建表语句)
+CONTENT_CACHE_TABLES = {
+    "sentiment_cache": ("score", CREATE_SENTIMENT_CACHE_TABLE_SQL),
+    "comment_tokens": ("tokens", CREATE_COMMENT_TOKENS_TABLE_SQL),
+}
+
+
+class ContentCacheRepository:
+    """
+    读写按评论内容缓存计算结果的表（见 CONTENT_CACHE_TABLES）：每条评论一行 (rpid, content_hash, 值)。
+    content_hash 为计算时评论内容的摘要，内容被编辑后摘要不再匹配，需重新计算。
+    表不存在时（旧版本数据库）在首次读写时创建。
+    缓存只依赖 rpid 与评论内容，不读取评论表，评论分片存储时也放在主库中。
+    """
+
+    def __init__(self, db_name, table: str):
+        if table not in CONTENT_CACHE_TABLES:
+            raise ValueError(f"未知的缓存表: {table}，可选 {list(CONTENT_CACHE_TABLES)}")
+        self.db_name = db_name
+        self.table = table
+        self.value_column, self._create_table_sql = CONTENT_CACHE_TABLES[table]
+
+    def _get_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_name)
+        conn.execute(self._create_table_sql)
+        return conn
+
+    def get(self, rpids: List[int]) -> Dict[int, Tuple[int, Any]]:
+        """获取若干评论的缓存 {rpid: (content_hash, 值)}，未缓存的评论不在结果中。"""
+        if not rpids:
+            return {}
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cached = {}
+        try:
+            keys_sql, params = bind_keys(conn, rpids)
+            cursor.execute(
+                f"SELECT rpid, content_hash, {self.value_column} FROM {self.table} "
+                f"WHERE rpid IN {keys_sql}",
+                params,
+            )
+            for rpid, content_hash, value in cursor:
+                cached[rpid] = (content_hash, value)
+        except sqlite3.Error as e:
+            print(f"读取缓存表 '{self.table}' 失败: {e}")
+        finally:
+            conn.close()
+        return cached
+
+    def save(self, rows: Iterable[Tuple[int, int, Any]]) -> bool:
+        """批量写入 (rpid, content_hash, 值)，已有的评论覆盖为新的摘要和值。"""
+        conn = self._get_connection()
+        try:
+            conn.executemany(
+                f"""
+                INSERT INTO {self.table} (rpid, content_hash, {self.value_column}) VALUES (?, ?, ?)
+                ON CONFLICT (rpid) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    {self.value_column} = excluded.{self.value_column}
+                """,
+                rows,
+            )
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"写入缓存表 '{self.table}' 失败: {e}")
+            return False
+        finally:
+            conn.close()
@@ -0,0 +1,73 @@
+import sqlite3
+from typing import List, Tuple
+from database.db_manage import comment_storage_table
+
+
+class CounterHistoryRepository:
+    """
+    读取 comment_counter_history 中记录的点赞数 / 回复数变化。
+    表中保存的是增量，这里以窗口累加还原出每个时刻的取值。
+    需在 init_bilibili_db(counter_history=True) 后才会有数据。
+    """
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+
+    def _get_connection(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_name)
+
+    def get_comment_series(self, rpid: int) -> List[Tuple[int, int, int]]:
+        """
+        获取单条评论的计数变化序列 [(crawl_ts, 点赞数, 回复数), ...]，按时间升序。
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        series = []
+        try:
+            cursor.execute(
+                """
+                SELECT crawl_ts,
+                       SUM(like_delta) OVER (ORDER BY crawl_ts),
+                       SUM(reply_delta) OVER (ORDER BY crawl_ts)
+                FROM comment_counter_history
+                WHERE rpid = ?
+                ORDER BY crawl_ts
+                """,
+                (rpid,),
+            )
+            series = cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"获取评论计数历史失败: {e}")
+        finally:
+            conn.close()
+        return series
+
+    def get_video_series(self, oid: int) -> List[Tuple[int, int, int]]:
+        """
+        获取某视频下全部评论的总点赞数 / 总回复数随爬取时间的变化 [(crawl_ts, 总点赞数, 总回复数), ...]。
+        只包含库中仍存在的评论。
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        series = []
+        try:
+            table = comment_storage_table(conn)
+            cursor.execute(
+                f"""
+                SELECT crawl_ts,
+                       SUM(SUM(h.like_delta)) OVER (ORDER BY crawl_ts),
+                       SUM(SUM(h.reply_delta)) OVER (ORDER BY crawl_ts)
+                FROM comment_counter_history h
+                JOIN {table} c ON c.rpid = h.rpid
+                WHERE c.oid = ?
+                GROUP BY crawl_ts
+                ORDER BY crawl_ts
+                """,
+                (oid,),
+            )
+            series = cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"获取视频计数历史失败: {e}")
+        finally:
+            conn.close()
+        return series
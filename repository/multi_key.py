@@ -0,0 +1,43 @@
+import itertools
+import sqlite3
+from typing import Iterable, Iterator, Tuple
+
+# 不超过该数量的 key 直接展开为 IN (?, ?, ...)，远低于 SQLite 默认的变量上限；
+# 超过则写入临时表后通过子查询关联，避免超长且无法复用的 SQL
+INLINE_KEY_LIMIT = 500
+
+_temp_table_ids = itertools.count()
+
+
+def bind_keys(conn: sqlite3.Connection, keys: Iterable) -> Tuple[str, tuple]:
+    """
+    为多 key 查询生成 IN 子句右侧的 SQL 片段及其参数，用法：
+
+        keys_sql, params = bind_keys(conn, oids)
+        conn.execute(f"SELECT rpid FROM comment WHERE oid IN {keys_sql}", params)
+
+    key 较少时返回 "(?, ?, ...)"；较多时把 key 写入当前连接的临时表，
+    返回 "(SELECT k FROM temp.xxx)"，临时表随连接关闭自动删除。
+    """
+    unique_keys = list(dict.fromkeys(keys))
+    if len(unique_keys) <= INLINE_KEY_LIMIT:
+        return "({})".format(",".join(["?"] * len(unique_keys))), tuple(unique_keys)
+
+    table = f"bind_keys_{next(_temp_table_ids)}"
+    conn.execute(f"CREATE TEMP TABLE {table} (k PRIMARY KEY) WITHOUT ROWID")
+    conn.executemany(
+        f"INSERT OR IGNORE INTO temp.{table} (k) VALUES (?)",
+        ((key,) for key in unique_keys),
+    )
+    return f"(SELECT k FROM temp.{table})", ()
+
+
+def iter_key_chunks(keys: Iterable) -> Iterator[Tuple[str, tuple]]:
+    """
+    把 key 去重后按 INLINE_KEY_LIMIT 分块，逐块产出 "(?, ?, ...)" 片段及其参数。
+    每块各执行一次即可得到结果的查询（计数、按 key 取行）用它代替 bind_keys，省去写临时表。
+    """
+    unique_keys = list(dict.fromkeys(keys))
+    for start in range(0, len(unique_keys), INLINE_KEY_LIMIT):
+        chunk = tuple(unique_keys[start:start + INLINE_KEY_LIMIT])
+        yield "({})".format(",".join(["?"] * len(chunk))), chunk
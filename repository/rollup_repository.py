@@ -0,0 +1,119 @@
+import sqlite3
+from typing import Any, Dict, List, Optional
+from database.db_manage import (
+    COMMENT_ROLLUP_DIMENSIONS,
+    comment_storage_table,
+    rebuild_comment_rollups,
+    rollup_dimension_values,
+)
+from repository.multi_key import bind_keys
+from utils.config import COMMENT_SHARD_DIR
+
+
+class RollupRepository:
+    """
+    读取 comment_rollup 聚合表，按视频给出各维度的分布，无需扫描评论全表。
+    维度见 COMMENT_ROLLUP_DIMENSIONS：
+      day / hour 为评论条数；ip_location / level / sex / vip 为去重用户数。
+    """
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+
+    def _get_connection(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_name)
+
+    @staticmethod
+    def bucket_of(dimension: str) -> str:
+        for bucket, dimensions in COMMENT_ROLLUP_DIMENSIONS.items():
+            if dimension in dimensions:
+                return bucket
+        raise ValueError(f"未知的聚合维度: {dimension}")
+
+    def get_distribution(self, oids: List[int], dimension: str) -> Dict[Any, int]:
+        """
+        获取若干视频在某一维度上的分布 {取值: 数量}，按取值排序；缺失值的键为 None。
+        多个视频的用户口径按用户去重（每个用户取其最早的一条评论），与单视频时一致。
+        """
+        bucket = self.bucket_of(dimension)
+        if not oids:
+            return {}
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        distribution = {}
+        try:
+            keys_sql, params = bind_keys(conn, oids)
+            if bucket == "comment" or len(set(oids)) == 1:
+                query_sql = f"""
+                SELECT value, SUM(count) FROM comment_rollup
+                WHERE oid IN {keys_sql} AND bucket = ? AND dimension = ? AND count > 0
+                GROUP BY value ORDER BY value
+                """
+                params += (bucket, dimension)
+            else:
+                # 同一用户可能在多个视频下评论，需在计入各视频的评论中再取最早的一条
+                table = comment_storage_table(conn)
+                value = dict(rollup_dimension_values("user", table, "c"))[dimension]
+                query_sql = f"""
+                SELECT value, COUNT(*) FROM (
+                    SELECT {value} AS value,
+                           ROW_NUMBER() OVER (PARTITION BY u.mid ORDER BY c.time, c.rpid) AS rn
+                    FROM comment_rollup_user u JOIN {table} c ON c.rpid = u.rpid
+                    WHERE u.oid IN {keys_sql}
+                )
+                WHERE rn = 1
+                GROUP BY value ORDER BY value
+                """
+            cursor.execute(query_sql, params)
+            for value, count in cursor.fetchall():
+                distribution[None if value == "" else value] = count
+        except sqlite3.Error as e:
+            print(f"读取聚合分布失败: {e}")
+        finally:
+            conn.close()
+        return distribution
+
+    def has_rollups(self, oids: Optional[List[int]] = None) -> bool:
+        """聚合表是否存在（并且在给定 oids 时至少包含其中一个视频的数据）。"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            if not oids:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'comment_rollup'"
+                )
+                return cursor.fetchone() is not None
+            keys_sql, params = bind_keys(conn, oids)
+            cursor.execute(
+                f"SELECT 1 FROM comment_rollup WHERE oid IN {keys_sql} AND count > 0 LIMIT 1",
+                params,
+            )
+            return cursor.fetchone() is not None
+        except sqlite3.Error:
+            return False
+        finally:
+            conn.close()
+
+    def rebuild(self) -> bool:
+        """从评论数据全量重建聚合表。"""
+        conn = self._get_connection()
+        try:
+            rebuild_comment_rollups(conn)
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"重建聚合表失败: {e}")
+            return False
+        finally:
+            conn.close()
+
+
+def open_rollup_repository(db_name) -> Optional[RollupRepository]:
+    """
+    返回 db_name 上的聚合仓库。配置了 COMMENT_SHARD_DIR 时评论与聚合表都在各分片中，
+    主库的聚合表始终为空，返回 None，由调用方改用经 open_comment_repository 读取的评论数据统计。
+    """
+    if COMMENT_SHARD_DIR:
+        return None
+    return RollupRepository(db_name)
@@ -0,0 +1,132 @@
+import bisect
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from entity.comment import Comment
+from entity.comment_batch import CommentBatch
+from database.db_manage import load_shard_layout, shard_paths
+from repository.comment_repository import COMMENT_COLUMNS, CommentRepository, _as_rows
+from utils.config import COMMENT_SHARD_DIR
+from utils.digest import register_digest_function
+from utils.text_segment import build_match_query
+
+
+class ShardedCommentRepository(CommentRepository):
+    """
+    分片存储的评论仓库，接口与 CommentRepository 相同。
+    读：把所有分片 ATTACH 到一个内存连接上，并建立临时视图 comment（各分片 UNION ALL，
+        包含评论字段及 updated_at），原有的查询语句无需修改；SQLite 会把 WHERE 条件下推到每个分片，各自走索引。
+    写 / 删：按分片方式把评论路由到对应分片，直接在分片库上执行（分片内的触发器照常维护）。
+    分片目录需先用 init_comment_shards 初始化。
+    """
+
+    def __init__(self, shard_dir: str):
+        layout = load_shard_layout(shard_dir)
+        if layout is None:
+            raise ValueError(f"分片目录 '{shard_dir}' 未初始化，请先调用 init_comment_shards")
+        super().__init__(":memory:")
+        self.shard_dir = shard_dir
+        self.shard_by = layout["by"]
+        self.boundaries = layout["boundaries"]
+        self.shard_paths = shard_paths(shard_dir, layout["count"])
+        self.shards = [CommentRepository(path) for path in self.shard_paths]
+
+    def _get_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(":memory:")
+        register_digest_function(conn)
+        for i, path in enumerate(self.shard_paths):
+            conn.execute("ATTACH DATABASE ? AS ?", (path, f"shard_{i}"))
+        conn.execute(
+            "CREATE TEMP VIEW comment AS "
+            + " UNION ALL ".join(
+                f"SELECT {COMMENT_COLUMNS}, updated_at FROM shard_{i}.comment"
+                for i in range(len(self.shard_paths))
+            )
+        )
+        return conn
+
+    def _shard_of(self, oid: Optional[int], time: Optional[int]) -> int:
+        if self.shard_by == "oid":
+            return (oid or 0) % len(self.shards)
+        return bisect.bisect_right(self.boundaries, time or 0)
+
+    def _shards_for_oids(self, oids: List[int]) -> Dict[int, List[int]]:
+        """按 oid 分片时把 oid 分到各自的分片；按时间分片时每个分片都可能包含，全部下发。"""
+        if self.shard_by != "oid":
+            return {i: oids for i in range(len(self.shards))}
+        routed = {}
+        for oid in oids:
+            routed.setdefault(self._shard_of(oid, None), []).append(oid)
+        return routed
+
+    def _bulk_write(
+        self, comments: Union[Iterable[Comment], CommentBatch], mini: bool, overwrite: bool
+    ) -> Tuple[int, int]:
+        routed = {}
+        for row in _as_rows(comments):
+            # row[15] 为 oid，row[8] 为 time
+            routed.setdefault(self._shard_of(row[15], row[8]), []).append(row)
+        inserted, updated = 0, 0
+        for i, shard_rows in routed.items():
+            shard_inserted, shard_updated = self.shards[i]._write_rows(
+                shard_rows, mini, overwrite
+            )
+            inserted += shard_inserted
+            updated += shard_updated
+        return inserted, updated
+
+    def delete_comments_by_mids(self, mids: List[int]) -> int:
+        return sum(shard.delete_comments_by_mids(mids) for shard in self.shards)
+
+    def delete_comments_by_oids(self, oids: List[int]) -> int:
+        return sum(
+            self.shards[i].delete_comments_by_oids(shard_oids)
+            for i, shard_oids in self._shards_for_oids(oids).items()
+        )
+
+    def sync_search_index(self, batch_size: int = 5000) -> int:
+        return sum(shard.sync_search_index(batch_size) for shard in self.shards)
+
+    def search(
+        self,
+        query: str,
+        oids: Optional[List[int]] = None,
+        mids: Optional[List[int]] = None,
+        limit: int = 20,
+    ) -> List[Comment]:
+        """
+        在每个分片的全文索引中各取前 limit 条，再按各条在所属分片中的名次交替合并
+        （各分片第 1 名、各分片第 2 名……，同名次按分片顺序）。
+        bm25 分数依赖分片内的文档数与词频统计，不同分片的分数不可比较，因此不按分数归并；
+        结果只保证分片内的相关度顺序。按 oid 分片时只检索 oids 所在的分片，都落在同一分片时与单库检索的顺序一致。
+        """
+        match_query = build_match_query(query)
+        if not match_query:
+            return []
+        self.sync_search_index()
+
+        if oids:
+            routed = self._shards_for_oids(oids)
+        else:
+            routed = {i: None for i in range(len(self.shards))}
+        ranked_rows = []
+        for shard_index, shard_oids in sorted(routed.items()):
+            shard = self.shards[shard_index]
+            conn = shard._get_connection()
+            try:
+                shard_rows = shard._search_rows(conn, match_query, shard_oids, mids, limit)
+                ranked_rows.extend(
+                    (rank, shard_index, row) for rank, (_, row) in enumerate(shard_rows)
+                )
+            except sqlite3.Error as e:
+                print(f"全文检索评论失败: {e}")
+            finally:
+                conn.close()
+        ranked_rows.sort(key=lambda item: item[:2])
+        return [Comment.from_db_row(row) for _, _, row in ranked_rows[:limit]]
+
+
+def open_comment_repository(db_name) -> CommentRepository:
+    """配置了 COMMENT_SHARD_DIR 时返回分片仓库，否则返回 db_name 上的普通评论仓库。"""
+    if COMMENT_SHARD_DIR:
+        return ShardedCommentRepository(COMMENT_SHARD_DIR)
+    return CommentRepository(db_name)
@@ -1,6 +1,38 @@
 import sqlite3
-from typing import List, Optional, Tuple
-from entity.user import User
+from typing import Iterable, List, Optional, Tuple
+from entity.user import USER_FIELDS, User
+from database.db_manage import NOW_EPOCH_SQL
+from repository.multi_key import bind_keys
+from utils.digest import register_digest_function, row_digest
+
+# 用户可变字段（除 mid 外的全部列），digest 即按此顺序计算
+USER_DIGEST_FIELDS = (
+    "face", "fans", "friend", "name", "sex", "sign", "like_num", "vip",
+)
+
+# 非空字段合并到已有行后的摘要：评论爬虫不提供 fans/friend/like_num，
+# 合并可避免把用户信息爬虫写入的这些值覆盖为 NULL
+_MERGED_USER_DIGEST = "bili_digest({})".format(
+    ", ".join(f"COALESCE(excluded.{f}, user.{f})" for f in USER_DIGEST_FIELDS)
+)
+
+USER_UPSERT_SQL = """
+INSERT INTO user (
+    mid, face, fans, friend, name, sex, sign, like_num, vip, digest, updated_at
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {now})
+ON CONFLICT(mid) DO UPDATE SET
+    {assignments},
+    digest = {merged},
+    updated_at = excluded.updated_at
+WHERE excluded.digest IS NOT user.digest
+  AND user.digest IS NOT {merged}
+""".format(
+    assignments=",\n    ".join(
+        f"{f} = COALESCE(excluded.{f}, user.{f})" for f in USER_DIGEST_FIELDS
+    ),
+    merged=_MERGED_USER_DIGEST,
+    now=NOW_EPOCH_SQL,
+)
 
 
 class UserRepository:
@@ -13,38 +45,44 @@ class UserRepository:
 
     def _get_connection(self) -> sqlite3.Connection:
         """获取数据库连接"""
-        return sqlite3.connect(self.db_name)
+        conn = sqlite3.connect(self.db_name)
+        register_digest_function(conn)
+        return conn
 
     def add_or_update_user(self, user: User) -> bool:
+        inserted, updated = self.add_or_update_users([user])
+        return inserted + updated > 0
+
+    def add_or_update_users(self, users: Iterable[User]) -> Tuple[int, int]:
+        """
+        批量插入或更新用户，mid 冲突时合并非空字段。
+        仅在可变字段摘要变化时才真正写入，所有行在同一个事务中通过 executemany 写入。
+        返回 (新增条数, 实际更新条数)。
+        """
+        rows = []
+        for user in users:
+            row = user.to_tuple()
+            rows.append(row + (row_digest(*row[1:]),))
+        if not rows:
+            return 0, 0
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
-            # 使用 INSERT OR REPLACE 语句，SQLite 特有且高效的 UPSERT 方式
-            # 它会尝试插入新行，如果主键冲突，则替换掉现有行
-            insert_or_replace_sql = """
-            INSERT OR REPLACE INTO user (
-                mid, face, fans, friend, name, sex, sign, like_num, vip
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            params = (
-                user.mid,
-                user.face,
-                user.fans,
-                user.friend,
-                user.name,
-                user.sex,
-                user.sign,
-                user.like_num,
-                user.vip,
-            )
-            cursor.execute(insert_or_replace_sql, params)
+            # 先统计已存在的 mid，用于区分新增与更新
+            mids = list({row[0] for row in rows})
+            keys_sql, params = bind_keys(conn, mids)
+            cursor.execute(f"SELECT COUNT(*) FROM user WHERE mid IN {keys_sql}", params)
+            existing = cursor.fetchone()[0]
 
+            cursor.executemany(USER_UPSERT_SQL, rows)
+            affected = cursor.rowcount
             conn.commit()
-            return True
+            inserted = len(mids) - existing
+            return inserted, max(affected - inserted, 0)
         except sqlite3.Error as e:
             conn.rollback()
-            print(f"添加/更新用户失败: {e}")
-            return False
+            print(f"批量添加/更新用户失败: {e}")
+            return 0, 0
         finally:
             conn.close()
 
@@ -58,9 +96,9 @@ class UserRepository:
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
-            placeholders = ",".join(["?"] * len(mids))
-            delete_sql = f"DELETE FROM user WHERE mid IN ({placeholders})"
-            cursor.execute(delete_sql, tuple(mids))
+            keys_sql, params = bind_keys(conn, mids)
+            delete_sql = f"DELETE FROM user WHERE mid IN {keys_sql}"
+            cursor.execute(delete_sql, params)
             deleted_count = cursor.rowcount
             conn.commit()
             return deleted_count
@@ -80,13 +118,13 @@ class UserRepository:
             return []
         conn = self._get_connection()
         cursor = conn.cursor()
+        cursor.row_factory = User.row_factory
         users = []
         try:
-            placeholders = ",".join(["?"] * len(mids))
-            query_sql = f"SELECT * FROM user WHERE mid IN ({placeholders})"
-            cursor.execute(query_sql, tuple(mids))
-            for row in cursor.fetchall():
-                users.append(User.from_db_row(row))
+            keys_sql, params = bind_keys(conn, mids)
+            query_sql = f"SELECT {', '.join(USER_FIELDS)} FROM user WHERE mid IN {keys_sql}"
+            cursor.execute(query_sql, params)
+            users = cursor.fetchall()
         except sqlite3.Error as e:
             print(f"按 mid 查询用户失败: {e}")
         finally:
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from database.db_manage import init_bilibili_db
+from database import merge_db
+from database.merge_db import merge_databases
+from entity.comment import COMMENT_FIELDS, Comment
+from repository.comment_repository import CommentRepository
+
+
+def _make_worker(db_name, like_num, updated_at, count=100):
+    """创建工作库：count 条评论，点赞数均为 like_num，写入时间均为 updated_at。"""
+    init_bilibili_db(db_name)
+    empty = {field: None for field in COMMENT_FIELDS}
+    comments = [
+        Comment(**{
+            **empty,
+            "rpid": i, "mid": i, "name": f"user{i}", "information": "内容",
+            "time": 1700000000 + i, "single_like_num": like_num, "oid": 1, "type": 1, "vip": 0,
+        })
+        for i in range(count)
+    ]
+    CommentRepository(db_name).add_comments(comments)
+    conn = sqlite3.connect(db_name)
+    conn.execute("UPDATE comment SET updated_at = ?", (updated_at,))
+    conn.commit()
+    conn.close()
+
+
+class MergeLatestPolicyTest(unittest.TestCase):
+    """latest 策略应保留 updated_at 较新的一份，与工作库的合并顺序无关。"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.old = os.path.join(self.tmp.name, "old.db")
+        self.new = os.path.join(self.tmp.name, "new.db")
+        _make_worker(self.old, like_num=14, updated_at=1600000000)
+        _make_worker(self.new, like_num=20, updated_at=1700000000)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _merged_like_sum(self, normalized, workers):
+        master = os.path.join(self.tmp.name, f"master_{os.path.basename(workers[0])}")
+        init_bilibili_db(master, normalized=normalized)
+        merge_databases(master, workers)
+        conn = sqlite3.connect(master)
+        try:
+            return conn.execute("SELECT SUM(single_like_num) FROM comment").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_latest_wins_on_plain_master(self):
+        self.assertEqual(self._merged_like_sum(False, [self.old, self.new]), 2000)
+        self.assertEqual(self._merged_like_sum(False, [self.new, self.old]), 2000)
+
+    def test_latest_wins_on_normalized_master(self):
+        self.assertEqual(self._merged_like_sum(True, [self.old, self.new]), 2000)
+        self.assertEqual(self._merged_like_sum(True, [self.new, self.old]), 2000)
+
+
+class MergeResumeTest(unittest.TestCase):
+    """某一块写入后、进度保存前失败时，该块不应被提交，重新执行后的累计统计应与一次成功合并一致。"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.worker = os.path.join(self.tmp.name, "worker.db")
+        _make_worker(self.worker, like_num=14, updated_at=1600000000)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _resume_after_failure(self, normalized):
+        master = os.path.join(self.tmp.name, f"master_{normalized}.db")
+        init_bilibili_db(master, normalized=normalized)
+        with mock.patch.object(
+            merge_db, "_save_progress", side_effect=sqlite3.OperationalError("模拟失败")
+        ):
+            merge_databases(master, [self.worker], chunk_size=40)
+        conn = sqlite3.connect(master)
+        try:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM comment").fetchone()[0], 0)
+            if normalized:
+                # 快照不应脱离其评论单独提交
+                self.assertEqual(
+                    conn.execute("SELECT COUNT(*) FROM user_snapshot").fetchone()[0], 0
+                )
+        finally:
+            conn.close()
+        report = merge_databases(master, [self.worker], chunk_size=40)
+        self.assertEqual(report[os.path.abspath(self.worker)]["comment"], (100, 0))
+
+    def test_failed_chunk_is_not_committed_on_plain_master(self):
+        self._resume_after_failure(False)
+
+    def test_failed_chunk_is_not_committed_on_normalized_master(self):
+        self._resume_after_failure(True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+测量 CSV 导出的耗时构成：
+
+    python -m utils.benchmark_export assets/bili_data.db --oids 1 2 3
+
+分别计时：逐条构造 Comment、逐行格式化并 writerow 的旧式导出；export_comments_to_csv；
+以及只从库中读出同样的行、不做任何格式化和写出的耗时。
+后者是 sqlite3 模块把结果转换为 Python 元组的固有开销，任何经由 Python 读取数据的导出都无法低于它，
+旧式导出耗时与它的比值即为可达到的加速比上限。
+"""
+import argparse
+import csv
+import datetime
+import os
+import tempfile
+import time
+from typing import List
+from repository.sharded_comment_repository import open_comment_repository
+from utils.get_csv import CSV_HEADER, CSV_SOURCE_COLUMNS, export_comments_to_csv
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _export_row_by_row(output_filepath: str, db_name: str, oids: List[int]) -> int:
+    """逐条读取 Comment 对象、逐行格式化并写出（优化前的导出方式），作为基准。"""
+    row_number = 0
+    with open(output_filepath, "w", newline="", encoding="utf-8-sig") as csvfile:
+        csv_writer = csv.writer(csvfile)
+        csv_writer.writerow(CSV_HEADER)
+        for comment in open_comment_repository(db_name).get_comments_by_oid_stream(oids):
+            row_number += 1
+            try:
+                comment_time_str = datetime.datetime.fromtimestamp(comment.time).strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                )
+            except (TypeError, ValueError):
+                comment_time_str = str(comment.time)
+            csv_writer.writerow(
+                [
+                    row_number, comment.rpid, comment.mid, comment.name, comment.level,
+                    comment.sex, comment.information, comment_time_str,
+                    comment.single_reply_num, comment.single_like_num, comment.sign,
+                    comment.ip_location, "是" if comment.vip == 1 else "否", comment.face,
+                ]
+            )
+    return row_number
+
+
+def _fetch_only(db_name: str, oids: List[int]) -> int:
+    """只读出导出所需的行，不格式化也不写出。"""
+    repo = open_comment_repository(db_name)
+    return sum(
+        len(rows)
+        for rows in repo.stream_rows(CSV_SOURCE_COLUMNS, oids=oids, only_videos=True)
+    )
+
+
+def benchmark(db_name: str, oids: List[int]) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rows, row_by_row_seconds = _timed(
+            _export_row_by_row, os.path.join(tmp_dir, "row_by_row.csv"), db_name, oids
+        )
+        _, export_seconds = _timed(
+            export_comments_to_csv,
+            os.path.join(tmp_dir, "export.csv"),
+            db_name,
+            oids=oids,
+            only_videos=True,
+        )
+    _, fetch_seconds = _timed(_fetch_only, db_name, oids)
+    return {
+        "rows": rows,
+        "row_by_row_seconds": row_by_row_seconds,
+        "export_seconds": export_seconds,
+        "fetch_seconds": fetch_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV 导出耗时构成")
+    parser.add_argument("db_name", help="评论数据库")
+    parser.add_argument("--oids", type=int, nargs="+", required=True, help="导出的视频ID")
+    args = parser.parse_args()
+
+    result = benchmark(args.db_name, args.oids)
+    baseline = result["row_by_row_seconds"]
+    print(f"评论条数: {result['rows']}")
+    print(f"逐行导出: {baseline:.2f} 秒")
+    print(
+        f"export_comments_to_csv: {result['export_seconds']:.2f} 秒 "
+        f"(加速 {baseline / result['export_seconds']:.1f}x)"
+    )
+    print(
+        f"仅读取: {result['fetch_seconds']:.2f} 秒 "
+        f"(加速比上限 {baseline / result['fetch_seconds']:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
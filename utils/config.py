@@ -4,8 +4,44 @@ FONT_PATH = ROOT_PATH + "assets/fonts/PingFang-Medium.ttf"
 TEST_DB_PATH = ROOT_PATH + "test.db"
 BILI_DB_PATH = ROOT_PATH + "assets/bili_data.db"
 HIT_STOPWORDS_PATH = ROOT_PATH + "assets/hit_stopwords.txt"
+# jieba 词典前缀表缓存，避免每次启动都重新构建
+JIEBA_CACHE_PATH = ROOT_PATH + "assets/jieba.cache"
 IMAGE_DIR = ROOT_PATH + "images/"
+# 分析图表的保存格式，可同时保存多种（同一次绘制），如 ["png", "svg"]
+IMAGE_SAVE_FORMATS = ["png"]
+# 情感分析后端："snownlp" 逐条分词打分（结果缓存到数据库）；
+# "naive_bayes" 使用字符 n-gram 朴素贝叶斯模型整列向量化打分，速度快得多，
+# 模型需先用 python -m analyzer.sentiment_model 离线训练到 SENTIMENT_MODEL_PATH
+SENTIMENT_BACKEND = "snownlp"
+SENTIMENT_MODEL_PATH = ROOT_PATH + "assets/sentiment_nb.npz"
 
 COOKIE_PATH = ROOT_PATH + "assets/bili_cookie.txt"
 
 OUTPUT_CSV_PATH= ROOT_PATH + "output_csv/output.csv"
+# 导出 CSV 时是否同时写出同名的 .parquet 文件（需安装 pyarrow），分析器会优先加载它
+EXPORT_PARQUET = True
+# 获取 up 主全部视频评论（模式1）时，若设置该目录，则额外按视频分区导出压缩 CSV 及清单 manifest.json
+PARTITIONED_EXPORT_DIR = None
+
+# 评论存储是否使用规范化布局（用户快照去重存放，comment 为兼容视图）
+NORMALIZED_COMMENT_LAYOUT = False
+
+# 是否记录评论点赞数 / 回复数的变化历史（comment_counter_history）
+COUNTER_HISTORY_ENABLED = False
+
+# 是否建立评论内容全文索引（comment_fts），CommentRepository.search 需开启此项。
+# 开启后每条新增评论都要由触发器记入待分词队列，批量写入明显变慢
+SEARCH_INDEX_ENABLED = False
+
+# 是否由触发器随评论写入实时维护看板聚合表（comment_rollup）。
+# 开启后分析图表无需扫描评论全表，但每条评论写入都要额外更新聚合表，批量写入明显变慢；
+# 关闭时不建聚合表，分析回退到基于评论数据的统计
+COMMENT_ROLLUP_ENABLED = False
+
+# 评论分片目录，为 None 时不分片（全部评论存放在 BILI_DB_PATH）
+COMMENT_SHARD_DIR = None
+COMMENT_SHARD_COUNT = 4
+# 分片方式："oid" 按视频ID取模；"time" 按评论时间区间，
+# 此时 COMMENT_SHARD_BOUNDARIES 为 COMMENT_SHARD_COUNT - 1 个升序的时间戳
+COMMENT_SHARD_BY = "oid"
+COMMENT_SHARD_BOUNDARIES = []
@@ -0,0 +1,16 @@
+import hashlib
+import sqlite3
+
+
+def row_digest(*values) -> int:
+    """
+    计算一组字段值的 64 位摘要，用于判断一行数据的可变字段是否发生变化。
+    返回有符号整数，可直接存入 SQLite 的 INTEGER 列。
+    """
+    digest = hashlib.blake2b(repr(values).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def register_digest_function(conn: sqlite3.Connection):
+    """在连接上注册 SQL 函数 bili_digest(...)，与 row_digest 计算结果一致。"""
+    conn.create_function("bili_digest", -1, row_digest, deterministic=True)
@@ -0,0 +1,107 @@
+import os
+from time import localtime
+from typing import Dict, Iterable, List, Optional
+
+# 与 CSV 导出相同的中文列名；字符串取值较少的列按字典编码，读入 pandas 后为 category
+PARQUET_DICTIONARY_COLUMNS = ("性别", "IP属地", "是否是大会员")
+
+
+def parquet_path_for(csv_path: str) -> str:
+    """CSV 文件同目录、同名的 Parquet 文件路径，分析器据此优先加载列式数据。"""
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def local_epoch_seconds(
+    times: Iterable, cache: Optional[Dict[int, int]] = None
+) -> List[Optional[int]]:
+    """
+    把 Unix 时间戳批量换算为“本地时间当作 UTC”的秒数，存为无时区的时间戳后，
+    读出的值与 CSV 中按本地时区格式化的评论时间一致。
+    时区偏移按分钟缓存（cache 可跨批复用）；无法换算的值记为 None。
+    """
+    if cache is None:
+        cache = {}
+    shifted = []
+    append = shifted.append
+    for value in times:
+        try:
+            minute = value // 60
+            offset = cache.get(minute)
+            if offset is None:
+                offset = cache[minute] = localtime(minute * 60).tm_gmtoff
+            append(value + offset)
+        except (TypeError, ValueError, OverflowError, OSError):
+            append(None)
+    return shifted
+
+
+class ParquetCommentWriter:
+    """
+    以 Parquet 格式流式写出评论，列与 CSV 导出一致，但保留类型：
+    数值列为整数，评论时间为原生时间戳，少取值的字符串列字典编码。
+    输入为按 CSV_SOURCE_COLUMNS 顺序读出的原始行块，每块写为一个行组。
+    先写入临时文件，close 时再替换目标文件，中途失败不会留下残缺的 Parquet。
+    依赖 pyarrow，在构造时才导入。
+    """
+
+    def __init__(self, output_filepath: str, compression: str = "zstd"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.output_filepath = output_filepath
+        self._tmp_path = output_filepath + ".tmp"
+        dictionary = pa.dictionary(pa.int32(), pa.string())
+        self.schema = pa.schema(
+            [
+                ("序号", pa.int64()),
+                ("评论ID", pa.int64()),
+                ("用户ID", pa.int64()),
+                ("用户名", pa.string()),
+                ("用户等级", pa.int8()),
+                ("性别", dictionary),
+                ("评论内容", pa.string()),
+                ("评论时间", pa.timestamp("s")),
+                ("回复数", pa.int64()),
+                ("点赞数", pa.int64()),
+                ("个性签名", pa.string()),
+                ("IP属地", dictionary),
+                ("是否是大会员", dictionary),
+                ("头像", pa.string()),
+            ]
+        )
+        self._writer = pq.ParquetWriter(
+            self._tmp_path, self.schema, compression=compression
+        )
+        self._offset_cache = {}
+
+    def write_rows(self, rows: List[tuple], start: int):
+        """写入一块原始行，序号从 start 开始。"""
+        pa = self._pa
+        (rpid, mid, name, level, sex, information, times,
+         reply_num, like_num, sign, ip_location, vip, face) = zip(*rows)
+        columns = [
+            range(start, start + len(rows)),
+            rpid, mid, name, level, sex, information,
+            local_epoch_seconds(times, self._offset_cache),
+            reply_num, like_num, sign, ip_location,
+            ["是" if value == 1 else "否" for value in vip],
+            face,
+        ]
+        arrays = []
+        for field, values in zip(self.schema, columns):
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, field.type))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+        os.replace(self._tmp_path, self.output_filepath)
+
+    def abort(self):
+        """放弃本次写出，删除临时文件。"""
+        self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
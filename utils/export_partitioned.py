@@ -0,0 +1,184 @@
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from time import mktime
+from time import time as current_time
+from typing import List, Optional
+from repository.sharded_comment_repository import open_comment_repository
+from utils.get_csv import CSV_HEADER, CSV_SOURCE_COLUMNS, format_csv_rows
+
+PARTITION_MANIFEST_NAME = "manifest.json"
+
+# 压缩方式 -> 文件扩展名；zstd 需安装 zstandard
+PARTITION_COMPRESSIONS = {"gzip": ".csv.gz", "zstd": ".csv.zst", "none": ".csv"}
+
+_LOCAL_DATE_SQL = "DISTINCT strftime('%Y-%m-%d', time, 'unixepoch', 'localtime')"
+
+
+def _open_compressed(path: str, compression: str):
+    """以文本方式打开按 compression 流式压缩的输出文件。"""
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6)
+    if compression == "zstd":
+        import zstandard
+
+        raw = open(path, "wb")
+        stream = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="", buffering=1 << 20)
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _local_day_bounds(day: str):
+    """本地日期 'YYYY-MM-DD' 对应的 [开始, 结束] Unix 时间戳（闭区间），按本地时区换算。"""
+    start = date.fromisoformat(day)
+    next_day = start + timedelta(days=1)
+    return (
+        int(mktime(datetime(start.year, start.month, start.day).timetuple())),
+        int(mktime(datetime(next_day.year, next_day.month, next_day.day).timetuple())) - 1,
+    )
+
+
+def _export_partition(task: dict) -> dict:
+    """
+    在进程池中导出一个分区：按 task["filters"] 读取评论，流式压缩写入临时文件后改名。
+    返回该分区在清单中的记录（文件名、条数、字节数、sha256）。
+    """
+    path = os.path.join(task["output_dir"], task["file"])
+    tmp_path = path + ".tmp"
+    repo = open_comment_repository(task["db_name"])
+    row_count = 0
+    with _open_compressed(tmp_path, task["compression"]) as f:
+        f.write("\ufeff")
+        csv_writer = csv.writer(f)
+        csv_writer.writerow(CSV_HEADER)
+        time_cache = {}
+        for rows in repo.stream_rows(
+            CSV_SOURCE_COLUMNS, chunk_size=task["chunk_size"], **task["filters"]
+        ):
+            csv_writer.writerows(format_csv_rows(rows, row_count + 1, time_cache))
+            row_count += len(rows)
+    os.replace(tmp_path, path)
+    return {
+        "key": task["key"],
+        "file": task["file"],
+        "rows": row_count,
+        "bytes": os.path.getsize(path),
+        "sha256": _file_sha256(path),
+    }
+
+
+def _partition_tasks(repo, partition_by: str, filters: dict) -> List[dict]:
+    """列出满足过滤条件的全部分区，每个分区附带收窄后的过滤条件。"""
+    tasks = []
+    if partition_by == "oid":
+        for rows in repo.stream_rows("DISTINCT oid", order_sql="oid", **filters):
+            for (oid,) in rows:
+                tasks.append(
+                    {"key": oid, "file": f"oid_{oid}", "filters": {**filters, "oids": [oid]}}
+                )
+    elif partition_by == "date":
+        for rows in repo.stream_rows(_LOCAL_DATE_SQL, order_sql="1", **filters):
+            for (day,) in rows:
+                if day is None:
+                    continue
+                day_start, day_end = _local_day_bounds(day)
+                if filters["start_time"] is not None:
+                    day_start = max(day_start, filters["start_time"])
+                if filters["end_time"] is not None:
+                    day_end = min(day_end, filters["end_time"])
+                tasks.append(
+                    {
+                        "key": day,
+                        "file": f"date_{day}",
+                        "filters": {**filters, "start_time": day_start, "end_time": day_end},
+                    }
+                )
+    else:
+        raise ValueError(f"不支持的分区方式: {partition_by}，可选 'oid' 或 'date'")
+    return tasks
+
+
+def export_comments_partitioned(
+    output_dir: str,
+    db_name: str = "bilibili_comments.db",
+    oids: Optional[List[int]] = None,
+    mids: Optional[List[int]] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    only_videos: bool = False,
+    partition_by: str = "oid",
+    compression: str = "gzip",
+    max_workers: Optional[int] = None,
+    chunk_size: int = 50000,
+) -> dict:
+    """
+    按视频（partition_by="oid"）或本地日期（"date"）把评论分区导出到 output_dir，每个分区一个压缩 CSV，
+    列与 export_comments_to_csv 相同，序号在分区内从 1 开始。过滤条件同 export_comments_to_csv。
+    各分区在进程池中并行导出（max_workers 默认为 CPU 核数），全部完成后写出清单 manifest.json，
+    记录每个分区的文件名、条数、字节数和 sha256，下游可只读取需要的分区。返回清单内容。
+    """
+    if compression not in PARTITION_COMPRESSIONS:
+        raise ValueError(
+            f"不支持的压缩方式: {compression}，可选 {list(PARTITION_COMPRESSIONS)}"
+        )
+    if compression == "zstd":
+        import zstandard  # noqa: F401  尽早报告缺少依赖，而不是在子进程中失败
+
+    os.makedirs(output_dir, exist_ok=True)
+    filters = {
+        "oids": oids,
+        "mids": mids,
+        "start_time": start_time,
+        "end_time": end_time,
+        "only_videos": only_videos,
+    }
+    repo = open_comment_repository(db_name)
+    tasks = _partition_tasks(repo, partition_by, filters)
+    extension = PARTITION_COMPRESSIONS[compression]
+    for task in tasks:
+        task.update(
+            file=task["file"] + extension,
+            output_dir=output_dir,
+            db_name=db_name,
+            compression=compression,
+            chunk_size=chunk_size,
+        )
+
+    workers = min(max_workers or os.cpu_count() or 1, len(tasks)) or 1
+    if workers == 1:
+        partitions = [_export_partition(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partitions = list(executor.map(_export_partition, tasks))
+
+    manifest = {
+        "partition_by": partition_by,
+        "compression": compression,
+        "columns": CSV_HEADER,
+        "filters": filters,
+        "created_at": int(current_time()),
+        "total_rows": sum(partition["rows"] for partition in partitions),
+        "partitions": partitions,
+    }
+    manifest_path = os.path.join(output_dir, PARTITION_MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    print(
+        f"评论已分区导出到: {output_dir}，共 {len(partitions)} 个分区、"
+        f"{manifest['total_rows']} 条记录。"
+    )
+    return manifest
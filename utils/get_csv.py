@@ -1,163 +1,395 @@
 import csv
+import json
 import os
-from typing import List
-from repository.comment_repository import CommentRepository
-from entity.comment import Comment
+from time import localtime, sleep, strftime
+from time import time as current_time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from repository.sharded_comment_repository import open_comment_repository
+from utils.config import EXPORT_PARQUET
+from utils.export_parquet import ParquetCommentWriter, parquet_path_for
 
-def export_comments_by_mid_to_csv(
-    output_filepath: str, mids: List[int], db_name: str = "./assets/bili_data.db"
-):
-    if not mids:
-        print(
-            "Warning: No mids provided for export. CSV file will be empty (header only if created)."
-        )
-        return
+# CSV 表头
+CSV_HEADER = [
+    "序号",
+    "评论ID",
+    "用户ID",
+    "用户名",
+    "用户等级",
+    "性别",
+    "评论内容",
+    "评论时间",
+    "回复数",
+    "点赞数",
+    "个性签名",
+    "IP属地",
+    "是否是大会员",
+    "头像",
+]
+
+# 从库中读取的原始列，与 CSV_HEADER 去掉“序号”后一一对应
+CSV_SOURCE_COLUMNS = (
+    "rpid, mid, name, level, sex, information, time, "
+    "single_reply_num, single_like_num, sign, ip_location, vip, face"
+)
+
+# 输出文件缓冲区大小，减少 writerows 触发的系统调用次数
+CSV_WRITE_BUFFER = 1 << 20
 
-    repo = CommentRepository(db_name)
-    comments_iterator = repo.get_comments_by_mid_stream(mids)
+_SECONDS = [f"{second:02d}" for second in range(60)]
 
-    # 确保输出目录存在
+
+def format_comment_times(times: Iterable, cache: Optional[Dict[int, str]] = None) -> List[str]:
+    """
+    批量把 Unix 时间戳格式化为本地时间 "%Y-%m-%d %H:%M:%S"，结果与 datetime.fromtimestamp 一致。
+    同一分钟内的时间戳共用一次 strftime 的结果（cache 以分钟为键，可跨批复用），
+    无法转换的值保留原样转为字符串。
+    """
+    if cache is None:
+        cache = {}
+    formatted = []
+    append = formatted.append
+    for value in times:
+        try:
+            minute, second = divmod(value, 60)
+            prefix = cache.get(minute)
+            if prefix is None:
+                prefix = cache[minute] = strftime(
+                    "%Y-%m-%d %H:%M:", localtime(minute * 60)
+                )
+            append(prefix + _SECONDS[second])
+        except (TypeError, ValueError, OverflowError, OSError, IndexError):
+            append(str(value))
+    return formatted
+
+
+def format_csv_rows(rows: List[tuple], start: int, time_cache: Dict[int, str]) -> Iterator[tuple]:
+    """
+    把一块按 CSV_SOURCE_COLUMNS 读出的原始行按列整体格式化，产出 CSV 行（序号从 start 开始）。
+    """
+    (rpid, mid, name, level, sex, information, times,
+     reply_num, like_num, sign, ip_location, vip, face) = zip(*rows)
+    return zip(
+        range(start, start + len(rows)),
+        rpid, mid, name, level, sex, information,
+        format_comment_times(times, time_cache),
+        reply_num, like_num, sign, ip_location,
+        ["是" if value == 1 else "否" for value in vip],
+        face,
+    )
+
+
+def _open_csv(output_filepath: str, append: bool, header: List[str]):
+    """
+    打开导出文件。新建时手动写入 BOM 和表头（等价于 utf-8-sig，但避免该编码器逐次写入时的额外开销），
+    追加时直接接在已有内容之后。
+    """
     output_dir = os.path.dirname(output_filepath)
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
+    csvfile = open(
+        output_filepath,
+        "a" if append else "w",
+        newline="",
+        encoding="utf-8",
+        buffering=CSV_WRITE_BUFFER,
+    )
+    if not append:
+        csvfile.write("\ufeff")
+        csv.writer(csvfile).writerow(header)
+    return csvfile
+
 
+def _export_rows(
+    repo,
+    output_filepath: str,
+    append: bool = False,
+    first_number: int = 1,
+    parquet_path: Optional[str] = None,
+    chunk_size: int = 50000,
+    **filters,
+) -> Tuple[int, Optional[Tuple[int, int]]]:
+    """
+    按 filters（同 comment_filter_sql）把评论按 (time, rpid) 升序写入 CSV，序号从 first_number 开始。
+    返回 (写出条数, 最后一行的 (time, rpid))，没有写出任何行时后者为 None。
+    """
+    parquet_writer = None
+    if parquet_path:
+        try:
+            parquet_writer = ParquetCommentWriter(parquet_path)
+        except ImportError:
+            print("警告: 未安装 pyarrow，跳过 Parquet 导出。")
+
+    row_count = 0
+    last_key = None
     try:
-        with open(output_filepath, "w", newline="", encoding="utf-8-sig") as csvfile:
+        with _open_csv(output_filepath, append, CSV_HEADER) as csvfile:
             csv_writer = csv.writer(csvfile)
+            time_cache = {}
+            for rows in repo.stream_rows(
+                CSV_SOURCE_COLUMNS, chunk_size=chunk_size, **filters
+            ):
+                start = first_number + row_count
+                csv_writer.writerows(format_csv_rows(rows, start, time_cache))
+                if parquet_writer:
+                    parquet_writer.write_rows(rows, start)
+                row_count += len(rows)
+                last_key = (rows[-1][6], rows[-1][0])  # (time, rpid)
+        if parquet_writer:
+            parquet_writer.close()
+            parquet_writer = None
+    except Exception as e:
+        print(f"导出评论到 CSV 失败: {e}")
+    finally:
+        if parquet_writer:
+            parquet_writer.abort()
+    return row_count, last_key
 
-            # 写入 CSV 表头
-            header = [
-                "序号",
-                "评论ID",
-                "用户ID",
-                "用户名",
-                "用户等级",
-                "性别",
-                "评论内容",
-                "评论时间",
-                "回复数",
-                "点赞数",
-                "个性签名",
-                "IP属地",
-                "是否是大会员",
-                "头像",
-            ]
-            csv_writer.writerow(header)
-
-            row_number = 0
-            for comment in comments_iterator:
-                row_number += 1
-                try:
-                    # 将 Unix 时间戳转换为易读的日期时间格式
-                    import datetime
-
-                    comment_time_str = datetime.datetime.fromtimestamp(
-                        comment.time
-                    ).strftime("%Y-%m-%d %H:%M:%S")
-                except (TypeError, ValueError):
-                    comment_time_str = str(comment.time)  # 转换失败则保留原样
-
-                # 将 VIP 状态从数字转换为文字描述
-                vip_status = "是" if comment.vip == 1 else "否"
-
-                # 根据你的字段顺序构建行数据
-                row_data = [
-                    row_number,
-                    comment.rpid,
-                    comment.mid,
-                    comment.name,
-                    comment.level,
-                    comment.sex,
-                    comment.information,
-                    comment_time_str,  # 转换后的时间
-                    comment.single_reply_num,
-                    comment.single_like_num,
-                    comment.sign,
-                    comment.ip_location,
-                    vip_status,  # 转换后的VIP状态
-                    comment.face,
-                ]
-                csv_writer.writerow(row_data)
-        print(
-            f"评论已成功导出到: {output_filepath} (根据 mid: {mids})，共 {row_number} 条记录。"
+
+def export_comments_to_csv(
+    output_filepath: str,
+    db_name: str = "bilibili_comments.db",
+    oids: Optional[List[int]] = None,
+    mids: Optional[List[int]] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    only_videos: bool = False,
+    chunk_size: int = 50000,
+    parquet_path: Optional[str] = None,
+) -> int:
+    """
+    按任意条件组合（oid、mid、时间范围）导出评论到 CSV，按时间升序，返回导出的条数。
+    oids / mids 为 None 表示不按该字段过滤；start_time / end_time 为 Unix 时间戳（闭区间）。
+    数据按 chunk_size 行分块从库中读出原始元组，按列批量格式化后经 writerows 整块写入带大缓冲的文件。
+    指定 parquet_path 时，同一次读取的数据同时写出带类型的 Parquet 文件（需安装 pyarrow）。
+    """
+    row_count, _ = _export_rows(
+        open_comment_repository(db_name),
+        output_filepath,
+        parquet_path=parquet_path,
+        chunk_size=chunk_size,
+        oids=oids,
+        mids=mids,
+        start_time=start_time,
+        end_time=end_time,
+        only_videos=only_videos,
+    )
+    return row_count
+
+
+def watermark_path_for(csv_path: str) -> str:
+    """增量导出时记录水位的文件，与 CSV 同目录。"""
+    return csv_path + ".watermark.json"
+
+
+def delta_path_for(csv_path: str) -> str:
+    """增量导出时记录已导出评论变化的文件，与 CSV 同目录。"""
+    return os.path.splitext(csv_path)[0] + ".delta.csv"
+
+
+def _load_watermark(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取导出水位失败，将重新全量导出: {e}")
+        return None
+
+
+def _save_watermark(path: str, watermark: dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(watermark, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def export_comments_incremental(
+    output_filepath: str,
+    db_name: str = "bilibili_comments.db",
+    oids: Optional[List[int]] = None,
+    mids: Optional[List[int]] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    only_videos: bool = False,
+    chunk_size: int = 50000,
+    parquet_path: Optional[str] = None,
+) -> Tuple[int, int]:
+    """
+    增量导出评论到 CSV，过滤条件同 export_comments_to_csv，返回 (追加条数, 变化条数)。
+
+    水位文件（watermark_path_for）记录上次导出的过滤条件、已导出条数、最后一行的 (time, rpid)，
+    以及导出开始时已落定的最大 (updated_at, rpid) 变更键（见 _settled_update_key）。再次以相同条件导出时：
+    - 排序键在水位之后的新评论按原顺序追加到 CSV 末尾，序号接着上次继续编号；
+    - 水位之前、变更键大于上次记录的评论（即自上次导出以来有变化）写入 delta 文件（delta_path_for，
+      每次覆盖，不含序号列），下游按评论ID覆盖即可，无需重新读取整个 CSV。
+      变更键按 (updated_at, rpid) 严格比较，与上次导出在同一秒内写入的评论不会被重复导出。
+    以下情况会回退为全量导出（此时才写出 parquet_path）：没有水位或 CSV 不存在、过滤条件改变、
+    水位之前的评论条数与已导出条数不一致（有晚到的旧评论或评论被删除）。
+    追加后同名 Parquet 会比 CSV 旧，分析器会改为读取 CSV。
+    """
+    filters = {
+        "oids": oids,
+        "mids": mids,
+        "start_time": start_time,
+        "end_time": end_time,
+        "only_videos": only_videos,
+    }
+    # 以字符串形式记录 key，兼容从命令行读入的字符串 ID，且顺序无关
+    signature = dict(filters)
+    for key in ("oids", "mids"):
+        if signature[key] is not None:
+            signature[key] = sorted({str(k) for k in signature[key]})
+    watermark_path = watermark_path_for(output_filepath)
+    delta_path = delta_path_for(output_filepath)
+    repo = open_comment_repository(db_name)
+    updated_key = _settled_update_key(repo, filters)
+
+    watermark = _load_watermark(watermark_path)
+    if watermark is not None:
+        last_key = tuple(watermark["last_key"]) if watermark["last_key"] else None
+        if (
+            watermark["filters"] != signature
+            or "updated_key" not in watermark
+            or not os.path.exists(output_filepath)
+            or (
+                last_key is not None
+                and repo.count_rows(up_to=last_key, **filters) != watermark["row_count"]
+            )
+        ):
+            print("导出水位与当前数据不一致，重新全量导出。")
+            watermark = None
+
+    if watermark is None:
+        row_count, last_key = _export_rows(
+            repo,
+            output_filepath,
+            parquet_path=parquet_path,
+            chunk_size=chunk_size,
+            **filters,
         )
+        appended, changed = row_count, 0
+        if os.path.exists(delta_path):
+            os.remove(delta_path)
+    else:
+        previous_key = last_key
+        appended, new_last_key = _export_rows(
+            repo,
+            output_filepath,
+            append=True,
+            first_number=watermark["row_count"] + 1,
+            chunk_size=chunk_size,
+            after=previous_key,
+            **filters,
+        )
+        row_count = watermark["row_count"] + appended
+        last_key = new_last_key or previous_key
+        changed = 0
+        if previous_key is not None:
+            changed = _export_delta(
+                repo,
+                delta_path,
+                chunk_size,
+                up_to=previous_key,
+                updated_after=(
+                    tuple(watermark["updated_key"]) if watermark["updated_key"] else None
+                ),
+                **filters,
+            )
+
+    _save_watermark(
+        watermark_path,
+        {
+            "filters": signature,
+            "row_count": row_count,
+            "last_key": list(last_key) if last_key else None,
+            "updated_key": list(updated_key) if updated_key else None,
+        },
+    )
+    return appended, changed
+
+
+def _settled_update_key(repo, filters: dict) -> Optional[Tuple[int, int]]:
+    """
+    在读取评论之前取本次导出的变更键。updated_at 精度为秒，当前这一秒内之后还可能有写入，
+    因此只取 updated_at 早于当前秒的评论中最大的 (updated_at, rpid)：此后的任何写入都大于它，不会被遗漏；
+    读取期间才写入的评论下次会再作为变化导出。
+    最近一次写入就在当前这一秒时（如刚爬取完立即导出），先等到下一秒再取，避免这些评论下次被重复导出。
+    """
+    now = current_time()
+    latest = repo.last_update_key(**filters)
+    if latest is None or latest[0] < int(now):
+        return latest
+    sleep(int(now) + 1 - now)
+    return repo.last_update_key(updated_before=int(current_time()), **filters)
+
+
+def _export_delta(repo, delta_path: str, chunk_size: int, **filters) -> int:
+    """把满足 filters 的评论写入 delta 文件（覆盖），列同 CSV 但不含序号，返回条数。"""
+    changed = 0
+    try:
+        with _open_csv(delta_path, False, CSV_HEADER[1:]) as csvfile:
+            csv_writer = csv.writer(csvfile)
+            time_cache = {}
+            for rows in repo.stream_rows(
+                CSV_SOURCE_COLUMNS, chunk_size=chunk_size, **filters
+            ):
+                csv_writer.writerows(
+                    row[1:] for row in format_csv_rows(rows, 0, time_cache)
+                )
+                changed += len(rows)
     except Exception as e:
-        print(f"导出评论到 CSV 失败: {e}")
+        print(f"导出评论变化失败: {e}")
+    return changed
 
 
-def export_comments_by_oid_to_csv(
-    output_filepath: str, oids: List[int], db_name: str = "bilibili_comments.db"
+def _parquet_path_or_none(output_filepath: str) -> Optional[str]:
+    return parquet_path_for(output_filepath) if EXPORT_PARQUET else None
+
+
+def _export_with_mode(output_filepath: str, db_name: str, incremental: bool, **filters) -> str:
+    """按 incremental 选择全量或增量导出，返回用于提示的结果描述。"""
+    parquet_path = _parquet_path_or_none(output_filepath)
+    if incremental:
+        appended, changed = export_comments_incremental(
+            output_filepath, db_name, parquet_path=parquet_path, **filters
+        )
+        return f"新增 {appended} 条记录，{changed} 条记录有变化"
+    row_count = export_comments_to_csv(
+        output_filepath, db_name, parquet_path=parquet_path, **filters
+    )
+    return f"共 {row_count} 条记录"
+
+
+def export_comments_by_mid_to_csv(
+    output_filepath: str,
+    mids: List[int],
+    db_name: str = "./assets/bili_data.db",
+    incremental: bool = False,
 ):
-    if not oids:
+    if not mids:
         print(
-            "Warning: No oids provided for export. CSV file will be empty (header only if created)."
+            "Warning: No mids provided for export. CSV file will be empty (header only if created)."
         )
         return
 
-    repo = CommentRepository(db_name)
-    comments_iterator = repo.get_comments_by_oid_stream(oids)  # 使用 oid 的流式查询
+    summary = _export_with_mode(output_filepath, db_name, incremental, mids=mids)
+    print(f"评论已成功导出到: {output_filepath} (根据 mid: {mids})，{summary}。")
 
-    # 确保输出目录存在
-    output_dir = os.path.dirname(output_filepath)
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    try:
-        with open(output_filepath, "w", newline="", encoding="utf-8-sig") as csvfile:
-            csv_writer = csv.writer(csvfile)
 
-            # 写入 CSV 表头 (与按 mid 导出相同)
-            header = [
-                "序号",
-                "评论ID",
-                "用户ID",
-                "用户名",
-                "用户等级",
-                "性别",
-                "评论内容",
-                "评论时间",
-                "回复数",
-                "点赞数",
-                "个性签名",
-                "IP属地",
-                "是否是大会员",
-                "头像",
-            ]
-            csv_writer.writerow(header)
-
-            row_number = 0
-            for comment in comments_iterator:
-                row_number += 1
-                try:
-                    import datetime
-
-                    comment_time_str = datetime.datetime.fromtimestamp(
-                        comment.time
-                    ).strftime("%Y-%m-%d %H:%M:%S")
-                except (TypeError, ValueError):
-                    comment_time_str = str(comment.time)
-
-                vip_status = "是" if comment.vip == 1 else "否"
-
-                row_data = [
-                    row_number,
-                    comment.rpid,
-                    comment.mid,
-                    comment.name,
-                    comment.level,
-                    comment.sex,
-                    comment.information,
-                    comment_time_str,
-                    comment.single_reply_num,
-                    comment.single_like_num,
-                    comment.sign,
-                    comment.ip_location,
-                    vip_status,
-                    comment.face,
-                ]
-                csv_writer.writerow(row_data)
+def export_comments_by_oid_to_csv(
+    output_filepath: str,
+    oids: List[int],
+    db_name: str = "bilibili_comments.db",
+    incremental: bool = False,
+):
+    if not oids:
         print(
-            f"评论已成功导出到: {output_filepath} (根据 oid: {oids})，共 {row_number} 条记录。"
+            "Warning: No oids provided for export. CSV file will be empty (header only if created)."
         )
-    except Exception as e:
-        print(f"导出评论到 CSV 失败: {e}")
+        return
+
+    summary = _export_with_mode(
+        output_filepath, db_name, incremental, oids=oids, only_videos=True
+    )
+    print(f"评论已成功导出到: {output_filepath} (根据 oid: {oids})，{summary}。")
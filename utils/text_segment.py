@@ -0,0 +1,99 @@
+import os
+import pickle
+import re
+from typing import List, Set
+from utils.config import JIEBA_CACHE_PATH
+
+# 仅由空白、标点等非文字字符组成的分词结果不参与索引与检索
+_WORD_PATTERN = re.compile(r"\w", re.UNICODE)
+# B站表情如 [doge]、[笑哭] 对检索没有意义
+_EMOTE_PATTERN = re.compile(r"\[.*?\]")
+
+_jieba = None
+
+
+def _get_jieba():
+    """
+    延迟导入 jieba，避免仅使用数据库读写时也加载词典。
+    词典前缀表缓存到 JIEBA_CACHE_PATH（默认为 assets/jieba.cache），之后的进程直接加载缓存。
+    """
+    global _jieba
+    if _jieba is None:
+        import jieba
+
+        cache_dir, cache_name = os.path.split(os.path.abspath(JIEBA_CACHE_PATH))
+        os.makedirs(cache_dir, exist_ok=True)
+        jieba.dt.tmp_dir = cache_dir
+        jieba.dt.cache_file = cache_name
+        _jieba = jieba
+    return _jieba
+
+
+def segment_words(text: str) -> List[str]:
+    """使用 jieba 搜索引擎模式分词，去掉表情与纯标点词。"""
+    if not text:
+        return []
+    text = _EMOTE_PATTERN.sub(" ", text)
+    return [
+        word.strip()
+        for word in _get_jieba().cut_for_search(text)
+        if _WORD_PATTERN.search(word)
+    ]
+
+
+def segment_cloud_words(text: str) -> List[str]:
+    """词云分词：去掉表情后用 jieba 精确模式分词，只保留长度大于 1 且不含空白的词。"""
+    if not isinstance(text, str) or not text:
+        return []
+    text = _EMOTE_PATTERN.sub("", text)
+    return [
+        word
+        for word in _get_jieba().cut(text, cut_all=False)
+        if len(word) > 1 and not any(char.isspace() for char in word)
+    ]
+
+
+_stopwords_cache = {}
+
+
+def load_stopwords(path: str) -> Set[str]:
+    """
+    加载停用词表（每行一个词）。首次读取后序列化到同目录的 .pkl 文件，
+    之后只要文本文件未更新就直接反序列化；同一进程内只加载一次。文件不存在时抛出 FileNotFoundError。
+    """
+    mtime = os.path.getmtime(path)
+    cached = _stopwords_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    pickle_path = path + ".pkl"
+    stopwords = None
+    if os.path.exists(pickle_path) and os.path.getmtime(pickle_path) >= mtime:
+        try:
+            with open(pickle_path, "rb") as f:
+                stopwords = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            stopwords = None
+    if stopwords is None:
+        with open(path, "r", encoding="utf-8") as f:
+            stopwords = {line.strip() for line in f}
+        try:
+            with open(pickle_path + ".tmp", "wb") as f:
+                pickle.dump(stopwords, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(pickle_path + ".tmp", pickle_path)
+        except OSError:
+            pass
+    _stopwords_cache[path] = (mtime, stopwords)
+    return stopwords
+
+
+def segment_for_index(text: str) -> str:
+    """生成写入 FTS5 索引的文本：分词结果以空格连接，交由 unicode61 按空格切分。"""
+    return " ".join(segment_words(text))
+
+
+def build_match_query(query: str) -> str:
+    """
+    将用户输入转换为 FTS5 MATCH 表达式：与建索引时使用相同的分词方式，
+    每个词加双引号避免被解析为 FTS5 语法，多个词之间为 AND 关系。
+    """
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in segment_words(query))